@@ -0,0 +1,76 @@
+"""Runs the Tk window from an asyncio event loop, so slow work like writing files never stalls the game loop"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import TclError
+
+class AsyncTk:
+	"""Processes the window's events every 'pump_ms' from an asyncio loop, in place of Tk's mainloop,
+	or every 'idle_pump_ms' while the function 'idle', if given, returns True, e.g. when the game is paused.
+	Callbacks from window.after(), including the game loop, still run on this thread as before.
+	Each time the window is processed 'monitor' is ticked, if given, to measure how late the loop wakes up"""
+	def __init__(self, window, pump_ms, monitor=None, idle_pump_ms=None, idle=None):
+		self.window = window
+		self.pump_interval = pump_ms / 1000
+		self.idle_pump_interval = (idle_pump_ms or pump_ms) / 1000
+		self.monitor = monitor
+		self.idle = idle
+
+		self.loop = None
+		self.tasks = set()
+
+		# Background work runs in order on one thread, so e.g. a save is written before the next one is
+		self.executor = ThreadPoolExecutor(1)
+
+	def run(self):
+		"""Run until the window is destroyed, then wait for any background work to finish"""
+		asyncio.run(self.main())
+		self.executor.shutdown()
+
+	async def main(self):
+		self.loop = asyncio.get_running_loop()
+		next_pump = self.loop.time()
+
+		while True:
+			try:
+				self.window.update()
+			except TclError:
+				# The window has been destroyed
+				break
+
+			idle = self.idle is not None and self.idle()
+
+			# Pumps are slowed down on purpose while idle, so they aren't measured
+			if self.monitor is not None:
+				if idle:
+					self.monitor.pause()
+				else:
+					self.monitor.tick()
+
+			# If the loop falls behind, carry on from now rather than pumping repeatedly to catch up
+			next_pump = max(next_pump + (self.idle_pump_interval if idle else self.pump_interval), self.loop.time())
+			await asyncio.sleep(next_pump - self.loop.time())
+
+		if len(self.tasks) > 0:
+			await asyncio.gather(*self.tasks, return_exceptions=True)
+
+	def start_task(self, coroutine):
+		"""Run a coroutine alongside the game, e.g. one serving a socket"""
+		return self.track(self.loop.create_task(coroutine))
+
+	def run_in_background(self, function, *args):
+		"""Run a blocking function, e.g. one writing a file, on the background thread"""
+		return self.track(self.loop.run_in_executor(self.executor, function, *args))
+
+	def track(self, future):
+		"""Keep 'future' until it is done, so it is waited for on exit and its errors are reported"""
+		self.tasks.add(future)
+		future.add_done_callback(self.finished)
+
+		return future
+
+	def finished(self, future):
+		self.tasks.discard(future)
+
+		if not future.cancelled() and future.exception() is not None:
+			print("Background task failed: %r" % future.exception())
@@ -0,0 +1,77 @@
+"""Caches the sprite sheet on disk already resized for the display scale, so startup at any resolution skips resampling"""
+
+from hashlib import sha1
+from io import BytesIO
+from os import makedirs, path, replace
+
+from PIL import Image
+
+# Space left between images in an atlas, so rounding never lets one image bleed into the next
+PADDING = 1
+
+def atlas_layout(sprites, factor):
+	"""Returns {(left, top, right, bottom, scale): box in the atlas} for each (rect, scale) in 'sprites',
+	each image being 'factor' times its scale larger than in the sprite sheet, and the size of the atlas.
+	The images are laid out in a single row, in the order given"""
+	layout = {}
+	x = 0
+	height = 0
+
+	for rect, scale in sprites:
+		key = (rect.left, rect.top, rect.right, rect.bottom, scale)
+		if key in layout:
+			continue
+
+		# Square, as sprites always have been, see Sprite.process_sprite_sheet()
+		size = max(1, round((rect.right - rect.left) * scale * factor))
+		layout[key] = (x, 0, x + size, size)
+
+		x += size + PADDING
+		height = max(height, size)
+
+	return layout, (max(1, x), max(1, height))
+
+def build_atlas(sheet, layout, size):
+	"""Resize each image of the sprite sheet into its place in a new atlas image"""
+	atlas = Image.new("RGBA", size, (0, 0, 0, 0))
+
+	for (left, top, right, bottom, _), box in layout.items():
+		cropped = sheet.crop((left, top, right, bottom))
+		atlas.paste(cropped.resize((box[2] - box[0], box[3] - box[1])), box[:2])
+
+	return atlas
+
+def load_atlas(sheet_path, sprites, factor, cache_dir):
+	"""Returns {(left, top, right, bottom, scale): image} for each (rect, scale) in 'sprites', resized by 'factor'.
+	The atlas is read from 'cache_dir' if it was built before for the same sheet, sprites and factor,
+	otherwise it is built and written there. A cache which can't be written is only a slower startup"""
+	with open(sheet_path, "rb") as sheet_file:
+		sheet_bytes = sheet_file.read()
+
+	layout, size = atlas_layout(sprites, factor)
+
+	digest = sha1(sheet_bytes)
+	digest.update(repr(sorted(layout.items())).encode())
+	cache_path = path.join(cache_dir, "atlas_%s_%g.png" % (digest.hexdigest()[:16], factor))
+
+	atlas = None
+	if path.exists(cache_path):
+		try:
+			atlas = Image.open(cache_path)
+			atlas.load()
+		except OSError:
+			# A partly written or damaged file, build it again
+			atlas = None
+
+	if atlas is None or atlas.size != size:
+		atlas = build_atlas(Image.open(BytesIO(sheet_bytes)), layout, size)
+
+		try:
+			makedirs(cache_dir, exist_ok=True)
+			# Written then renamed, so another copy of the game never reads half a file
+			atlas.save(cache_path + ".tmp", "PNG")
+			replace(cache_path + ".tmp", cache_path)
+		except OSError as e:
+			print("Could not cache the sprite atlas: %s" % e)
+
+	return {key: atlas.crop(box) for key, box in layout.items()}
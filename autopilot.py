@@ -0,0 +1,403 @@
+"""An AI player which steers Pac-Man, for soak testing and demos.
+Each time Pac-Man reaches a junction, every possible move is tried in rollouts: simplified games played out
+a cell at a time, with the ghosts moved by their real pathing functions. The rollouts run on a pool of worker
+processes within a time budget, and the best move is sent to the game as if its key had been pressed"""
+
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor, wait as futures_wait
+from multiprocessing import get_context, get_all_start_methods
+from math import inf
+from random import Random
+from time import perf_counter, time
+
+from config import FPS, SUBUNITS_PER_CELL
+from sprite import world_indices_to_fixed as world2fixed
+from vector import Vec2, UP, DOWN, LEFT, RIGHT
+from world_components import GhostState, Pellet, PowerPellet, Fruit, PATHING_FUNCTIONS, get_neighbours, remove_reverse_moves
+
+DIRECTION_NAMES = {(0, -1): "up", (0, 1): "down", (-1, 0): "left", (1, 0): "right"}
+
+# Value of losing a life in a rollout, compared to 10 for a pellet
+DEATH_PENALTY = 5000
+
+# Pac-Man considers turning back along a corridor if a ghost is this many cells away
+DANGER_DISTANCE = 6
+
+# Rewards found later in a rollout are less certain, so are worth less
+DISCOUNT = 0.97
+
+def open_directions(walls, cell):
+	"""Returns the directions Pac-Man can move in from 'cell', an (x, y) tuple"""
+	height = len(walls)
+	width = len(walls[0])
+	x, y = cell
+
+	return [d for d in (UP, DOWN, LEFT, RIGHT) if not walls[(y + d.y) % height][(x + d.x) % width]]
+
+def playout_direction(walls, cell, direction, rng):
+	"""Returns the direction Pac-Man moves in during a rollout.
+	Pac-Man keeps going along corridors and picks a random way on at junctions and corners"""
+	options = open_directions(walls, cell)
+	forwards = [d for d in options if not (d.x == -direction.x and d.y == -direction.y)]
+
+	if len(options) == 2 and len(forwards) == 1 and forwards[0].is_equal(direction):
+		return direction
+
+	return rng.choice(forwards or options)
+
+def nearest_pellet_distance(walls, food, cell):
+	"""Returns the number of cells from 'cell' to the nearest pellet or fruit, or 0 if there are none"""
+	height = len(walls)
+	width = len(walls[0])
+	seen = {cell}
+	frontier = [cell]
+	distance = 0
+
+	while frontier:
+		next_frontier = []
+		for x, y in frontier:
+			if (x, y) in food:
+				return distance
+
+			for d in (UP, DOWN, LEFT, RIGHT):
+				neighbour = ((x + d.x) % width, (y + d.y) % height)
+				if neighbour not in seen and not walls[neighbour[1]][neighbour[0]]:
+					seen.add(neighbour)
+					next_frontier.append(neighbour)
+
+		frontier = next_frontier
+		distance += 1
+
+	return 0
+
+def move_ghost(walls, ghost, pacman, pacman_direction, blinky):
+	"""Move a rollout ghost one cell, as Ghost.update() would when the ghost reaches the centre of a cell"""
+	cell, direction, state, path = ghost[0], ghost[1], ghost[2], ghost[3]
+
+	possibles = get_neighbours(walls, cell)
+	possibles_no_reverse = remove_reverse_moves(cell, direction, possibles) or possibles
+
+	if len(possibles) > 2:
+		if state == GhostState.NORMAL.value:
+			next_square = PATHING_FUNCTIONS[path](possibles_no_reverse, pacman, pacman_direction, blinky, cell)
+		else:
+			next_square = ghost[5].choice(possibles_no_reverse)
+	elif len(possibles) == 2:
+		next_square = possibles_no_reverse[0]
+	else:
+		# Going off the side of the map, keep the same direction on the other side
+		ghost[0] = possibles[0]
+		return
+
+	ghost[0] = next_square
+	ghost[1] = Vec2(next_square.x - cell.x, next_square.y - cell.y)
+
+def rollout(walls, food, power_pellets, pacman, direction, ghosts, depth, panic_steps, rng):
+	"""Plays out one possible future of Pac-Man moving in 'direction' from the cell 'pacman', a cell per step.
+	Returns the value of that future to Pac-Man"""
+	height = len(walls)
+	width = len(walls[0])
+
+	# [cell, direction, state, ghost type, panic steps left, rng]
+	ghosts = [[Vec2(x, y), Vec2(dx, dy), state, path, panic, rng] for x, y, dx, dy, state, path, panic in ghosts]
+	eaten = set()
+	value = 0
+	discount = 1
+
+	for step in range(depth):
+		if step > 0:
+			direction = playout_direction(walls, pacman, direction, rng)
+
+		previous = pacman
+		x = (pacman[0] + direction.x) % width
+		y = (pacman[1] + direction.y) % height
+		if not walls[y][x]:
+			pacman = (x, y)
+
+		if pacman in food and pacman not in eaten:
+			eaten.add(pacman)
+			value += food[pacman] * discount
+
+			if pacman in power_pellets:
+				for ghost in ghosts:
+					if ghost[2] == GhostState.NORMAL.value:
+						ghost[2] = GhostState.PANIC.value
+						ghost[4] = panic_steps
+
+		pacman_cell = Vec2(*pacman)
+		blinky = next((ghost[0] for ghost in ghosts if ghost[3] == "blinky"), pacman_cell)
+
+		for ghost in ghosts:
+			if ghost[2] in (GhostState.PEN.value, GhostState.DEAD.value):
+				continue
+
+			ghost_previous = ghost[0]
+
+			# Panicking ghosts move at 2/3 speed
+			if ghost[2] != GhostState.PANIC.value or step % 3 != 2:
+				move_ghost(walls, ghost, pacman_cell, direction, blinky)
+
+			if ghost[2] == GhostState.PANIC.value:
+				ghost[4] -= 1
+				if ghost[4] <= 0:
+					ghost[2] = GhostState.NORMAL.value
+
+			# Pac-Man and the ghost are in the same cell, or passed through each other
+			caught = ghost[0].is_equal(pacman_cell)
+			crossed = ghost_previous.is_equal(pacman_cell) and ghost[0].x == previous[0] and ghost[0].y == previous[1]
+
+			if ghost[2] == GhostState.PANIC.value:
+				if caught or crossed:
+					ghost[2] = GhostState.DEAD.value
+					value += 200 * discount
+			elif caught or crossed or abs(ghost[0].x - pacman[0]) + abs(ghost[0].y - pacman[1]) == 1:
+				# Rollouts move a whole cell at a time, so being next to a ghost is too close to be sure of escaping
+				return value - DEATH_PENALTY * discount
+
+		discount *= DISCOUNT
+
+	return value
+
+def evaluate_move(walls, food, power_pellets, pacman, direction, ghosts, depth, panic_steps, deadline, max_rollouts, seed):
+	"""Runs rollouts of Pac-Man moving in 'direction' until 'deadline', a time.time(), or 'max_rollouts' have been run.
+	Returns the direction, the value of the best rollout, and how many were run.
+	The ghosts only act randomly when panicking, so the best rollout is a path Pac-Man could really take"""
+	rng = Random(seed)
+	direction = Vec2(*direction)
+	best = -inf
+	rollouts = 0
+
+	while rollouts < max_rollouts and (rollouts == 0 or time() < deadline):
+		best = max(best, rollout(walls, food, power_pellets, pacman, direction, ghosts, depth, panic_steps, rng))
+		rollouts += 1
+
+	# When no rollout reaches any food, prefer the move which gets closest to it
+	start = ((pacman[0] + direction.x) % len(walls[0]), (pacman[1] + direction.y) % len(walls))
+	if walls[start[1]][start[0]]:
+		start = pacman
+
+	return (direction.x, direction.y), best - nearest_pellet_distance(walls, food, start), rollouts
+
+def ghost_nearby(cell, ghosts):
+	"""Returns True if any ghost which can catch Pac-Man is within DANGER_DISTANCE cells of 'cell'"""
+	for ghost in ghosts:
+		if ghost.state == GhostState.NORMAL and abs(ghost.cell.x - cell[0]) + abs(ghost.cell.y - cell[1]) <= DANGER_DISTANCE:
+			return True
+
+	return False
+
+def at_centre(sprite):
+	"""Returns True if the sprite is as close to the centre of its cell, along the way it is moving, as it will get"""
+	centre = world2fixed(sprite.cell.x, sprite.cell.y)
+
+	if sprite.direction.x != 0:
+		return abs(sprite.pos.x - centre.x) <= sprite.speed // 2
+
+	return abs(sprite.pos.y - centre.y) <= sprite.speed // 2
+
+class Autopilot:
+	"""Steers Pac-Man, making a decision each time Pac-Man reaches a junction.
+	Decisions are made in the background, so the game loop never waits for the workers"""
+
+	def __init__(self, workers, budget_ms, depth, max_rollouts=500):
+		self.workers = workers
+		self.budget = budget_ms / 1000
+		self.depth = depth
+		self.max_rollouts = max_rollouts
+		self.executor = None
+
+		self.decided_cell = None
+		self.next_direction = None
+		self.pending = None
+		self.seed = 0
+
+		self.started = None
+		self.decisions = 0
+		self.budget_overruns = 0
+		self.errors = 0
+		self.rollouts = 0
+		self.total_latency = 0
+		self.max_latency = 0
+
+	def start(self):
+		"""Start the worker pool. Call this before the game creates its window or any threads,
+		as forking a process running those can leave the workers holding locks which are never released"""
+		executor = self.get_executor()
+
+		# A forked pool only starts its workers with the first task
+		futures_wait([executor.submit(int) for _ in range(self.workers)])
+
+	def get_executor(self):
+		"""Returns the worker pool, starting it the first time it is needed"""
+		if self.executor is None:
+			if "fork" in get_all_start_methods():
+				# Spawned workers would import game_solution and open another window, forked ones don't
+				self.executor = ProcessPoolExecutor(self.workers, mp_context=get_context("fork"))
+			else:
+				self.executor = ThreadPoolExecutor(self.workers)
+
+		return self.executor
+
+	def replace_broken_pool(self):
+		"""Carry on with threads when a worker process has died, rather than forking again from the running game"""
+		self.executor.shutdown(wait=False, cancel_futures=True)
+		self.executor = ThreadPoolExecutor(self.workers)
+
+	def update(self, walls, world, pacman, ghosts, speed, panic_time, wait=False):
+		"""Called every tick with the current game. Returns the name of a direction to turn Pac-Man, or None.
+		If 'wait' is True, decisions are waited for rather than made while the game carries on"""
+		if self.started is None:
+			self.started = perf_counter()
+
+		if self.pending is not None:
+			self.collect()
+
+		cell = (pacman.cell.x, pacman.cell.y)
+
+		# Stuck against a wall with nothing decided, so decide again
+		if self.pending is None and self.next_direction is None and pacman.will_collide(walls):
+			self.decided_cell = None
+
+		if self.pending is None and cell != self.decided_cell:
+			self.decided_cell = cell
+			self.next_direction = None
+
+			options = open_directions(walls, cell)
+			reverse = pacman.direction.scale(-1)
+			in_corridor = len(options) == 2 and any(d.is_equal(pacman.direction) for d in options) and any(d.is_equal(reverse) for d in options)
+
+			if len(options) == 1:
+				self.next_direction = options[0]
+			elif not in_corridor or ghost_nearby(cell, ghosts):
+				# In corridors the only choice is to turn back, which is only worth considering near a ghost
+				self.decide(walls, world, cell, options, ghosts, speed, panic_time)
+
+				if wait:
+					futures_wait(self.pending[0], timeout=self.budget)
+					self.collect()
+
+		if self.next_direction is None:
+			return None
+
+		direction = self.next_direction
+		blocked = pacman.will_collide(walls)
+		reverse = direction.is_equal(pacman.direction.scale(-1))
+
+		if pacman.will_collide(walls, direction):
+			# Can't ever make the move from here, so decide again
+			if blocked:
+				self.next_direction = None
+				self.decided_cell = None
+		elif blocked or reverse or at_centre(pacman):
+			# Turning before the centre of the cell can leave Pac-Man stuck on the corner of a wall
+			self.next_direction = None
+
+			if not direction.is_equal(pacman.direction):
+				return DIRECTION_NAMES[(direction.x, direction.y)]
+
+		return None
+
+	def decide(self, walls, world, cell, options, ghosts, speed, panic_time):
+		"""Start evaluating each of the moves in 'options' on the worker pool"""
+		food = {}
+		power_pellets = set()
+		for y, row in enumerate(world):
+			for x, square in enumerate(row):
+				if isinstance(square, Pellet) and not square.eaten:
+					if isinstance(square, Fruit):
+						food[(x, y)] = square.score_bonus
+					elif isinstance(square, PowerPellet):
+						food[(x, y)] = 50
+						power_pellets.add((x, y))
+					else:
+						food[(x, y)] = 10
+
+		# Pac-Man and the ghosts move a cell per rollout step, so convert timers from ticks to steps
+		ghost_states = [(g.cell.x, g.cell.y, g.direction.x, g.direction.y, g.state.value, g.ghost_type, g.panic_timer * speed // SUBUNITS_PER_CELL) for g in ghosts]
+		panic_steps = panic_time * FPS * speed // SUBUNITS_PER_CELL
+
+		# Leave part of the budget for sending the results back
+		submitted = perf_counter()
+		deadline = time() + self.budget * 0.75
+
+		futures = []
+		finished = []
+		for direction in options:
+			self.seed += 1
+			args = (walls, food, power_pellets, cell, (direction.x, direction.y), ghost_states, self.depth, panic_steps, deadline, self.max_rollouts, self.seed)
+			try:
+				future = self.get_executor().submit(evaluate_move, *args)
+			except BrokenExecutor:
+				self.errors += 1
+				self.replace_broken_pool()
+				future = self.executor.submit(evaluate_move, *args)
+
+			# Record when each evaluation finishes, rather than when the next tick notices
+			future.add_done_callback(lambda _: finished.append(perf_counter()))
+			futures.append(future)
+
+		self.pending = (futures, finished, submitted)
+
+	def collect(self):
+		"""Choose a move once every evaluation has finished, or with those which have once over budget"""
+		futures, finished, submitted = self.pending
+		done = [f for f in futures if f.done()]
+
+		if len(done) < len(futures):
+			latency = perf_counter() - submitted
+
+			if latency < self.budget or len(done) == 0:
+				return
+
+			for future in futures:
+				future.cancel()
+		elif len(finished) == len(futures):
+			latency = max(finished) - submitted
+		else:
+			latency = perf_counter() - submitted
+
+		if latency > self.budget:
+			self.budget_overruns += 1
+
+		# A failed evaluation leaves its move out. If they all fail, Pac-Man keeps going the way it is
+		results = []
+		for future in done:
+			try:
+				results.append(future.result())
+			except BrokenExecutor:
+				self.errors += 1
+				if isinstance(self.executor, ProcessPoolExecutor):
+					self.replace_broken_pool()
+			except Exception:
+				self.errors += 1
+
+		self.pending = None
+		if len(results) == 0:
+			return
+
+		best = max(results, key=lambda result: result[1])
+		self.next_direction = Vec2(*best[0])
+
+		self.decisions += 1
+		self.rollouts += sum(result[2] for result in results)
+		self.total_latency += latency
+		self.max_latency = max(self.max_latency, latency)
+
+	def stats(self):
+		"""Returns statistics on the decisions made, for the telemetry exports"""
+		elapsed = perf_counter() - self.started if self.started is not None else 0
+
+		return {
+			"workers": self.workers,
+			"budget_ms": self.budget * 1000,
+			"decisions": self.decisions,
+			"decisions_per_second": self.decisions / elapsed if elapsed > 0 else 0,
+			"budget_overruns": self.budget_overruns,
+			"errors": self.errors,
+			"rollouts_per_decision": self.rollouts / self.decisions if self.decisions > 0 else 0,
+			"latency_ms_mean": self.total_latency / self.decisions * 1000 if self.decisions > 0 else 0,
+			"latency_ms_max": self.max_latency * 1000
+		}
+
+	def close(self):
+		if self.executor is not None:
+			self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,70 @@
+"""Recognises cheat codes typed during a game"""
+
+class CheatCodes:
+	"""Matches keypresses against any number of cheat codes at once, with an Aho-Corasick automaton.
+	Each key is a single dictionary lookup however many codes there are, and no keypresses are kept,
+	as the automaton's state is all that is needed to know how much of each code has been typed"""
+
+	def __init__(self):
+		self.codes = {}
+		self.transitions = None
+		self.state = 0
+
+	def add(self, code, action):
+		"""Call 'action' whenever 'code' is typed"""
+		self.codes[code] = action
+		self.transitions = None
+
+	def build(self):
+		"""Build the automaton, with a transition from every state for every key used in a code"""
+		keys = {key for code in self.codes for key in code}
+
+		# A trie of the codes, where each state is how much of a code has been typed
+		trie = [{}]
+		outputs = [[]]
+		for code, action in self.codes.items():
+			state = 0
+			for key in code:
+				if key not in trie[state]:
+					trie.append({})
+					outputs.append([])
+					trie[state][key] = len(trie) - 1
+				state = trie[state][key]
+			outputs[state].append(action)
+
+		# Fill in the missing transitions breadth first, following the longest suffix which is also a state
+		self.transitions = [dict() for _ in trie]
+		fallback = [0] * len(trie)
+		queue = []
+
+		for key in keys:
+			next_state = trie[0].get(key, 0)
+			self.transitions[0][key] = next_state
+			if next_state != 0:
+				queue.append(next_state)
+
+		for state in queue:
+			outputs[state] = outputs[state] + outputs[fallback[state]]
+
+			for key in keys:
+				if key in trie[state]:
+					next_state = trie[state][key]
+					fallback[next_state] = self.transitions[fallback[state]][key]
+					self.transitions[state][key] = next_state
+					queue.append(next_state)
+				else:
+					self.transitions[state][key] = self.transitions[fallback[state]][key]
+
+		self.outputs = outputs
+		self.state = 0
+
+	def press(self, key):
+		"""Move on by one key, calling the action of each code which has just been completed"""
+		if self.transitions is None:
+			self.build()
+
+		# Keys which aren't in any code start matching again from the beginning
+		self.state = self.transitions[self.state].get(key, 0)
+
+		for action in self.outputs[self.state]:
+			action()
@@ -11,3 +11,98 @@ GRID_NUM_CELLS_WIDTH = 21
 GRID_NUM_CELLS_HEIGHT = 27
 
 FPS = 30
+
+# Directory that frame-pacing and startup reports are exported to. Set FRAME_PACING_TELEMETRY to export a report after each game,
+# and STARTUP_REPORT to add the time each part of startup took to startup.jsonl. Set STARTUP_REPORT_PRINT to also print it
+TELEMETRY_DIR = "telemetry"
+FRAME_PACING_TELEMETRY = False
+STARTUP_REPORT = False
+STARTUP_REPORT_PRINT = False
+
+# Moving sprites are simulated in integer fixed-point sub-units, independent of the size cells are drawn at.
+# 192 sub-units per cell is 6 per pixel at the default cell width, so every speed used is a whole number
+SUBUNITS_PER_CELL = 192
+
+# Pac-Man and a ghost touch when their centres are closer than this on both axes at any point during a tick
+CONTACT_DISTANCE = SUBUNITS_PER_CELL // 2
+
+# Speeds are in sub-units per tick
+BASE_SPEED = 18
+SPEED_PER_LEVEL = 3
+
+# Set NETWORK_SERVER to publish games so they can be watched or joined with "JOIN LAN GAME" on another machine.
+# The server listens on NETWORK_HOST ("0.0.0.0" accepts other machines), clients connect to it
+NETWORK_SERVER = False
+NETWORK_HOST = "127.0.0.1"
+NETWORK_PORT = 50007
+
+# Snapshots of the last REWIND_BUFFER_SECONDS are kept, and the rewind key goes back REWIND_SECONDS
+REWIND_BUFFER_SECONDS = 10
+REWIND_SECONDS = 1
+
+# Set AUTOPILOT to have an AI steer Pac-Man, see autopilot.py.
+# Each decision has AUTOPILOT_BUDGET_MS on AUTOPILOT_WORKERS processes, simulating AUTOPILOT_DEPTH cells ahead
+AUTOPILOT = False
+AUTOPILOT_WORKERS = 4
+AUTOPILOT_BUDGET_MS = 20
+AUTOPILOT_DEPTH = 40
+
+# Set RECORD_GAMES to record each game to RECORDING_DIR, which export.py can turn into a video
+RECORD_GAMES = False
+RECORDING_DIR = "recordings"
+
+# Set QUALITY_GOVERNOR to leave out animation and HUD detail while frames take longer than 1/FPS, so the game keeps its speed
+# on slow machines, see quality.py
+QUALITY_GOVERNOR = True
+
+# Speeds the turbo key cycles through, in ticks simulated per frame drawn. 0 simulates as many as fit in each frame
+TURBO_SPEEDS = (1, 2, 8, 0)
+
+# Set EVENT_LOG to log gameplay events, like pellets eaten and deaths, to EVENT_DIR, see events.py.
+# Up to EVENT_BUFFER_SIZE events are kept in memory, and they are written in batches of EVENT_BATCH_SIZE
+EVENT_LOG = False
+EVENT_DIR = "events"
+EVENT_BUFFER_SIZE = 4096
+EVENT_BATCH_SIZE = 256
+
+# Set LEVEL_WATCH to apply changes to grid.txt while the game is running, checking every LEVEL_WATCH_INTERVAL_MS
+LEVEL_WATCH = False
+LEVEL_WATCH_INTERVAL_MS = 500
+
+# The levels played, either a level pack made with levels.py or a single level file played with increasing speed
+LEVEL_PACK = "grid.txt"
+
+# Set LEAK_DETECTOR to count canvas items, Tk images and fonts and Python memory every LEAK_CHECK_INTERVAL_MS,
+# reporting counts which have grown for LEAK_WINDOW checks in a row. Tracing Python memory slows the game down
+LEAK_DETECTOR = False
+LEAK_CHECK_INTERVAL_MS = 10000
+LEAK_WINDOW = 6
+
+# The game loop stops while the game is paused or another screen is shown, and also while the window doesn't have focus
+# if SUSPEND_UNFOCUSED is set, unless the game is being served on the network, played by the autopilot or recorded.
+# Set IDLE_REPORT to print the CPU time and wake-ups used while it was stopped, see IdleMeter
+SUSPEND_UNFOCUSED = True
+IDLE_REPORT = False
+
+# Set METRICS_SERVER to serve live statistics, like frame times, canvas items and memory, in the Prometheus text format
+# at http://METRICS_HOST:METRICS_PORT/metrics, see metrics.py. Canvas items and memory are counted every METRICS_SAMPLE_MS
+METRICS_SERVER = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+METRICS_SAMPLE_MS = 1000
+
+# Set ASYNC_LOOP to run the window from an asyncio loop, processing its events every ASYNC_PUMP_MS,
+# or every ASYNC_IDLE_PUMP_MS while the game loop is stopped.
+# Saves, scores and telemetry are then written in the background instead of pausing the game
+ASYNC_LOOP = False
+ASYNC_PUMP_MS = 4
+ASYNC_IDLE_PUMP_MS = 100
+
+# How many times larger than S_WIDTH x S_HEIGHT the game is drawn. None fits the window to the screen,
+# in whole steps on screens larger than the game. Sprites are cached already scaled in ATLAS_CACHE_DIR
+DISPLAY_SCALE = None
+ATLAS_CACHE_DIR = "cache"
+
+# How sprites are drawn: "items" gives each its own canvas item, "framebuffer" composites them into a single image,
+# see framebuffer.py. Compare the two with loadtest.py --renderer both
+RENDERER = "items"
@@ -0,0 +1,132 @@
+"""Keeps every Pac-Man and ghost in a game, with the state they change each tick held in arrays"""
+
+from array import array
+
+from config import SUBUNITS_PER_CELL, CONTACT_DISTANCE
+
+class Actors:
+	"""Any number of Pac-Men and ghosts, each given a slot when it is created (see MovingSprite).
+	Each actor's position, its position at the start of the tick, its direction and state are elements of arrays
+	indexed by its slot, which the sprites read and write through properties. Steps which apply to every actor
+	are then loops over the arrays, and the game finds actors by what they are rather than where they are in a list"""
+
+	FIELDS = ("x", "y", "last_x", "last_y", "dir_x", "dir_y", "state")
+
+	def __init__(self):
+		for name in self.FIELDS:
+			setattr(self, name, array("q"))
+
+		self.sprites = [] # In order of slot
+		self.pacmen = []
+		self.ghosts = []
+
+	def __len__(self):
+		return len(self.sprites)
+
+	def __iter__(self):
+		return iter(self.sprites)
+
+	def new_slot(self, sprite):
+		"""Returns the slot of a new actor, which is a ghost if 'sprite' has a ghost_type"""
+		for name in self.FIELDS:
+			getattr(self, name).append(0)
+
+		self.sprites.append(sprite)
+		if hasattr(sprite, "ghost_type"):
+			self.ghosts.append(sprite)
+		else:
+			self.pacmen.append(sprite)
+
+		return len(self.sprites) - 1
+
+	def clear(self):
+		"""Remove every actor, deleting their canvas items"""
+		for sprite in self.sprites:
+			sprite.remove()
+
+		for name in self.FIELDS:
+			del getattr(self, name)[:]
+
+		self.sprites.clear()
+		self.pacmen.clear()
+		self.ghosts.clear()
+
+	def ghost(self, ghost_type):
+		"""Returns the first ghost with the given personality"""
+		return next(ghost for ghost in self.ghosts if ghost.ghost_type == ghost_type)
+
+	def start_tick(self):
+		"""Remember where every actor is before it moves, see collisions()"""
+		self.last_x[:] = self.x
+		self.last_y[:] = self.y
+
+	def nearest_pacman(self, ghost):
+		"""Returns the Pac-Man which 'ghost' chases, the closest one if there are several"""
+		if len(self.pacmen) == 1:
+			return self.pacmen[0]
+
+		x = self.x[ghost.slot]
+		y = self.y[ghost.slot]
+		return min(self.pacmen, key=lambda pacman: abs(self.x[pacman.slot] - x) + abs(self.y[pacman.slot] - y))
+
+	def collisions(self, walls):
+		"""Returns a (Pac-Man, ghost) pair for each Pac-Man and ghost which touched this tick, either by ending it in
+		the same cell or by coming within CONTACT_DISTANCE on both axes at any point of their moves (see swept_contact()).
+		'walls' gives the size of the world"""
+		world_width = len(walls[0]) * SUBUNITS_PER_CELL
+		world_height = len(walls) * SUBUNITS_PER_CELL
+		x, y, last_x, last_y = self.x, self.y, self.last_x, self.last_y
+
+		pairs = []
+		for pacman in self.pacmen:
+			i = pacman.slot
+			cell_x = x[i] // SUBUNITS_PER_CELL
+			cell_y = y[i] // SUBUNITS_PER_CELL
+			move_x = wrapped_offset(x[i] - last_x[i], world_width)
+			move_y = wrapped_offset(y[i] - last_y[i], world_height)
+
+			for ghost in self.ghosts:
+				j = ghost.slot
+				same_cell = x[j] // SUBUNITS_PER_CELL == cell_x and y[j] // SUBUNITS_PER_CELL == cell_y
+
+				if same_cell or swept_contact(
+					(wrapped_offset(last_x[i] - last_x[j], world_width), wrapped_offset(last_y[i] - last_y[j], world_height)),
+					(move_x - wrapped_offset(x[j] - last_x[j], world_width), move_y - wrapped_offset(y[j] - last_y[j], world_height))):
+					pairs.append((pacman, ghost))
+
+		return pairs
+
+def wrapped_offset(offset, size):
+	"""Returns the shortest offset equivalent to 'offset' in a world 'size' sub-units across which wraps around at the edges"""
+	return (offset + size // 2) % size - size // 2
+
+def swept_contact(start, change):
+	"""Returns True if two actors came within CONTACT_DISTANCE of each other on both axes during the tick,
+	where 'start' is the offset between them at the start of the tick and 'change' how much it changed by,
+	each moving in a straight line. Unlike comparing where they end up, this catches actors which pass
+	through each other in a single tick however fast they move"""
+
+	# Find the fraction of the tick 't' when the actors are close on each axis, and check whether the two overlap.
+	# Integer fractions are compared by cross-multiplying, so the result is identical on every machine
+	t_start = (0, 1)
+	t_end = (1, 1)
+	for offset, rate in zip(start, change):
+		if rate == 0:
+			if abs(offset) >= CONTACT_DISTANCE:
+				return False
+			continue
+
+		# Mirror the axis if needed, so the offset is increasing
+		if rate < 0:
+			offset, rate = -offset, -rate
+
+		# Close while -CONTACT_DISTANCE < offset + t * rate < CONTACT_DISTANCE
+		enter = (-CONTACT_DISTANCE - offset, rate)
+		leave = (CONTACT_DISTANCE - offset, rate)
+
+		if enter[0] * t_start[1] > t_start[0] * enter[1]:
+			t_start = enter
+		if leave[0] * t_end[1] < t_end[0] * leave[1]:
+			t_end = leave
+
+	return t_start[0] * t_end[1] < t_end[0] * t_start[1]
@@ -0,0 +1,72 @@
+"""Logs gameplay events, like pellets eaten and deaths, for analysing how games are played.
+
+Each game is written to its own file, one JSON object per line, e.g.
+{"event": "death", "level": 0, "tick": 412, "x": 10, "y": 15, "ghost": "blinky"}
+The tick counts from the start of each life, and x and y are the indices of Pac-Man's cell"""
+
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps
+from os import makedirs, path
+from time import strftime
+
+class EventLog:
+	"""Writes events to a file in 'directory'. Logging an event only stores a tuple in a ring buffer of 'capacity' events,
+	which is encoded and written on a background thread in batches of 'batch_size'.
+	If the events come faster than they can be written the oldest are dropped, so memory use is bounded, and counted"""
+	def __init__(self, directory, capacity, batch_size):
+		makedirs(directory, exist_ok=True)
+
+		self.path = path.join(directory, "events_" + strftime("%Y%m%d_%H%M%S") + ".jsonl")
+		self.file = open(self.path, "w")
+
+		self.buffer = [None] * capacity
+		self.batch_size = min(batch_size, capacity)
+		self.start = 0 # Number of events logged before the oldest one still in the buffer
+		self.end = 0 # Number of events logged
+		self.dropped = 0
+
+		# Only one batch is written at a time, so the events waiting to be written are always in the buffer
+		self.executor = ThreadPoolExecutor(1)
+		self.writing = None
+
+	def log(self, event, level, tick, cell, data=None):
+		"""Log 'event' at Pac-Man's 'cell', with any other details in the dictionary 'data'"""
+		self.buffer[self.end % len(self.buffer)] = (event, level, tick, cell.x, cell.y, data)
+		self.end += 1
+
+		if self.end - self.start > len(self.buffer):
+			self.start += 1
+			self.dropped += 1
+
+		if self.end - self.start >= self.batch_size and (self.writing is None or self.writing.done()):
+			self.flush()
+
+	def flush(self):
+		"""Start writing the events in the buffer"""
+		capacity = len(self.buffer)
+		events = [self.buffer[i % capacity] for i in range(self.start, self.end)]
+		self.start = self.end
+
+		if len(events) > 0:
+			self.writing = self.executor.submit(self.write, events)
+
+	def write(self, events):
+		lines = []
+		for event, level, tick, x, y, data in events:
+			entry = {"event": event, "level": level, "tick": tick, "x": x, "y": y}
+			if data is not None:
+				entry |= data
+			lines.append(dumps(entry) + "\n")
+
+		self.file.writelines(lines)
+		self.file.flush()
+
+	def close(self):
+		"""Write any events left in the buffer, and how many were dropped, then close the file"""
+		self.flush()
+		self.executor.shutdown()
+
+		if self.dropped > 0:
+			self.file.write(dumps({"event": "dropped", "count": self.dropped}) + "\n")
+
+		self.file.close()
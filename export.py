@@ -0,0 +1,131 @@
+"""Exports recorded games as an image sequence or an animated GIF/WebP, as fast as they can be drawn.
+
+Usage: python export.py <recording> <output> [--levels PACK] [--scale S] [--every N] [--workers N]
+An output ending in .gif or .webp is written as an animation, anything else is a directory of PNG frames.
+Animations are held in memory while they are encoded, so use --every and --scale, or PNG frames, for long games.
+Recordings are made by the game when RECORD_GAMES is set in config.py"""
+
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from os import makedirs, path
+from time import perf_counter
+
+from config import FPS, LEVEL_PACK
+from offscreen import OffscreenRenderer
+from recording import read_recording
+
+# Frames are sent to worker processes in chunks of this many states
+CHUNK_SIZE = 32
+
+worker_renderer = None
+
+def init_worker(pack_path, scale):
+	global worker_renderer
+	worker_renderer = OffscreenRenderer(pack_path, scale)
+
+def render_chunk(states, animated, directory, first_index):
+	"""Draw a chunk of frames in a worker process.
+	Frames for an animation are returned, already reduced to a palette for GIFs, otherwise they are saved as PNGs here"""
+	frames = []
+
+	for i, state in enumerate(states):
+		frame = worker_renderer.render(state)
+
+		if directory is not None:
+			frame.save(path.join(directory, "frame_%06d.png" % (first_index + i)), compress_level=1)
+		elif animated == "gif":
+			frames.append(worker_renderer.quantize(frame))
+		else:
+			frames.append(frame)
+
+	return frames if directory is None else len(states)
+
+def chunks(states, size):
+	states = iter(states)
+	while True:
+		chunk = list(islice(states, size))
+		if len(chunk) == 0:
+			return
+		yield chunk
+
+def render_frames(states, animated, directory, pack_path, scale, workers):
+	"""Yields the results of render_chunk() for each chunk of 'states', in order.
+	Only a few chunks are in flight at once, so long recordings aren't all held in memory"""
+	if workers <= 1:
+		init_worker(pack_path, scale)
+		first_index = 0
+		for chunk in chunks(states, CHUNK_SIZE):
+			yield render_chunk(chunk, animated, directory, first_index)
+			first_index += len(chunk)
+		return
+
+	with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(pack_path, scale)) as executor:
+		in_flight = deque()
+		first_index = 0
+
+		for chunk in chunks(states, CHUNK_SIZE):
+			in_flight.append(executor.submit(render_chunk, chunk, animated, directory, first_index))
+			first_index += len(chunk)
+
+			if len(in_flight) >= workers * 2:
+				yield in_flight.popleft().result()
+
+		while in_flight:
+			yield in_flight.popleft().result()
+
+def export_frames(states, output_path, pack_path=LEVEL_PACK, scale=1, every=1, workers=1):
+	"""Draws every 'every'th state in 'states' and writes them to 'output_path'.
+	Returns the number of frames written"""
+	states = islice(states, 0, None, every)
+	extension = path.splitext(output_path)[1].lower()
+
+	if extension in (".gif", ".webp"):
+		animated = extension[1:]
+
+		num_frames = 0
+
+		def frames():
+			nonlocal num_frames
+			for chunk in render_frames(states, animated, None, pack_path, scale, workers):
+				for frame in chunk:
+					num_frames += 1
+					yield frame
+
+		frame_iter = frames()
+		first = next(frame_iter, None)
+		if first is None:
+			return 0
+
+		# Favour encoding speed: GIF frames already share a palette, and the fastest lossless WebP suits the sprites
+		if animated == "gif":
+			options = {"optimize": False}
+		else:
+			options = {"lossless": True, "method": 0}
+
+		first.save(output_path, save_all=True, append_images=frame_iter, duration=round(1000 * every / FPS), loop=0, **options)
+		return num_frames
+
+	makedirs(output_path, exist_ok=True)
+	return sum(render_frames(states, None, output_path, pack_path, scale, workers))
+
+def main():
+	parser = ArgumentParser(description="Export a recorded game as an image sequence or an animated GIF/WebP")
+	parser.add_argument("recording")
+	parser.add_argument("output", help="a .gif or .webp file, or a directory for PNG frames")
+	parser.add_argument("--levels", default=LEVEL_PACK, help="the level pack or level file the game was played with")
+	parser.add_argument("--scale", type=float, default=1, help="size of the frames compared to the game")
+	parser.add_argument("--every", type=int, default=1, help="only export every Nth tick")
+	parser.add_argument("--workers", type=int, default=1, help="number of processes drawing frames")
+	args = parser.parse_args()
+
+	start = perf_counter()
+	num_frames = export_frames(read_recording(args.recording), args.output, args.levels, args.scale, args.every, args.workers)
+	elapsed = perf_counter() - start
+
+	print("Exported %d frames in %.2f s (%.1f frames/s, %.1fx real time)" % (
+		num_frames, elapsed, num_frames / elapsed, num_frames * args.every / FPS / elapsed))
+
+if __name__ == "__main__":
+	main()
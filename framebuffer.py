@@ -0,0 +1,212 @@
+"""Draws sprites into a single image, shown as one canvas item, instead of giving every sprite its own canvas item.
+
+FrameCanvas has the canvas methods sprites use, so it can be passed to them in place of the canvas.
+The level is kept drawn in a background image, and each frame only the tiles of the image which have changed are redrawn"""
+
+from PIL import Image, ImageTk
+
+# Size in pixels of the square tiles the image is redrawn in, and sprites are indexed by
+TILE_SIZE = 64
+
+class FrameItem:
+	"""A sprite drawn into the frame, at 'x', 'y' in pixels of the frame"""
+	__slots__ = ("x", "y", "image", "tags", "hidden", "actor", "box")
+
+	def __init__(self, x, y, image, tags):
+		self.x = x
+		self.y = y
+		self.image = image
+		self.tags = tags
+		self.hidden = False
+
+		# Actors are drawn above the level, which is drawn into the background
+		self.actor = "actor" in tags
+
+class FrameCanvas:
+	"""Composites sprites into a framebuffer covering 'box' (left, top, right, bottom) of 'canvas', in design units.
+	The framebuffer is shown as a single image on the canvas, below everything else on it, and is updated
+	when Tk is next idle after a sprite changes, so any number of changes in a tick only cost one update"""
+	def __init__(self, canvas, box, display_scale=1, background="black"):
+		self.canvas = canvas
+		self.left, self.top = box[0], box[1]
+		self.display_scale = display_scale
+		self.size = (round((box[2] - box[0]) * display_scale), round((box[3] - box[1]) * display_scale))
+
+		self.blank = Image.new("RGB", self.size, background)
+		self.background = self.blank.copy()
+		self.frame = self.blank.copy()
+
+		self.photo = ImageTk.PhotoImage(self.frame)
+		self.image_id = canvas.create_image(self.left, self.top, image=self.photo, anchor="nw")
+		canvas.tag_lower(self.image_id)
+
+		self.items = {}
+		self.next_id = 1
+		self.tagged = {} # Tag: ids of the items with it
+		self.tiles = {} # (column, row): ids of the items overlapping the tile
+
+		self.images = {} # PhotoImage: the PIL image it was made from, used to draw it
+		self.tile_photos = {} # Size: PhotoImage tiles of that size are sent to Tk through, see upload()
+		self.dirty_background = set()
+		self.dirty = set()
+		self.present_pending = False
+
+		self.presents = 0
+		self.tiles_drawn = 0
+
+	def create_image(self, x, y, image=None, tags=(), **options):
+		item = FrameItem((x - self.left) * self.display_scale, (y - self.top) * self.display_scale, image, tuple(tags))
+		self.place(item)
+
+		item_id = self.next_id
+		self.next_id += 1
+		self.items[item_id] = item
+
+		for tag in item.tags:
+			self.tagged.setdefault(tag, set()).add(item_id)
+		self.index(item_id, item)
+
+		self.changed(item)
+		return item_id
+
+	def coords(self, item_id, *coords):
+		item = self.items[item_id]
+		if len(coords) == 0:
+			return [item.x / self.display_scale + self.left, item.y / self.display_scale + self.top]
+
+		if len(coords) == 1:
+			coords = coords[0]
+
+		self.changed(item)
+		self.unindex(item_id, item)
+		item.x = (coords[0] - self.left) * self.display_scale
+		item.y = (coords[1] - self.top) * self.display_scale
+		self.place(item)
+		self.index(item_id, item)
+		self.changed(item)
+
+	def itemconfigure(self, tag_or_id, state=None, image=None, **options):
+		"""Change the state or image of an item, or of every item with a tag"""
+		ids = [tag_or_id] if isinstance(tag_or_id, int) else self.tagged.get(tag_or_id, ())
+
+		for item_id in ids:
+			item = self.items[item_id]
+			hidden = item.hidden if state is None else state == "hidden"
+
+			if hidden != item.hidden or (image is not None and image is not item.image):
+				self.changed(item)
+				item.hidden = hidden
+
+				if image is not None and image is not item.image:
+					self.unindex(item_id, item)
+					item.image = image
+					self.place(item)
+					self.index(item_id, item)
+					self.changed(item)
+
+	def delete(self, item_id):
+		item = self.items.pop(item_id)
+		self.changed(item)
+		self.unindex(item_id, item)
+
+		for tag in item.tags:
+			self.tagged[tag].discard(item_id)
+
+	def tag_lower(self, item_id):
+		# Actors are always drawn above the level, and the level's sprites don't overlap, so there is no order to change
+		pass
+
+	def pil_image(self, photo):
+		if photo not in self.images:
+			self.images[photo] = ImageTk.getimage(photo)
+
+		return self.images[photo]
+
+	def place(self, item):
+		"""Work out the box the item covers, centred on its position as the canvas draws images"""
+		image = self.pil_image(item.image)
+		left = round(item.x - image.width / 2)
+		top = round(item.y - image.height / 2)
+		item.box = (left, top, left + image.width, top + image.height)
+
+	def tiles_under(self, box):
+		"""Returns the tiles which 'box' overlaps, only those inside the frame"""
+		columns = range(max(0, box[0] // TILE_SIZE), min(self.size[0] - 1, box[2] - 1) // TILE_SIZE + 1)
+		rows = range(max(0, box[1] // TILE_SIZE), min(self.size[1] - 1, box[3] - 1) // TILE_SIZE + 1)
+
+		return [(column, row) for row in rows for column in columns]
+
+	def index(self, item_id, item):
+		for tile in self.tiles_under(item.box):
+			self.tiles.setdefault(tile, set()).add(item_id)
+
+	def unindex(self, item_id, item):
+		for tile in self.tiles_under(item.box):
+			self.tiles[tile].discard(item_id)
+
+	def changed(self, item):
+		"""Mark the tiles under an item to be redrawn"""
+		tiles = self.tiles_under(item.box)
+		if not item.actor:
+			self.dirty_background.update(tiles)
+		self.dirty.update(tiles)
+
+		if not self.present_pending and len(tiles) > 0:
+			self.present_pending = True
+			self.canvas.after_idle(self.present)
+
+	def draw_tile(self, tile, source, actors):
+		"""Returns the tile copied from 'source', with the level's or the actors' items drawn over it in the order they were created"""
+		left = tile[0] * TILE_SIZE
+		top = tile[1] * TILE_SIZE
+		region = source.crop((left, top, left + TILE_SIZE, top + TILE_SIZE))
+
+		for item_id in sorted(self.tiles.get(tile, ())):
+			item = self.items[item_id]
+			if item.actor == actors and not item.hidden:
+				image = self.pil_image(item.image)
+				region.paste(image, (item.box[0] - left, item.box[1] - top), image)
+
+		return region
+
+	def present(self):
+		"""Redraw the tiles which have changed, and show the frame"""
+		self.present_pending = False
+		if len(self.dirty) == 0:
+			return
+
+		for tile in self.dirty_background:
+			self.background.paste(self.draw_tile(tile, self.blank, False), (tile[0] * TILE_SIZE, tile[1] * TILE_SIZE))
+
+		for tile in self.dirty:
+			self.frame.paste(self.draw_tile(tile, self.background, True), (tile[0] * TILE_SIZE, tile[1] * TILE_SIZE))
+			self.upload(tile)
+
+		self.presents += 1
+		self.tiles_drawn += len(self.dirty)
+		self.dirty_background.clear()
+		self.dirty.clear()
+
+	def upload(self, tile):
+		"""Copy a tile of the frame into the image shown on the canvas, so only the tiles which changed are sent to Tk"""
+		left = tile[0] * TILE_SIZE
+		top = tile[1] * TILE_SIZE
+		box = (left, top, min(left + TILE_SIZE, self.size[0]), min(top + TILE_SIZE, self.size[1]))
+		size = (box[2] - left, box[3] - top)
+
+		# Tiles at the right and bottom edges can be smaller
+		if size not in self.tile_photos:
+			self.tile_photos[size] = ImageTk.PhotoImage("RGB", size)
+
+		tile_photo = self.tile_photos[size]
+		tile_photo.paste(self.frame.crop(box))
+		self.canvas.tk.call(str(self.photo), "copy", str(tile_photo), "-to", left, top)
+
+	def stats(self):
+		"""Returns a dictionary of how much has been drawn"""
+		return {
+			"frames": self.presents,
+			"tiles_drawn": self.tiles_drawn,
+			"tiles_per_frame": self.tiles_drawn / self.presents if self.presents > 0 else 0,
+			"items": len(self.items)
+		}
@@ -1,44 +1,77 @@
 # Screen resolution: 1600x900
 
-from tkinter import Tk, Canvas, StringVar
-from tkinter.font import Font, families
+from time import perf_counter
+startup_start = perf_counter()
+
+from itertools import cycle
+from tkinter import Tk, StringVar
+from tkinter.font import Font
 from PIL import Image, ImageTk
 
-from config import S_HEIGHT, S_WIDTH, FPS
-from sprite import Rect, Sprite, MovingSprite, world_indices_to_screen_coords as world2screen, screen_coords_to_world_indices as screen2world
-from world_components import Ghost, GhostState, Pellet, PowerPellet, Fruit, generate_level, num_pellets_eaten, check_ghost_collisions
+from config import S_HEIGHT, S_WIDTH, FPS, BASE_SPEED, TELEMETRY_DIR, FRAME_PACING_TELEMETRY, STARTUP_REPORT, STARTUP_REPORT_PRINT, NETWORK_SERVER, NETWORK_HOST, NETWORK_PORT, REWIND_BUFFER_SECONDS, REWIND_SECONDS, AUTOPILOT, AUTOPILOT_WORKERS, AUTOPILOT_BUDGET_MS, AUTOPILOT_DEPTH, RECORD_GAMES, RECORDING_DIR, TURBO_SPEEDS, LEVEL_PACK, LEVEL_WATCH, LEVEL_WATCH_INTERVAL_MS, LEAK_DETECTOR, LEAK_CHECK_INTERVAL_MS, LEAK_WINDOW, ASYNC_LOOP, ASYNC_PUMP_MS, DISPLAY_SCALE, ATLAS_CACHE_DIR, EVENT_LOG, EVENT_DIR, EVENT_BUFFER_SIZE, EVENT_BATCH_SIZE, RENDERER, QUALITY_GOVERNOR, METRICS_SERVER, METRICS_HOST, METRICS_PORT, METRICS_SAMPLE_MS, SUSPEND_UNFOCUSED, IDLE_REPORT, ASYNC_IDLE_PUMP_MS, GAME_GRID_WIDTH, GAME_GRID_START_X, GAME_GRID_START_Y, GRID_NUM_CELLS_WIDTH, GRID_NUM_CELLS_HEIGHT
+from sprite import Sprite, MovingSprite, world_indices_to_fixed as world2fixed, set_display_scale
+from world_components import ATLAS_SPRITES, PACMAN_RECTS, GHOST_RECTS, GHOST_TYPES, Ghost, GhostState, Fruit, generate_level, wall_grid, diff_grids, apply_grid_changes, restore_pellets, hide_layer, timers
 from vector import Vec2, UP, DOWN, RIGHT, LEFT
-from widget import CanvasButton, CanvasEntry
-from progress import save, load, Save
+from widget import CanvasButton, CanvasEntry, ScaledCanvas
+from progress import make_save, write_save, load, position_from_save, Save
+from telemetry import FramePacingMonitor, StartupTimer, TickRateMeter, LeakDetector, IdleMeter
+from render_sync import RenderSync
+from framebuffer import FrameCanvas
+from network import EMPTY_STATE, SnapshotServer, SnapshotClient
+from snapshot import SnapshotBuffer, level_pellets, unpack_pellets, unpack_actors
+from autopilot import Autopilot
+from recording import GameRecorder
+from level_watch import LevelWatcher
+from levels import LevelPack
+from cheats import CheatCodes
+from entities import Actors
+from async_tk import AsyncTk
+from events import EventLog
+from quality import QualityGovernor
+from simulation import Simulation
+from metrics import Metrics, MetricsServer, TIME_BUCKETS, memory_usage
 
 
 def create_window(w, h):
+	"""Create the window, sized to fit the screen. Returns the window and the scale it is drawn at, see DISPLAY_SCALE"""
 	window = Tk()
 	window.title("Pacman")
 
 	window_width = window.winfo_screenwidth()
 	window_height = window.winfo_screenheight()
+
+	scale = DISPLAY_SCALE
+	if scale is None:
+		fit = min(window_width / w, window_height / h)
+		# Shrink to fit small screens, leaving room for the title bar, and grow large ones by whole steps so the pixel art stays sharp
+		scale = int(fit) if fit >= 1 else fit * 0.95
+
+	w = round(w * scale)
+	h = round(h * scale)
 	window_x = window_width / 2 - w / 2
 	window_y = window_height / 2 - h / 2
 	window.geometry("%dx%d+%d+%d" % (w, h, window_x, window_y))
 
-	return window
+	return window, scale
+
+def set_direction(name):
+	"""Change Pac-Man's direction, or send it to the server's game if watching a game on the network"""
+	if spectating:
+		network_client.send_input(name)
+	elif not paused:
+		pacman.direction = DIRECTIONS[name]
 
 def direction_up(event):
-	if not paused:
-		pacman.direction = UP
+	set_direction("up")
 
 def direction_down(event):
-	if not paused:
-		pacman.direction = DOWN
+	set_direction("down")
 
 def direction_left(event):
-	if not paused:
-		pacman.direction = LEFT
+	set_direction("left")
 
 def direction_right(event):
-	if not paused:
-		pacman.direction = RIGHT
+	set_direction("right")
 
 def toggle_pause(event):
 	global paused
@@ -53,31 +86,103 @@ def toggle_pause(event):
 			text["paused"] = game_screen_canvas.create_text(S_WIDTH / 2, S_HEIGHT / 2, width=1400, font=big_font, fill="yellow", text="PAUSED")
 
 		paused = not paused
+		resume_game_loop()
 
-def start_ghost_panic():
-	global ghosts_eaten
+def cycle_turbo(event):
+	"""Switch to the next speed in TURBO_SPEEDS"""
+	global turbo_index
 
-	for i in range(1, 5):
-		if moving_sprites[i].state != GhostState.DEAD:
-			moving_sprites[i].state = GhostState.PANIC
-			moving_sprites[i].panic_timer = panic_time * FPS
+	if playing:
+		turbo_index = (turbo_index + 1) % len(TURBO_SPEEDS)
+
+def rewind(event):
+	"""Go back REWIND_SECONDS in the game"""
+	if playing and not paused:
+		snapshot = snapshots.rewind(REWIND_SECONDS * FPS)
+
+		if snapshot is not None:
+			restore_snapshot(snapshot)
+
+def restore_snapshot(snapshot):
+	"""Return the game to the state in 'snapshot'"""
+	global ticks, score, pacman_lives, current_level, speed, panic_time, ghosts_eaten, last_pellets_eaten, gained_extra_life, level
+
+	ticks = snapshot.ticks
+	score = snapshot.score
+	pacman_lives = snapshot.lives
+	current_level = snapshot.level
+	if current_level != level.number:
+		level = level_pack.level(current_level)
+	speed = snapshot.speed
+	panic_time = snapshot.panic_time
+	ghosts_eaten = snapshot.ghosts_eaten
+	last_pellets_eaten = snapshot.last_pellets_eaten
+	gained_extra_life = snapshot.gained_extra_life
+
+	unpack_actors(actors, snapshot.actors, speed)
+	unpack_pellets(pellets, snapshot.pellets)
+
+	if isinstance(world[15][10], Fruit):
+		world[15][10].hide()
+		world[15][10] = -1
+
+	if snapshot.fruit is not None:
+		world[15][10] = fruits[snapshot.fruit]
+		world[15][10].show()
+
+	timers.unpack(snapshot.timers)
 
-	ghosts_eaten = 0
+	show_lives()
+
+	snapshots.restore_rng(snapshot.rng_state)
+
+def log_event(event, data=None, cell=None):
+	"""Log a gameplay event at 'cell', or Pac-Man's cell, if the event log is on, see events.py"""
+	if event_log is not None:
+		event_log.log(event, current_level, ticks, pacman.cell if cell is None else cell, data)
 
 def reset_game(new_game=False, increase_level=False, death=False, loaded=False):
-	global ticks, pacman, speed, ticks, current_level, panic_time, score, pacman_lives, playing, paused, gained_extra_life, world
+	global ticks, pacman, speed, ticks, current_level, panic_time, score, pacman_lives, playing, paused, gained_extra_life, recorder, level_watcher, event_log
+
+	build_screen("game")
 
 	playing = paused = False
 	ticks = 0
-	save_name_entry.clear_text()
+	save_name.set("")
+
+	# Don't count the countdown as dropped frames
+	if new_game or loaded:
+		frame_monitor.reset()
+		snapshots.clear()
+
+		if RECORD_GAMES:
+			if recorder is not None:
+				recorder.close()
+			recorder = GameRecorder(RECORDING_DIR)
+
+		if EVENT_LOG:
+			if event_log is not None:
+				event_log.close()
+			event_log = EventLog(EVENT_DIR, EVENT_BUFFER_SIZE, EVENT_BATCH_SIZE)
+	else:
+		frame_monitor.pause()
 
 	if increase_level:
 		current_level += 1
-		speed += 0.5
-		panic_time -= 1
+	if new_game:
+		current_level = 0
+
+	if increase_level or new_game:
+		enter_level(current_level)
 
-	if new_game or increase_level:
-		world = generate_level(game_screen_canvas, "grid.txt")
+	if increase_level or new_game or loaded:
+		speed = level.speed
+		panic_time = level.panic_time
+
+	# Only a single level file can be watched for changes, not a pack
+	if LEVEL_WATCH and level_watcher is None and not level_pack.is_pack:
+		level_watcher = LevelWatcher(LEVEL_PACK)
+		window.after(LEVEL_WATCH_INTERVAL_MS, watch_level)
 
 	if loaded or new_game:
 		game_screen_canvas.coords(save_button.button_id, (-100, -100))
@@ -87,59 +192,105 @@ def reset_game(new_game=False, increase_level=False, death=False, loaded=False):
 			pass
 
 	if loaded:
-		speed = 3 + 0.5 * current_level
-		panic_time = 10 - current_level
-
 		if score >= 10000:
 			gained_extra_life = True
 
 	if new_game:
-		speed = 3
-		panic_time = 10
-
 		score = 0
 		pacman_lives = 3
-		current_level = 0
+		show_lives()
 
 	if not death and not loaded:
-		for row in world:
-			for cell in row:
-				if isinstance(cell, Pellet) or isinstance(cell, PowerPellet) or isinstance(cell, Fruit):
-					cell.eaten = False
+		restore_pellets(sprite_canvas, world)
+		hide_layer(sprite_canvas, "fruit")
 
 		world[15][10] = -1
 
 	if not loaded:
-		for sprite in moving_sprites:
-			sprite.hide()
-
-		moving_sprites[0:5] = [MovingSprite(game_screen_canvas, p_start, speed, 5,
-							[Rect(0, 0, 20, 20),
-							Rect(20, 0, 40, 20),
-							Rect(40, 0, 60, 20)], scale=2),
-		Ghost(game_screen_canvas, ghost_start[0], speed, 5, [Rect(0, 20, 20, 40),
-										Rect(20, 20, 40, 40),
-										Rect(40, 20, 60, 40)], "blinky", scale=2),
-		Ghost(game_screen_canvas, ghost_start[1], speed, 5, [Rect(0, 40, 20, 60),
-										Rect(20, 40, 40, 60),
-										Rect(40, 40, 60, 60)], "inky", scale=2),
-		Ghost(game_screen_canvas, ghost_start[2], speed, 5, [Rect(0, 60, 20, 80),
-										Rect(20, 60, 40, 80),
-										Rect(40, 60, 60, 80)], "pinky", scale=2),
-		Ghost(game_screen_canvas, ghost_start[3], speed, 5, [Rect(0, 80, 20, 100),
-										Rect(20, 80, 40, 100),
-										Rect(40, 80, 60, 100)], "clyde", scale=2)]
-		pacman = moving_sprites[0]
+		pacman = create_actors(p_start, ghost_start)
 
 
 	pacman.alive = True
 
-	switch_screens(main_screen_canvas, game_screen_canvas)
+	switch_screens("main", "game")
 	start_game(loaded=loaded)
 
 
+def enter_level(number):
+	"""Set up the world for level 'number' of the level pack, and start reading the level after it in the background.
+	The world is only generated once, after that only the cells which differ from the last level are replaced"""
+	global level, world, walls, pellets
+
+	next_level = level_pack.level(number)
+
+	# The watcher has the level file as it was last applied, which a partly saved file read just now may not be
+	if level_watcher is not None:
+		next_level.set_tiles(level_watcher.tiles)
+
+	if world is None:
+		world = generate_level(sprite_canvas, next_level.tiles)
+		walls = wall_grid(world)
+		pellets = level_pellets(world)
+	else:
+		changes = diff_grids(level.tiles, next_level.tiles)
+		if len(changes) > 0:
+			apply_grid_changes(sprite_canvas, world, walls, changes)
+
+			# Snapshots of the old level can't be restored into the new one
+			pellets = level_pellets(world)
+			snapshots.clear()
+
+	level = next_level
+	level_pack.prepare(number + 1)
+
+def watch_level():
+	"""Apply any changes made to the level file, only replacing the cells which have changed"""
+	global pellets
+
+	# The world shows the other machine's level while spectating, so the changes are left to be picked up afterwards
+	changes = [] if spectating else level_watcher.poll()
+	if len(changes) > 0:
+		apply_grid_changes(sprite_canvas, world, walls, changes)
+		level.set_tiles(level_watcher.tiles)
+
+		# Snapshots of the old level can't be restored into the new one
+		pellets = level_pellets(world)
+		snapshots.clear()
+
+	window.after(LEVEL_WATCH_INTERVAL_MS, watch_level)
+
+def create_actors(pacman_pos, ghost_positions):
+	"""Replace the actors with Pac-Man and a ghost at each of the given fixed-point positions, returning Pac-Man.
+	The ghosts take each personality in turn, so any number can be created.
+	A second player on the network who is still connected gets their Pac-Man back too, see add_remote_pacman()"""
+	global remote_pacman
+
+	num_actors = len(actors)
+	actors.clear()
+	remote_pacman = None
+
+	pacman = MovingSprite(sprite_canvas, pacman_pos, speed, 5, PACMAN_RECTS, scale=2, actors=actors)
+
+	for ghost_type, ghost_pos in zip(cycle(GHOST_TYPES), ghost_positions):
+		Ghost(sprite_canvas, ghost_pos, speed, 5, GHOST_RECTS[ghost_type], ghost_type, scale=2, actors=actors)
+
+	if network_server is not None and network_server.has_player():
+		add_remote_pacman()
+
+	# Snapshots with a different number of actors can't be restored, e.g. from before the second player joined or left
+	if len(actors) != num_actors:
+		snapshots.clear()
+
+	return pacman
+
+def add_remote_pacman():
+	"""Give the second player on the network their own Pac-Man, which the ghosts chase as well"""
+	global remote_pacman
+
+	remote_pacman = MovingSprite(sprite_canvas, p2_start, speed, 5, PACMAN_RECTS, scale=2, actors=actors)
+
 def start_game(loaded=False):
-	global ticks, playing
+	global ticks, playing, game_loop_running
 
 	try:
 		game_screen_canvas.delete(text["count"])
@@ -153,133 +304,461 @@ def start_game(loaded=False):
 
 		game_screen_canvas.pack()
 
-		window.after(int(1000 / FPS), lambda: start_game(loaded))
+		window.after(frame_interval(countdown=True), lambda: start_game(loaded))
 	else:
 		if not loaded:
 			# Start the game, release Blinky
-			moving_sprites[1].state = GhostState.NORMAL
-
-			moving_sprites[1].next_square = Vec2(10, 10)
+			simulation.release_ghost(actors.ghosts[0])
 
 		playing = True
+		game_loop_running = True
 
 		game_loop()
 
+def frame_interval(countdown=False, elapsed=0):
+	"""Returns the time in ms until the next frame, 'elapsed' seconds after the start of this one.
+	The countdown is sped up in turbo mode as nothing is simulated during it"""
+	turbo = TURBO_SPEEDS[turbo_index]
+
+	if turbo == 0:
+		return 1
+	elif countdown:
+		return max(1, int(1000 / FPS / turbo))
+
+	return max(1, int(1000 / FPS - elapsed * 1000))
+
 def game_loop():
-	global ticks, score, ghosts_eaten, last_pellets_eaten, pacman_lives, playing, gained_extra_life
+	global frame_delay
+
+	frame_time = frame_monitor.tick()
+	frame_start = perf_counter()
+
+	if metrics is not None and frame_time is not None:
+		metrics.observe("frame_seconds", frame_time)
+
+	# The last frame's cost includes Tk drawing it after the loop returned, e.g. FrameCanvas.present(),
+	# so it is the time between frames less the time slept between them.
+	# Turbo mode fills frames on purpose, so only frames at normal speed are measured
+	turbo = TURBO_SPEEDS[turbo_index]
+	if QUALITY_GOVERNOR and turbo == 1 and frame_time is not None:
+		quality.measure(frame_time - frame_delay)
 
 	if not paused:
-		ticks += 1
-
-		# Update the score text
-		game_screen_canvas.delete(text["score"])
-		text["score"] = game_screen_canvas.create_text(5, 0, width=500, font=score_font, fill="yellow", text="Score: " + str(score), anchor="nw")
-
-		if not pacman.alive:
-			if pacman_lives == 0:
-				playing = False
-				add_score_canvas.delete(text["score_screen_score"])
-				text["score_screen_score"] = add_score_canvas.create_text(S_WIDTH/2, 100, width=1500, font=title_font, fill="yellow", text="You scored: " + str(score))
-				switch_screens(game_screen_canvas, add_score_canvas)
-			else:
-				reset_game(death=True)
-
-		for s in moving_sprites:
-			if isinstance(s, Ghost):
-				s.update_image(ticks)
-				s.update(world, s.pos, pacman.pos, pacman.direction, moving_sprites[1].pos)
-			else:
-				s.update_image(ticks, rotate=True)
-
-		fruit_square = world[15][10]
-		if isinstance(fruit_square, Fruit):
-			fruit_square.timer -= 1
-			if fruit_square.timer == 0:
-				world[15][10].hide()
-				world[15][10] = -1
-
-		if not pacman.will_collide(world):
-			pacman.move()
-
-			pacman_pos = screen2world(pacman.pos.x, pacman.pos.y)
-
-			# Check if a pellet or fruit has been eaten, and update score
-			this_square = world[pacman_pos.y][pacman_pos.x]
-			if isinstance(this_square, PowerPellet) and not this_square.eaten:
-				# Start Ghost panic
-
-				score += 50
-				this_square.eaten = True
-				this_square.hide()
-
-				start_ghost_panic()
-			elif isinstance(this_square, Fruit) and not this_square.eaten:
-				score += this_square.score_bonus
-
-				world[15][10].hide()
-				world[15][10] = -1
-			elif isinstance(this_square, Pellet) and not this_square.eaten:
-				this_square.eaten = True
-				score += 10
-
-				this_square.hide()
-
-			# Check if its time to release another ghost, or add fruit to the world
-			pellets_eaten = num_pellets_eaten(world)
-			if pellets_eaten != last_pellets_eaten:
-				if pellets_eaten >= 1 and moving_sprites[2].state == GhostState.PEN:
-					# Release Pinky
-					moving_sprites[2].state = GhostState.NORMAL
-					moving_sprites[2].next_square = Vec2(10, 10)
-				elif pellets_eaten >= 30 and moving_sprites[3].state == GhostState.PEN:
-					# Release Inky
-					moving_sprites[3].state = GhostState.NORMAL
-					moving_sprites[3].next_square = Vec2(10, 10)
-				elif pellets_eaten >= 63 and moving_sprites[4].state == GhostState.PEN:
-					# Release Clyde
-					moving_sprites[4].state = GhostState.NORMAL
-					moving_sprites[4].next_square = Vec2(10, 10)
-				elif pellets_eaten == 70:
-					world[15][10] = fruits[current_level % 5]
-					world[15][10].image_id = world[15][10].draw()
-					world[15][10].timer = 10 * FPS
-				elif pellets_eaten == 170 and world[15][10] == -1:
-					world[15][10] = fruits[current_level % 5]
-					world[15][10].image_id = world[15][10].draw()
-					world[15][10].timer = 10 * FPS
-				elif pellets_eaten == 189:
-					# All pellets eaten, so start new level
-					reset_game(increase_level=True)
-
-				last_pellets_eaten = pellets_eaten
-
-		# Actually move the sprites
-		for sprite in moving_sprites:
-			game_screen_canvas.coords(sprite.image_id, sprite.pos.x, sprite.pos.y)
-
-		# Check if player has gained bonus life
-		if score >= 10000 and not gained_extra_life:
-			pacman_lives += 1
-			life_sprites[pacman_lives-1].image_id = life_sprites[pacman_lives-1].draw()
-			gained_extra_life = True
+		# In turbo mode several ticks are simulated for each frame drawn, without changing what happens in them
+		frame_end = frame_start + 1 / FPS
+		num_ticks = 0
 
-		# Check if pacman has collided with any ghosts
-		ghost_collisions = check_ghost_collisions(pacman, moving_sprites[1:5])
-		if len(ghost_collisions) > 0:
-			for ghost_id in ghost_collisions:
-				if moving_sprites[ghost_id].state == GhostState.NORMAL and pacman.alive:
-					pacman_lives -= 1
-					pacman.alive = False
-					life_sprites[pacman_lives].hide()
-				elif moving_sprites[ghost_id].state == GhostState.PANIC:
-					moving_sprites[ghost_id].state = GhostState.DEAD
-					score += (2 ** ghosts_eaten) * 200 # 200, 400, 800, 1600 for eating ghosts
-					ghosts_eaten += 1
+		while playing:
+			game_tick()
+			num_ticks += 1
 
-	if playing:
+			if num_ticks == turbo or (turbo == 0 and perf_counter() >= frame_end):
+				break
+
+		tick_rate.tick(num_ticks)
+		draw_frame()
+
+		if metrics is not None:
+			metrics.add("ticks_total", num_ticks)
+
+	if playing and not game_idle():
 		game_screen_canvas.pack()
 
-		window.after(int(1000 / FPS), game_loop)
+		delay = frame_interval(elapsed=perf_counter() - frame_start)
+		frame_delay = delay / 1000
+		window.after(delay, game_loop)
+	else:
+		suspend_game_loop()
+
+def game_idle():
+	"""Returns True if the game loop should stop: the game is paused, another screen is shown or the window has lost focus"""
+	return paused or current_screen != "game" or suspended_for_focus()
+
+def suspended_for_focus():
+	"""Returns True if the game should stop because the window has lost focus. Games which are being watched on the network,
+	steered by the autopilot or recorded keep running, as no one needs to be at the window for them"""
+	if not SUSPEND_UNFOCUSED or window_focused:
+		return False
+
+	return network_server is None and autopilot is None and recorder is None
+
+def show_focus_pause():
+	"""Show "PAUSED" over the game while it is stopped because the window has lost focus"""
+	show = playing and not paused and current_screen == "game" and suspended_for_focus()
+
+	if show and "focus_paused" not in text:
+		text["focus_paused"] = game_screen_canvas.create_text(S_WIDTH / 2, S_HEIGHT / 2, width=1400, font=big_font, fill="yellow", text="PAUSED")
+	elif not show and "focus_paused" in text:
+		game_screen_canvas.delete(text.pop("focus_paused"))
+
+def window_idle():
+	"""Returns True if nothing is moving in the window, so its events can be processed less often, see AsyncTk"""
+	if spectating:
+		return False
+
+	# The countdown before each life also animates the game screen
+	return current_screen != "game" or (playing and not game_loop_running)
+
+def suspend_game_loop():
+	"""Stop the game loop, instead of it waking up every frame to do nothing, until resume_game_loop()"""
+	global game_loop_running
+
+	game_loop_running = False
+	show_focus_pause()
+
+	if idle_meter is not None and playing:
+		idle_meter.start()
+
+def resume_game_loop():
+	"""Restart the game loop if it was stopped and the game is no longer idle"""
+	global game_loop_running
+
+	show_focus_pause()
+
+	if not playing or game_loop_running or game_idle():
+		return
+
+	game_loop_running = True
+
+	if idle_meter is not None and idle_meter.start_time is not None:
+		print(idle_meter.stop())
+
+	# The time the loop was stopped isn't dropped frames, and the frame after it is a whole frame later
+	frame_monitor.pause()
+	window.after(frame_interval(), game_loop)
+
+def focus_changed(event, focused):
+	"""Called when focus moves into or out of any widget in the window, only acting when the window itself gains or loses it"""
+	global window_focused
+
+	if event.widget is window:
+		window_focused = focused
+		resume_game_loop()
+
+def draw_frame():
+	"""Update the canvas to show the game after the last tick, only touching it for what has changed"""
+	for sprite in actors:
+		render_sync.sync(sprite)
+
+	if quality.update_hud():
+		draw_hud()
+
+	render_sync.end_frame()
+
+def draw_hud():
+	render_sync.set_text(text["score"], "Score: " + str(score))
+
+	turbo = TURBO_SPEEDS[turbo_index]
+	if turbo == 1:
+		render_sync.set_text(text["turbo"], "")
+	else:
+		speed_text = "MAX" if turbo == 0 else str(turbo) + "x"
+		render_sync.set_text(text["turbo"], "TURBO %s - %d ticks/s" % (speed_text, round(tick_rate.rate(), -1)))
+
+def game_tick():
+	"""Simulate one tick of the game"""
+	global ticks
+
+	ticks += 1
+
+	# Apply directions sent by a second player on the network to their own Pac-Man, which joins with the first
+	if network_server is not None:
+		for direction in network_server.pop_inputs():
+			if direction in DIRECTIONS:
+				if remote_pacman is None:
+					add_remote_pacman()
+					snapshots.clear()
+				remote_pacman.direction = DIRECTIONS[direction]
+
+	# Let the autopilot steer, using the same input as the keyboard
+	if autopilot is not None:
+		direction = autopilot.update(walls, world, pacman, actors.ghosts, speed, panic_time, wait=TURBO_SPEEDS[turbo_index] != 1)
+		if direction is not None:
+			set_direction(direction)
+
+	simulation.tick(ticks, quality.animate(ticks), quality.rotate())
+
+	if network_server is not None or recorder is not None:
+		state = simulation.network_state(ticks)
+
+		if network_server is not None:
+			network_server.publish(state)
+		if recorder is not None:
+			recorder.record(state)
+
+	if playing:
+		snapshots.append(simulation.capture_snapshot(ticks, speed, pellets, fruits, snapshots))
+
+def show_lives():
+	"""Show a life in the HUD for each of Pac-Man's lives"""
+	for i, life in enumerate(life_sprites):
+		if i < pacman_lives:
+			life.show()
+		else:
+			life.hide()
+
+def global_property(name):
+	"""Returns a property which reads and writes the global 'name', see GameSimulation"""
+	def set_global(self, value):
+		globals()[name] = value
+
+	return property(lambda self: globals()[name], set_global)
+
+class GameSimulation(Simulation):
+	"""Plays the rules of the game on the game's own state, which is kept in globals, and shows what happens on the screen"""
+	world = global_property("world")
+	walls = global_property("walls")
+	actors = global_property("actors")
+	level = global_property("level")
+	panic_time = global_property("panic_time")
+	score = global_property("score")
+	lives = global_property("pacman_lives")
+	ghosts_eaten = global_property("ghosts_eaten")
+	last_pellets_eaten = global_property("last_pellets_eaten")
+	gained_extra_life = global_property("gained_extra_life")
+
+	def __init__(self):
+		# The state is already in the globals, so only the timers are set up
+		self.reset_timers()
+
+	def event(self, event, data=None, cell=None):
+		log_event(event, data, cell)
+
+	def lives_changed(self):
+		show_lives()
+
+	def life_lost(self):
+		reset_game(death=True)
+
+	def game_over(self):
+		global playing, recorder, event_log
+
+		playing = False
+		if FRAME_PACING_TELEMETRY:
+			in_background(frame_monitor.export, TELEMETRY_DIR, session_stats())
+		if recorder is not None:
+			recorder.close()
+			recorder = None
+		if event_log is not None:
+			event_log.close()
+			event_log = None
+		build_screen("add_score")
+		add_score_canvas.delete(text["score_screen_score"])
+		text["score_screen_score"] = add_score_canvas.create_text(S_WIDTH/2, 100, width=1500, font=title_font, fill="yellow", text="You scored: " + str(score))
+		switch_screens("game", "add_score")
+
+	def level_complete(self):
+		reset_game(increase_level=True)
+
+	def level_fruit(self):
+		return next(fruit for fruit in fruits if fruit.fruit_type == level.fruit)
+
+def session_stats():
+	"""Returns the statistics which are exported alongside the frame-pacing data"""
+	stats = {"render": render_sync.stats()}
+
+	if sprite_canvas is not game_screen_canvas:
+		stats["framebuffer"] = sprite_canvas.stats()
+
+	if network_server is not None:
+		stats["network"] = network_server.stats()
+
+	if autopilot is not None:
+		stats["autopilot"] = autopilot.stats()
+
+	if leak_detector is not None:
+		stats["leaks"] = leak_detector.summary()
+
+	if QUALITY_GOVERNOR:
+		stats["quality"] = quality.stats()
+
+	if async_tk is not None:
+		stats["event_loop"] = async_tk.monitor.summary()
+
+	if idle_meter is not None:
+		stats["idle"] = idle_meter.summary()
+
+	return stats
+
+def in_background(function, *args):
+	"""Run slow work, e.g. writing a file, without stalling the game when the asyncio loop is used, otherwise straight away"""
+	if async_tk is not None:
+		async_tk.run_in_background(function, *args)
+	else:
+		function(*args)
+
+def create_metrics():
+	"""Returns the Metrics served by the metrics server, see metrics.py"""
+	metrics = Metrics()
+	metrics.declare("frame_seconds", "histogram", "Time between the starts of consecutive frames while playing.", TIME_BUCKETS)
+	metrics.declare("ticks_total", "counter", "Game ticks simulated.")
+	metrics.declare("ticks_per_second", "gauge", "Game ticks simulated per second, over the last second.")
+	metrics.declare("quality_level", "gauge", "Detail left out to keep up with the frame rate.")
+	metrics.declare("canvas_items", "gauge", "Items drawn on each screen.")
+	metrics.declare("save_seconds", "histogram", "Time taken to write each save.", TIME_BUCKETS)
+	metrics.declare("resident_memory_bytes", "gauge", "Memory used by the process.")
+	metrics.declare("peak_memory_bytes", "gauge", "Most memory used by the process so far.")
+	return metrics
+
+def sample_metrics():
+	"""Update the metrics which are counted rather than recorded as they happen, on the Tk thread which owns the canvases"""
+	metrics.set("ticks_per_second", tick_rate.rate())
+	metrics.set("quality_level", quality.level)
+
+	for name, canvas in screens.items():
+		metrics.set("canvas_items", len(canvas.find_all()), (("screen", name),))
+	if "game" in screens and sprite_canvas is not game_screen_canvas:
+		metrics.set("canvas_items", len(sprite_canvas.items), (("screen", "framebuffer"),))
+
+	resident, peak = memory_usage()
+	if resident is not None:
+		metrics.set("resident_memory_bytes", resident)
+	if peak is not None:
+		metrics.set("peak_memory_bytes", peak)
+
+	window.after(METRICS_SAMPLE_MS, sample_metrics)
+
+def timed_write_save(save_name, new_save):
+	"""Write a save, recording how long it took"""
+	start = perf_counter()
+	write_save(save_name, new_save)
+
+	if metrics is not None:
+		metrics.observe("save_seconds", perf_counter() - start)
+
+def check_leaks():
+	"""Count the objects a long session could leak, and report any which keep growing, see LeakDetector"""
+	for name in leak_detector.sample(window, screens):
+		print(leak_detector.describe(name))
+		print("  Memory gained by module since the last check:", ", ".join("%s %+d B" % growth for growth in leak_detector.module_growth))
+
+	window.after(LEAK_CHECK_INTERVAL_MS, check_leaks)
+
+def start_spectating():
+	"""Connect to a game being played on the network, and start showing it"""
+	global network_client, spectating, pacman
+
+	try:
+		network_client = SnapshotClient(NETWORK_HOST, NETWORK_PORT)
+	except OSError:
+		show_network_message("No game found on the network")
+		return
+
+	build_screen("game")
+	if world is None:
+		enter_level(0)
+
+	pacman = create_actors(p_start, ghost_start)
+
+	text["network"] = game_screen_canvas.create_text(S_WIDTH - 5, 0, width=500, font=score_font, fill="yellow", text="Esc to leave", anchor="ne")
+
+	spectating = True
+	switch_screens("main", "game")
+	spectate_loop()
+
+def stop_spectating(event=None):
+	"""Leave the game being watched on the network, or clean up after the server has closed it, and go back to the main menu"""
+	global spectating
+
+	if not spectating:
+		return
+
+	spectating = False
+	network_client.close()
+	game_screen_canvas.delete(text.pop("network"))
+
+	stats = network_client.stats()
+	ping = "" if stats["rtt_ms_median"] is None else ", %.1f ms ping" % stats["rtt_ms_median"]
+	show_network_message("Left the network game: %.0f kB received%s" % (stats["bytes_received"] / 1000, ping))
+	switch_screens("game", "main")
+
+def show_network_message(message):
+	"""Show the result of joining or leaving a game on the network, below the main menu"""
+	if "network_message" in text:
+		main_screen_canvas.delete(text["network_message"])
+	text["network_message"] = main_screen_canvas.create_text(S_WIDTH/2, 870, width=1500, font=score_font, fill="yellow", text=message)
+
+def spectate_loop():
+	"""Show the latest state received from the server. The game itself is only simulated on the server"""
+	global pacman
+
+	# Escape may have been pressed since the last frame
+	if not spectating:
+		return
+
+	for message in network_client.poll():
+		apply_network_message(message)
+
+	if not network_client.open:
+		stop_spectating()
+		return
+
+	state = network_client.state
+
+	# A second player joining or leaving changes the number of Pac-Men, which are sent before the ghosts
+	if len(actors.pacmen) != state["players"]:
+		pacman = create_actors(p_start, ghost_start)
+		for _ in range(state["players"] - 1):
+			MovingSprite(sprite_canvas, p2_start, speed, 5, PACMAN_RECTS, scale=2, actors=actors)
+
+	for sprite, actor in zip(actors.pacmen + actors.ghosts, state["actors"]):
+		if actor is None:
+			continue
+
+		sprite.pos = Vec2(actor[0], actor[1])
+		sprite.direction = Vec2(actor[2], actor[3])
+
+		if isinstance(sprite, Ghost):
+			sprite.state = GhostState(actor[4])
+			sprite.update_image(state["tick"])
+		else:
+			sprite.update_image(state["tick"], rotate=True)
+
+		render_sync.sync(sprite)
+
+	for i, life in enumerate(life_sprites):
+		if i < state["lives"]:
+			life.show()
+		else:
+			life.hide()
+
+	render_sync.set_text(text["score"], "Score: " + str(state["score"]))
+
+	stats = network_client.stats()
+	if stats["rtt_ms_median"] is not None:
+		render_sync.set_text(text["network"], "%.1f ms  %.1f kB/s  Esc to leave" % (stats["rtt_ms_median"], stats["bytes_per_second"] / 1000))
+
+	render_sync.end_frame()
+
+	window.after(int(1000 / FPS), spectate_loop)
+
+def apply_network_message(message):
+	"""Update the pellets and fruit shown in the world from a message sent by the server"""
+	# Later levels can have a different maze, from the same level pack as the server. Keyframes leave out level 0
+	if "level" in message or message.get("keyframe"):
+		number = message.get("level", EMPTY_STATE["level"])
+		if number != level.number:
+			enter_level(number)
+
+	if message.get("keyframe"):
+		restore_pellets(sprite_canvas, world)
+
+	for x, y in message.get("eat", []):
+		world[y][x].eaten = True
+		world[y][x].hide()
+
+	for x, y in message.get("uneat", []):
+		world[y][x].eaten = False
+		world[y][x].show()
+
+	if "fruit" in message or message.get("keyframe"):
+		hide_layer(sprite_canvas, "fruit")
+		world[15][10] = -1
+
+		for fruit in fruits:
+			if fruit.fruit_type == message.get("fruit"):
+				world[15][10] = fruit
+				fruit.show()
 
 def add_score(name, score):
 	"""Writes 'score' to a text file containing all past scores"""
@@ -287,11 +766,15 @@ def add_score(name, score):
 	# Don't allow empty names
 	if len(name.strip()) == 0:
 		return
-	with open("scores.txt", "a") as score_file:
-		score_file.write(name + "," + str(score) + "\n")
+
+	in_background(write_score, name, score)
 
 	score_entry.clear_text()
-	switch_screens(add_score_canvas, main_screen_canvas)
+	switch_screens("add_score", "main")
+
+def write_score(name, score):
+	with open("scores.txt", "a") as score_file:
+		score_file.write(name + "," + str(score) + "\n")
 
 def read_high_scores():
 	"""Read the scores file and find the 5 highest scores"""
@@ -305,6 +788,8 @@ def read_high_scores():
 	scores.sort(reverse=True, key=lambda x: x[1])
 	scores = scores[:5]
 
+	build_screen("scores")
+
 	for i, s in enumerate(scores):
 		try:
 			scores_screen_canvas.delete(text["score"+str(i)])
@@ -313,18 +798,7 @@ def read_high_scores():
 
 		text["score"+str(i)] = scores_screen_canvas.create_text(S_WIDTH/2, i*100+400, width=500, font=medium_font, fill="yellow", text=s[0] + "  -  " + str(s[1]))
 
-	switch_screens(main_screen_canvas, scores_screen_canvas)
-
-window = create_window(S_WIDTH, S_HEIGHT)
-
-game_screen_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
-main_screen_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
-scores_screen_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
-add_score_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
-settings_screen_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
-boss_screen_canvas = Canvas(window, width=S_WIDTH, height=S_HEIGHT)
-save_game_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
-load_game_canvas = Canvas(window, bg="black", width=S_WIDTH, height=S_HEIGHT)
+	switch_screens("main", "scores")
 
 # Keybindings
 keybindings = {
@@ -333,19 +807,49 @@ keybindings = {
 	"down": "s",
 	"right": "d",
 	"pause": "p",
-	"boss": "b"
+	"boss": "b",
+	"rewind": "r",
+	"turbo": "f"
 }
 
 def switch_screens(old, new):
-	"""Switch between two canvases"""
-	old.pack_forget()
-	game_screen_canvas.pack_forget()
+	"""Switch between two screens, given by name. The new screen is built if it hasn't been shown before"""
+	global current_screen
+
+	new_canvas = build_screen(new)
+	current_screen = new
 
-	new.pack()
-	new.focus_force()
+	screens[old].pack_forget()
+	if "game" in screens:
+		game_screen_canvas.pack_forget()
+
+	new_canvas.pack()
+	new_canvas.focus_force()
+
+	resume_game_loop()
+
+def build_screen(name):
+	"""Returns the canvas for the screen 'name', creating it along with its widgets and assets the first time it is used"""
+	if name not in screens:
+		with startup_timer.phase("screen: " + name):
+			screens[name] = screen_builders[name]()
+
+	return screens[name]
 
 def bind_keybindings():
-	"""Binds each keybinding to its respective movement"""
+	"""Binds each keybinding to its respective movement, on the screens which have been built"""
+
+	if "game" in screens:
+		bind_game_keybindings()
+
+	if "boss" in screens:
+		boss_screen_canvas.bind(keybindings["boss"], lambda _: switch_screens("boss", "game"))
+
+def bind_game_keybindings():
+	# Cleared first, as the cheat handler is added to each letter alongside any keybinding using it,
+	# and binding again after a keybinding changes would otherwise add it twice
+	for l in "abcdefghijklmnopqrstuvwxyz":
+		game_screen_canvas.unbind(l)
 
 	game_screen_canvas.bind("<" + keybindings["up"] + ">", direction_up)
 	game_screen_canvas.bind("<" + keybindings["left"] + ">", direction_left)
@@ -353,8 +857,9 @@ def bind_keybindings():
 	game_screen_canvas.bind("<" + keybindings["right"] + ">", direction_right)
 	game_screen_canvas.bind("<" + keybindings["pause"] + ">", toggle_pause)
 	game_screen_canvas.bind("<" + keybindings["boss"] + ">", start_boss_screen)
-
-	boss_screen_canvas.bind(keybindings["boss"], lambda _: switch_screens(boss_screen_canvas, game_screen_canvas))
+	game_screen_canvas.bind("<" + keybindings["rewind"] + ">", rewind)
+	game_screen_canvas.bind("<" + keybindings["turbo"] + ">", cycle_turbo)
+	game_screen_canvas.bind("<Escape>", stop_spectating)
 
 	for l in "abcdefghijklmnopqrstuvwxyz":
 		game_screen_canvas.bind(l, check_cheat_code, add="+")
@@ -362,14 +867,18 @@ def bind_keybindings():
 def unbind_keybindings():
 	"""Unbinds all keybindings"""
 
-	game_screen_canvas.unbind(keybindings["up"])
-	game_screen_canvas.unbind(keybindings["left"])
-	game_screen_canvas.unbind(keybindings["down"])
-	game_screen_canvas.unbind(keybindings["right"])
-	game_screen_canvas.unbind(keybindings["pause"])
-	game_screen_canvas.unbind(keybindings["boss"])
+	if "game" in screens:
+		game_screen_canvas.unbind(keybindings["up"])
+		game_screen_canvas.unbind(keybindings["left"])
+		game_screen_canvas.unbind(keybindings["down"])
+		game_screen_canvas.unbind(keybindings["right"])
+		game_screen_canvas.unbind(keybindings["pause"])
+		game_screen_canvas.unbind(keybindings["boss"])
+		game_screen_canvas.unbind(keybindings["rewind"])
+		game_screen_canvas.unbind(keybindings["turbo"])
 
-	boss_screen_canvas.unbind(keybindings["boss"])
+	if "boss" in screens:
+		boss_screen_canvas.unbind(keybindings["boss"])
 
 def get_keypress(event, kb):
 	"""Binds a new key to a certain keybinding (specified by 'kb').
@@ -412,11 +921,11 @@ def change_keybinding(kb):
 	except KeyError:
 		pass
 
-	text["key_prompt"] = settings_screen_canvas.create_text(S_WIDTH / 2, S_HEIGHT - 100, width=1400, font=Font(size=100, family=font_family), fill="yellow", text="Press a key...")
+	text["key_prompt"] = settings_screen_canvas.create_text(S_WIDTH / 2, S_HEIGHT - 100, width=1400, font=scaled_font(100), fill="yellow", text="Press a key...")
 
 def start_boss_screen(event):
 	if playing:
-		switch_screens(game_screen_canvas, boss_screen_canvas)
+		switch_screens("game", "boss")
 
 	if not paused:
 		toggle_pause(-1)
@@ -426,12 +935,12 @@ def create_save(save_name, level, pacman, lives, ghosts, world, score):
 	if len(save_name.strip()) == 0:
 		return
 
-	save(save_name, level, pacman, lives, ghosts, world, score)
+	in_background(timed_write_save, save_name, make_save(level, pacman, lives, ghosts, world, score))
 
-	switch_screens(save_game_canvas, main_screen_canvas)
+	switch_screens("save", "main")
 
 def start_load(save_name):
-	global current_level, moving_sprites, pacman, pacman_lives, score
+	global current_level, speed, pacman, pacman_lives, score
 
 	try:
 		load_game_canvas.delete(text["save_not_found"])
@@ -453,13 +962,21 @@ def start_load(save_name):
 			text["save_not_found"] = load_game_canvas.create_text(S_WIDTH/2, 400, width=1500, font=score_font, fill="yellow", text="Save name not found")
 		return
 
+	# The loaded game is applied on top of a fully restored level
+	build_screen("game")
+	if world is not None:
+		restore_pellets(sprite_canvas, world)
+		hide_layer(sprite_canvas, "fruit")
+
+	enter_level(loaded_game.level)
+
 	json_ghosts = loaded_game.ghosts
 
 	# Expand ghost data into Vec2 objects so they can be used in instantiation
 	loaded_ghosts = []
 	for ghost in json_ghosts:
-		new_ghost = []
-		for i in range(0, len(ghost)-2):
+		new_ghost = [position_from_save(ghost[0])]
+		for i in range(1, len(ghost)-2):
 			new_ghost.append(Vec2(ghost[i]["x"], ghost[i]["y"]))
 
 		new_ghost.append(ghost[len(ghost) - 2])
@@ -467,35 +984,20 @@ def start_load(save_name):
 
 		loaded_ghosts.append(new_ghost)
 
-	pacman_pos_vec = Vec2(loaded_game.pacman_pos["x"], loaded_game.pacman_pos["y"])
+	pacman_pos_vec = position_from_save(loaded_game.pacman_pos)
 
 	current_level = loaded_game.level
-	moving_sprites = [MovingSprite(game_screen_canvas, pacman_pos_vec, speed, 5,
-						[Rect(0, 0, 20, 20),
-						 Rect(20, 0, 40, 20),
-						 Rect(40, 0, 60, 20)], scale=2),
-	Ghost(game_screen_canvas, loaded_ghosts[0][0], speed, 5, [Rect(0, 20, 20, 40),
-								      Rect(20, 20, 40, 40),
-									  Rect(40, 20, 60, 40)], "blinky", scale=2),
-	Ghost(game_screen_canvas, loaded_ghosts[1][0], speed, 5, [Rect(0, 40, 20, 60),
-								      Rect(20, 40, 40, 60),
-									  Rect(40, 40, 60, 60)], "inky", scale=2),
-	Ghost(game_screen_canvas, loaded_ghosts[2][0], speed, 5, [Rect(0, 60, 20, 80),
-								      Rect(20, 60, 40, 80),
-									  Rect(40, 60, 60, 80)], "pinky", scale=2),
-	Ghost(game_screen_canvas, loaded_ghosts[3][0], speed, 5, [Rect(0, 80, 20, 100),
-								      Rect(20, 80, 40, 100),
-									  Rect(40, 80, 60, 100)], "clyde", scale=2)]
-	pacman = moving_sprites[0]
+	speed = level.speed
+	pacman = create_actors(pacman_pos_vec, [ghost[0] for ghost in loaded_ghosts])
 
 	pacman.direction = Vec2(loaded_game.pacman_dir["x"], loaded_game.pacman_dir["y"])
 
 	# Recreate ghosts
-	for i in range(1, 5):
-		moving_sprites[i].direction = loaded_ghosts[i-1][1]
-		moving_sprites[i].next_square = loaded_ghosts[i-1][2]
-		moving_sprites[i].state = GhostState(loaded_ghosts[i-1][3])
-		moving_sprites[i].panic_timer = loaded_ghosts[i-1][4]
+	for ghost, loaded_ghost in zip(actors.ghosts, loaded_ghosts):
+		ghost.direction = loaded_ghost[1]
+		ghost.next_square = loaded_ghost[2]
+		ghost.state = GhostState(loaded_ghost[3])
+		ghost.panic_timer = loaded_ghost[4]
 
 	pacman_lives = loaded_game.pacman_lives
 	score = loaded_game.score
@@ -512,33 +1014,333 @@ def start_load(save_name):
 					world[i][j].eaten = True
 					world[i][j].hide()
 			elif cell[0] == "F":
-				world[i][j] = Fruit(game_screen_canvas, cell[1], scale=2)
+				world[i][j] = next(fruit for fruit in fruits if fruit.fruit_type == cell[1])
 				world[i][j].timer = cell[2]
 
-				world[i][j].image_id = world[i][j].draw()
+				world[i][j].show()
 
 	# Restart the game
 	reset_game(loaded=True)
-	switch_screens(load_game_canvas, game_screen_canvas)
+	switch_screens("load", "game")
 
 def check_cheat_code(event):
-	"""Check if the user has entered the cheat code 'mjw' and start ghost panic if so"""
-	
-	past_keypresses.append(event.char)
+	"""Check if the user has finished typing a cheat code, e.g. 'mjw' starts ghost panic"""
+	cheat_codes.press(event.char)
 
-	if "".join(past_keypresses[-3:]) == "mjw":
-		start_ghost_panic()
+def choose_font_family():
+	"""Returns the preferred font family if it is installed, otherwise a fallback.
+	Asking Tk to resolve a single font is much cheaper than listing every installed family"""
+	if Font(family="8-bit Operator+").actual("family") == "8-bit Operator+":
+		return "8-bit Operator+"
 
-if "8-bit Operator+" in families():
-	font_family = "8-bit Operator+"
-else:
-	font_family = "Tlwg Mono"
+	return "Tlwg Mono"
+
+def create_screen_canvas():
+	return ScaledCanvas(window, display_scale, S_WIDTH, S_HEIGHT, bg="black")
+
+def scaled_font(size, **options):
+	"""Returns a font in the game's font family, 'size' being its size at a display scale of 1"""
+	return Font(size=round(size * display_scale), family=font_family, **options)
+
+def build_main_screen():
+	global main_screen_canvas, new_game_button, load_game_button, scores_button, join_game_button, settings_button, quit_button
+
+	main_screen_canvas = create_screen_canvas()
+
+	new_game_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 200, {
+		"text": "NEW GAME",
+		"command": lambda: reset_game(new_game=True),
+	} | button_styling)
+
+	load_game_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 300, {
+		"text": "LOAD GAME",
+		"command": lambda: switch_screens("main", "load"),
+	} | button_styling)
+
+	scores_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 400, {
+		"text": "HIGH SCORES",
+		"command": read_high_scores,
+	} | button_styling)
+
+	join_game_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 500, {
+		"text": "JOIN LAN GAME",
+		"command": start_spectating,
+	} | button_styling)
+
+	settings_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 600, {
+		"text": "SETTINGS",
+		"command": lambda: switch_screens("main", "settings"),
+	} | button_styling)
+
+	quit_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 800, {
+		"text": "QUIT",
+		"command": window.destroy,
+		"activebackground": "red",
+	} | button_styling)
+
+	return main_screen_canvas
+
+def build_scores_screen():
+	global scores_screen_canvas, back_button_scores
+
+	scores_screen_canvas = create_screen_canvas()
+
+	back_button_scores = CanvasButton(window, scores_screen_canvas, 60, 20, {
+		"text": "BACK",
+		"command": lambda: switch_screens("scores", "main"),
+		"anchor": "se"
+	} | button_styling)
+
+	text["high_scores_title"] = scores_screen_canvas.create_text(S_WIDTH/2, 50, width=1000, font=title_font, fill="yellow", text="HIGH SCORES")
+
+	return scores_screen_canvas
+
+def build_settings_screen():
+	global settings_screen_canvas, back_button_settings, key_button_settings
+
+	settings_screen_canvas = create_screen_canvas()
+
+	back_button_settings = CanvasButton(window, settings_screen_canvas, 60, 20, {
+		"text": "BACK",
+		"command": lambda: switch_screens("settings", "main"),
+	} | button_styling)
+
+	up_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 300, {
+		"text": "UP - " + keybindings["up"],
+		"command": lambda: change_keybinding("up"),
+	} | button_styling)
+
+	down_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 400, {
+		"text": "DOWN - " + keybindings["down"],
+		"command": lambda: change_keybinding("down"),
+	} | button_styling)
+
+	left_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 500, {
+		"text": "LEFT - " + keybindings["left"],
+		"command": lambda: change_keybinding("left"),
+	} | button_styling)
+
+	right_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 600, {
+		"text": "RIGHT - " + keybindings["right"],
+		"command": lambda: change_keybinding("right"),
+	} | button_styling)
+
+	pause_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH * 2/3, 300, {
+		"text": "PAUSE - " + keybindings["pause"],
+		"command": lambda: change_keybinding("pause"),
+	} | button_styling)
+
+	rewind_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH * 2/3, 400, {
+		"text": "REWIND - " + keybindings["rewind"],
+		"command": lambda: change_keybinding("rewind"),
+	} | button_styling)
+
+	turbo_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH * 2/3, 500, {
+		"text": "TURBO - " + keybindings["turbo"],
+		"command": lambda: change_keybinding("turbo"),
+	} | button_styling)
+
+	boss_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH * 2/3, 600, {
+		"text": "BOSS KEY - " + keybindings["boss"],
+		"command": lambda: change_keybinding("boss"),
+	} | button_styling)
+
+	key_button_settings = {
+		"up": up_button_settings,
+		"down": down_button_settings,
+		"left": left_button_settings,
+		"right": right_button_settings,
+		"pause": pause_button_settings,
+		"rewind": rewind_button_settings,
+		"turbo": turbo_button_settings,
+		"boss": boss_button_settings
+	}
+
+	text["settings_title"] = settings_screen_canvas.create_text(S_WIDTH/2, 50, width=1000, font=title_font, fill="yellow", text="SETTINGS")
+
+	return settings_screen_canvas
+
+def build_add_score_screen():
+	global add_score_canvas, enter_button_add_scores, score_entry
 
-score_font = Font(size=14, family=font_family)
-title_font = Font(size=50, family=font_family)
-medium_font = Font(size=28, family=font_family)
-big_font = Font(size=200, weight="bold", family=font_family)
-button_font = Font(size=24, family=font_family)
+	add_score_canvas = create_screen_canvas()
+
+	enter_button_add_scores = CanvasButton(window, add_score_canvas, S_WIDTH/2, 800, {
+		"text": "ENTER",
+		"command": lambda: add_score(player_name.get(), score),
+	} | button_styling)
+
+	score_entry = CanvasEntry(window, add_score_canvas, S_WIDTH/2, S_HEIGHT/2, {
+		"textvariable": player_name,
+		"font": button_font,
+		"fg": "yellow",
+		"relief": "flat",
+		"bg": "#444444"
+	})
+
+	text["score_screen_score"] = add_score_canvas.create_text(S_WIDTH/2, 100, width=1500, font=title_font, fill="yellow", text="You scored: ")
+	text["score_screen_help"] = add_score_canvas.create_text(S_WIDTH/2, 300, width=500, font=score_font, fill="yellow", text="Enter a name to save your score")
+
+	return add_score_canvas
+
+def build_save_screen():
+	global save_game_canvas, enter_button_save_screen, back_button_save_screen, save_name_entry
+
+	save_game_canvas = create_screen_canvas()
+
+	enter_button_save_screen = CanvasButton(window, save_game_canvas, S_WIDTH/2, 600, {
+		"text": "ENTER",
+		"command": lambda: create_save(save_name.get(), current_level, pacman, pacman_lives, actors.ghosts, world, score),
+	} | button_styling)
+
+	back_button_save_screen = CanvasButton(window, save_game_canvas, 60, 20, {
+		"text": "BACK",
+		"command": lambda: switch_screens("save", "game"),
+	} | button_styling)
+
+	save_name_entry = CanvasEntry(window, save_game_canvas, S_WIDTH/2, S_HEIGHT/2, {
+		"textvariable": save_name,
+		"font": button_font,
+		"fg": "yellow",
+		"relief": "flat",
+		"bg": "#444444"
+	})
+
+	text["overwrite_save"] = save_game_canvas.create_text(S_WIDTH/2, 200, width=1500, font=score_font, justify="center",
+														  fill="yellow", text="Enter a save name\nSaves will be OVERWRITTEN if they have the same name")
+
+	return save_game_canvas
+
+def build_load_screen():
+	global load_game_canvas, back_button_load_screen, enter_button_load_screen, load_name_entry
+
+	load_game_canvas = create_screen_canvas()
+
+	back_button_load_screen = CanvasButton(window, load_game_canvas, 60, 20, {
+		"text": "BACK",
+		"command": lambda: switch_screens("load", "main"),
+	} | button_styling)
+
+	enter_button_load_screen = CanvasButton(window, load_game_canvas, S_WIDTH/2, 600, {
+		"text": "ENTER",
+		"command": lambda: start_load(save_name.get()),
+	} | button_styling)
+
+	load_name_entry = CanvasEntry(window, load_game_canvas, S_WIDTH/2, S_HEIGHT/2, {
+		"textvariable": save_name,
+		"font": button_font,
+		"fg": "yellow",
+		"relief": "flat",
+		"bg": "#444444"
+	})
+
+	text["load_help"] = load_game_canvas.create_text(S_WIDTH/2, 200, width=500, font=score_font, fill="yellow", text="Please enter save name to load:")
+	text["load_game_title"] = load_game_canvas.create_text(S_WIDTH/2, 50, width=1000, font=title_font, fill="yellow", text="LOAD GAME")
+
+	return load_game_canvas
+
+def build_boss_screen():
+	global boss_screen_canvas, excel_gif
+
+	boss_screen_canvas = ScaledCanvas(window, display_scale, S_WIDTH, S_HEIGHT)
+
+	excel_gif = Image.open("img/vscode.png").resize((round(S_WIDTH * display_scale), round(S_HEIGHT * display_scale)))
+	excel_gif = ImageTk.PhotoImage(excel_gif)
+	boss_screen_canvas.create_image(0, 0, image=excel_gif, anchor="nw")
+
+	boss_screen_canvas.bind(keybindings["boss"], lambda _: switch_screens("boss", "game"))
+
+	return boss_screen_canvas
+
+def build_game_screen():
+	"""Builds the game canvas and the sprites which live on it.
+	The level and the moving sprites are created by reset_game() / start_load() when a game starts"""
+	global game_screen_canvas, sprite_canvas, render_sync, save_button, life_sprites, fruits
+
+	game_screen_canvas = create_screen_canvas()
+	render_sync = RenderSync(game_screen_canvas)
+
+	# Sprites are drawn either as canvas items or into a framebuffer covering the level and the lives to its left
+	if RENDERER == "framebuffer":
+		sprite_canvas = FrameCanvas(game_screen_canvas, (
+			GAME_GRID_START_X - 3 * GAME_GRID_WIDTH, GAME_GRID_START_Y,
+			GAME_GRID_START_X + (GRID_NUM_CELLS_WIDTH + 3) * GAME_GRID_WIDTH, GAME_GRID_START_Y + GRID_NUM_CELLS_HEIGHT * GAME_GRID_WIDTH
+		), display_scale)
+	else:
+		sprite_canvas = game_screen_canvas
+
+	save_button = CanvasButton(window, game_screen_canvas, -100, -100, {
+		"text": "SAVE AND QUIT",
+		"command": lambda: switch_screens("game", "save"),
+	} | button_styling)
+
+	life_sprites = [Sprite(sprite_canvas, Vec2(-2, i), PACMAN_RECTS[:1]) for i in range(4)]
+	life_sprites[-1].hide()
+
+	fruits = [
+		Fruit(sprite_canvas, fruit_type="cherry", scale=2),
+		Fruit(sprite_canvas, fruit_type="banana", scale=2),
+		Fruit(sprite_canvas, fruit_type="strawberry", scale=2),
+		Fruit(sprite_canvas, fruit_type="apple", scale=2),
+		Fruit(sprite_canvas, fruit_type="key", scale=2)
+	]
+
+	text["score"] = game_screen_canvas.create_text(5, 0, width=500, font=score_font, fill="yellow", text="Score: 0", anchor="nw")
+	text["turbo"] = game_screen_canvas.create_text(S_WIDTH / 2, 0, width=500, font=score_font, fill="yellow", text="", anchor="n")
+
+	# 'screens' isn't updated until this returns, so bind directly
+	bind_game_keybindings()
+
+	return game_screen_canvas
+
+screen_builders = {
+	"main": build_main_screen,
+	"scores": build_scores_screen,
+	"settings": build_settings_screen,
+	"add_score": build_add_score_screen,
+	"save": build_save_screen,
+	"load": build_load_screen,
+	"boss": build_boss_screen,
+	"game": build_game_screen
+}
+
+def finish_startup():
+	"""Called once the main menu is ready, to record the time taken to reach it"""
+	startup_timer.finish()
+
+	if STARTUP_REPORT:
+		if STARTUP_REPORT_PRINT:
+			print(startup_timer.report())
+		in_background(startup_timer.export, TELEMETRY_DIR)
+
+	if leak_detector is not None:
+		window.after(LEAK_CHECK_INTERVAL_MS, check_leaks)
+
+	if metrics is not None:
+		sample_metrics()
+
+# The autopilot's worker processes are forked first, before the window and the game's threads exist
+autopilot = Autopilot(AUTOPILOT_WORKERS, AUTOPILOT_BUDGET_MS, AUTOPILOT_DEPTH) if AUTOPILOT else None
+if autopilot is not None:
+	autopilot.start()
+
+startup_timer = StartupTimer(startup_start)
+
+with startup_timer.phase("window"):
+	window, display_scale = create_window(S_WIDTH, S_HEIGHT)
+	set_display_scale(display_scale, ATLAS_SPRITES, ATLAS_CACHE_DIR)
+
+	player_name = StringVar()
+	save_name = StringVar()
+
+with startup_timer.phase("fonts"):
+	font_family = choose_font_family()
+
+	score_font = scaled_font(14)
+	title_font = scaled_font(50)
+	medium_font = scaled_font(28)
+	big_font = scaled_font(200, weight="bold")
+	button_font = scaled_font(24)
 
 button_styling = {
 	"bg": "black",
@@ -551,169 +1353,31 @@ button_styling = {
 	"relief": "flat"
 }
 
-new_game_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 200, {
-	"text": "NEW GAME",
-	"command": lambda: reset_game(new_game=True),
-} | button_styling)
-
-load_game_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 300, {
-	"text": "LOAD GAME",
-	"command": lambda: switch_screens(main_screen_canvas, load_game_canvas),
-} | button_styling)
-
-scores_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 400, {
-	"text": "HIGH SCORES",
-	"command": read_high_scores,
-} | button_styling)
-
-settings_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 600, {
-	"text": "SETTINGS",
-	"command": lambda: switch_screens(main_screen_canvas, settings_screen_canvas),
-} | button_styling)
-
-quit_button = CanvasButton(window, main_screen_canvas, S_WIDTH/2, 800, {
-	"text": "QUIT",
-	"command": window.destroy,
-	"activebackground": "red",
-} | button_styling)
-
-back_button_scores = CanvasButton(window, scores_screen_canvas, 60, 20, {
-	"text": "BACK",
-	"command": lambda: switch_screens(scores_screen_canvas, main_screen_canvas),
-	"anchor": "se"
-} | button_styling)
-
-back_button_settings = CanvasButton(window, settings_screen_canvas, 60, 20, {
-	"text": "BACK",
-	"command": lambda: switch_screens(settings_screen_canvas, main_screen_canvas),
-} | button_styling)
-
-enter_button_add_scores = CanvasButton(window, add_score_canvas, S_WIDTH/2, 800, {
-	"text": "ENTER",
-	"command": lambda: add_score(player_name.get(), score),
-} | button_styling)
-
-up_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 300, {
-	"text": "UP - " + keybindings["up"],
-	"command": lambda: change_keybinding("up"),
-} | button_styling)
-
-down_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 400, {
-	"text": "DOWN - " + keybindings["down"],
-	"command": lambda: change_keybinding("down"),
-} | button_styling)
-
-left_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 500, {
-	"text": "LEFT - " + keybindings["left"],
-	"command": lambda: change_keybinding("left"),
-} | button_styling)
-
-right_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH/3, 600, {
-	"text": "RIGHT - " + keybindings["right"],
-	"command": lambda: change_keybinding("right"),
-} | button_styling)
-
-pause_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH * 2/3, 350, {
-	"text": "PAUSE - " + keybindings["pause"],
-	"command": lambda: change_keybinding("pause"),
-} | button_styling)
-
-boss_button_settings = CanvasButton(window, settings_screen_canvas, S_WIDTH * 2/3, 550, {
-	"text": "BOSS KEY - " + keybindings["boss"],
-	"command": lambda: change_keybinding("boss"),
-} | button_styling)
-
-save_button = CanvasButton(window, game_screen_canvas, -100, -100, {
-	"text": "SAVE AND QUIT",
-	"command": lambda: switch_screens(game_screen_canvas, save_game_canvas),
-} | button_styling)
-
-enter_button_save_screen = CanvasButton(window, save_game_canvas, S_WIDTH/2, 600, {
-	"text": "ENTER",
-	"command": lambda: create_save(save_name.get(), current_level, pacman, pacman_lives, moving_sprites[1:5], world, score),
-} | button_styling)
-
-back_button_save_screen = CanvasButton(window, save_game_canvas, 60, 20, {
-	"text": "BACK",
-	"command": lambda: switch_screens(save_game_canvas, game_screen_canvas),
-} | button_styling)
-
-back_button_load_screen = CanvasButton(window, load_game_canvas, 60, 20, {
-	"text": "BACK",
-	"command": lambda: switch_screens(load_game_canvas, main_screen_canvas),
-} | button_styling)
-
-enter_button_save_screen = CanvasButton(window, load_game_canvas, S_WIDTH/2, 600, {
-	"text": "ENTER",
-	"command": lambda: start_load(save_name.get()),
-} | button_styling)
-
-key_button_settings = {
-	"up": up_button_settings,
-	"down": down_button_settings,
-	"left": left_button_settings,
-	"right": right_button_settings,
-	"pause": pause_button_settings,
-	"boss": boss_button_settings
-}
-
-player_name = StringVar()
-score_entry = CanvasEntry(window, add_score_canvas, S_WIDTH/2, S_HEIGHT/2, {
-	"textvariable": player_name,
-	"font": button_font,
-	"fg": "yellow",
-	"relief": "flat",
-	"bg": "#444444"
-})
-
-save_name = StringVar()
-save_name_entry = CanvasEntry(window, save_game_canvas, S_WIDTH/2, S_HEIGHT/2, {
-	"textvariable": save_name,
-	"font": button_font,
-	"fg": "yellow",
-	"relief": "flat",
-	"bg": "#444444"
-})
-load_name_entry = CanvasEntry(window, load_game_canvas, S_WIDTH/2, S_HEIGHT/2, {
-	"textvariable": save_name,
-	"font": button_font,
-	"fg": "yellow",
-	"relief": "flat",
-	"bg": "#444444"
-})
-
-world = generate_level(game_screen_canvas, "grid.txt")
-
-p_start = world2screen(10, 15)
+# Screens are only built the first time they are shown, see build_screen()
+screens = {}
+text = {}
+
+world = None
+walls = None
+pellets = []
+level_pack = LevelPack(LEVEL_PACK)
+level = None
+snapshots = SnapshotBuffer(REWIND_BUFFER_SECONDS * FPS)
+p_start = world2fixed(10, 15)
+p2_start = world2fixed(10, 20) # Where a second player on the network starts, see add_remote_pacman()
 ghost_start = [
-	world2screen(9, 12),
-	world2screen(11, 12),
-	world2screen(9, 13),
-	world2screen(11, 13)
+	world2fixed(9, 12),
+	world2fixed(11, 12),
+	world2fixed(9, 13),
+	world2fixed(11, 13)
 ]
 panic_time = 10
-speed = 3
-moving_sprites = [MovingSprite(game_screen_canvas, p_start, speed, 5,
-						[Rect(0, 0, 20, 20),
-						 Rect(20, 0, 40, 20),
-						 Rect(40, 0, 60, 20)], scale=2),
-	Ghost(game_screen_canvas, ghost_start[0], speed, 5, [Rect(0, 20, 20, 40),
-								      Rect(20, 20, 40, 40),
-									  Rect(40, 20, 60, 40)], "blinky", scale=2),
-	Ghost(game_screen_canvas, ghost_start[1], speed, 5, [Rect(0, 40, 20, 60),
-								      Rect(20, 40, 40, 60),
-									  Rect(40, 40, 60, 60)], "inky", scale=2),
-	Ghost(game_screen_canvas, ghost_start[2], speed, 5, [Rect(0, 60, 20, 80),
-								      Rect(20, 60, 40, 80),
-									  Rect(40, 60, 60, 80)], "pinky", scale=2),
-	Ghost(game_screen_canvas, ghost_start[3], speed, 5, [Rect(0, 80, 20, 100),
-								      Rect(20, 80, 40, 100),
-									  Rect(40, 80, 60, 100)], "clyde", scale=2)]
-pacman = moving_sprites[0]
+speed = BASE_SPEED
+actors = Actors()
+
+simulation = GameSimulation()
 
 pacman_lives = 3
-life_sprites = [Sprite(game_screen_canvas, Vec2(-2, i), [Rect(0, 0, 20, 20)]) for i in range(4)]
-life_sprites[-1].hide()
 gained_extra_life = False
 
 score = 0
@@ -721,37 +1385,74 @@ current_level = 0
 ghosts_eaten = 0
 last_pellets_eaten = 0
 
-fruits = [
-	Fruit(game_screen_canvas, fruit_type="cherry", scale=2),
-	Fruit(game_screen_canvas, fruit_type="banana", scale=2),
-	Fruit(game_screen_canvas, fruit_type="strawberry", scale=2),
-	Fruit(game_screen_canvas, fruit_type="apple", scale=2),
-	Fruit(game_screen_canvas, fruit_type="key", scale=2)
-]
+frame_monitor = FramePacingMonitor(FPS)
+tick_rate = TickRateMeter()
+quality = QualityGovernor(FPS)
+frame_delay = 0 # Seconds slept before the next frame, see game_loop()
+turbo_index = 0
 
-text = {"score": game_screen_canvas.create_text(5, 0, width=500, font=score_font, fill="yellow", text="Score: 0", anchor="nw"),
-		"overwrite_save": save_game_canvas.create_text(S_WIDTH/2, 200, width=1500, font=score_font, justify="center",
-												 fill="yellow", text="Enter a save name\nSaves will be OVERWRITTEN if they have the same name"),
-		"load_help": load_game_canvas.create_text(S_WIDTH/2, 200, width=500, font=score_font, fill="yellow", text="Please enter save name to load:"),
-		"score_screen_score": add_score_canvas.create_text(S_WIDTH/2, 100, width=1500, font=title_font, fill="yellow", text="You scored: "),
-		"score_screen_help": add_score_canvas.create_text(S_WIDTH/2, 300, width=500, font=score_font, fill="yellow", text="Enter a name to save your score"),
-		"load_game_title": load_game_canvas.create_text(S_WIDTH/2, 50, width=1000, font=title_font, fill="yellow", text="LOAD GAME"),
-		"high_scores_title": scores_screen_canvas.create_text(S_WIDTH/2, 50, width=1000, font=title_font, fill="yellow", text="HIGH SCORES"),
-		"settings_title": settings_screen_canvas.create_text(S_WIDTH/2, 50, width=1000, font=title_font, fill="yellow", text="SETTINGS"),}
+DIRECTIONS = {"up": UP, "down": DOWN, "left": LEFT, "right": RIGHT}
 
-past_keypresses = []
-bind_keybindings()
+# Publish games to other machines on the network if enabled, see network.py
+network_server = SnapshotServer(NETWORK_HOST, NETWORK_PORT) if NETWORK_SERVER else None
+network_client = None
+spectating = False
+remote_pacman = None
 
-# Add boss screen bindings
-excel_gif = Image.open("img/vscode.png").resize((S_WIDTH, S_HEIGHT))
-excel_gif = ImageTk.PhotoImage(excel_gif)
-boss_screen_canvas.create_image(0, 0, image=excel_gif, anchor="nw")
+recorder = None
+level_watcher = None
+event_log = None
+
+# The window is run from an asyncio loop if enabled, whose wake-ups are measured to show its scheduling jitter
+async_tk = AsyncTk(window, ASYNC_PUMP_MS, FramePacingMonitor(1000 / ASYNC_PUMP_MS, bin_ms=1), ASYNC_IDLE_PUMP_MS, window_idle) if ASYNC_LOOP else None
+
+# Diagnostics for long sessions, see check_leaks()
+leak_detector = LeakDetector(LEAK_WINDOW) if LEAK_DETECTOR else None
+
+# Live statistics for watching the game without a debugger, see metrics.py
+metrics = create_metrics() if METRICS_SERVER else None
+metrics_server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT) if METRICS_SERVER else None
+
+cheat_codes = CheatCodes()
+cheat_codes.add("mjw", simulation.start_ghost_panic)
 
 paused = False
 playing = False
 
+# The game loop only runs while there is a game to show, see game_idle()
+game_loop_running = False
+current_screen = "main"
+window_focused = True
+window.bind("<FocusIn>", lambda event: focus_changed(event, True))
+window.bind("<FocusOut>", lambda event: focus_changed(event, False))
+idle_meter = IdleMeter() if IDLE_REPORT else None
+
+build_screen("main")
+
 main_screen_canvas.focus_set()
 
 main_screen_canvas.pack()
 ticks = 0
-window.mainloop()
+
+window.after_idle(finish_startup)
+
+if async_tk is not None:
+	async_tk.run()
+else:
+	window.mainloop()
+
+# Write the events of a game which was still being played when the window closed
+if event_log is not None:
+	event_log.close()
+
+if metrics_server is not None:
+	metrics_server.close()
+
+if network_server is not None:
+	network_server.close()
+
+if recorder is not None:
+	recorder.close()
+
+if autopilot is not None:
+	autopilot.close()
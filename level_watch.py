@@ -0,0 +1,41 @@
+"""Watches the level file while the game is running, so changes to the maze can be seen without restarting"""
+
+from os import stat
+
+from world_components import read_grid, diff_grids
+
+class LevelWatcher:
+	"""Checks whether the level file at 'grid_path' has been changed, and which tiles are different"""
+	def __init__(self, grid_path):
+		self.grid_path = grid_path
+		self.modified = self.modified_time()
+		self.tiles = read_grid(grid_path)
+
+	def modified_time(self):
+		try:
+			return stat(self.grid_path).st_mtime_ns
+		except OSError:
+			return None
+
+	def poll(self):
+		"""Returns the tiles which have changed since the last poll, see diff_grids().
+		Files which are only partly saved, or are a different size to the level, are skipped until they are fixed"""
+		modified = self.modified_time()
+		if modified is None or modified == self.modified:
+			return []
+
+		self.modified = modified
+
+		try:
+			tiles = read_grid(self.grid_path)
+		except (OSError, IndexError):
+			return []
+
+		if len(tiles) != len(self.tiles) or any(len(new) != len(old) for new, old in zip(tiles, self.tiles)):
+			print("Level file %s has changed size, restart the game to load it" % self.grid_path)
+			return []
+
+		changes = diff_grids(self.tiles, tiles)
+		self.tiles = tiles
+
+		return changes
@@ -0,0 +1,180 @@
+"""Level packs hold many levels, each with its own maze and settings, in a single file.
+
+A pack is a header line, then an index line giving the name, offset and length of each level in the rest of the file.
+Each level is a single JSON object, so only the levels which are played are read, and the next level is read in the background.
+A plain level file like grid.txt can be used as a pack of one level with the default settings.
+Every maze must be GRID_NUM_CELLS_WIDTH x GRID_NUM_CELLS_HEIGHT (21x27), as the screen is laid out for that size, see check_level().
+
+Usage: python levels.py <manifest.json> <output pack>
+The manifest is a list of levels, e.g. [{"name": "Classic", "grid": "grid.txt", "speed": 21}], see DEFAULT_SETTINGS"""
+
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps, loads, load as json_load
+from sys import argv
+
+from config import BASE_SPEED, SPEED_PER_LEVEL, GRID_NUM_CELLS_WIDTH, GRID_NUM_CELLS_HEIGHT
+from world_components import FRUIT_RECTS, read_grid
+
+PACK_HEADER = b"PACMAN LEVEL PACK 1\n"
+
+# Settings a level in a pack can have. Those which are None depend on the level number, as they did with a single level
+DEFAULT_SETTINGS = {
+	"speed": None,
+	"panic_time": None,
+	"release_pellets": [1, 30, 63], # Pellets eaten before Pinky, Inky and Clyde leave the pen
+	"fruit": None,
+	"fruit_pellets": [70, 170] # Pellets eaten when the fruit appears
+}
+
+class Level:
+	"""A level's maze and settings, when played as level 'number' (counting from 0).
+	Levels after the end of a pack repeat the last level, getting faster each time as the single level did"""
+	def __init__(self, data, number, repeats):
+		self.number = number
+		self.name = data.get("name", "")
+		self.set_tiles(data["grid"])
+
+		settings = DEFAULT_SETTINGS | data
+		fruit_types = list(FRUIT_RECTS)
+
+		if settings["speed"] is None:
+			self.speed = BASE_SPEED + SPEED_PER_LEVEL * number
+		else:
+			self.speed = settings["speed"] + SPEED_PER_LEVEL * repeats
+
+		if settings["panic_time"] is None:
+			self.panic_time = 10 - number
+		else:
+			self.panic_time = settings["panic_time"] - repeats
+
+		self.release_pellets = settings["release_pellets"]
+		self.fruit = fruit_types[number % len(fruit_types)] if settings["fruit"] is None else settings["fruit"]
+		self.fruit_pellets = settings["fruit_pellets"]
+
+	def set_tiles(self, tiles):
+		"""Change the maze, see read_grid(). The level is complete when every normal pellet has been eaten"""
+		self.tiles = tiles
+		self.num_pellets = sum(row.count("P") for row in tiles)
+
+class LevelPack:
+	"""The levels in the pack or level file at 'pack_path'. Only the index is read until a level is needed"""
+	def __init__(self, pack_path):
+		self.path = pack_path
+
+		with open(pack_path, "rb") as pack:
+			self.is_pack = pack.read(len(PACK_HEADER)) == PACK_HEADER
+
+			if self.is_pack:
+				self.index = loads(pack.readline())
+				self.data_start = pack.tell()
+			else:
+				self.index = [{"name": pack_path}]
+
+		self.executor = None
+		self.loading = {} # Index in the pack: future returning the level's data
+
+	def __len__(self):
+		return len(self.index)
+
+	def read(self, index):
+		"""Read and check the data of level 'index' in the pack"""
+		if not self.is_pack:
+			data = {"name": self.path, "grid": read_grid(self.path)}
+		else:
+			entry = self.index[index]
+			with open(self.path, "rb") as pack:
+				pack.seek(self.data_start + entry["offset"])
+				data = loads(pack.read(entry["length"]))
+
+		check_level(data)
+		return data
+
+	def prepare(self, number):
+		"""Start reading level 'number' in the background, if it isn't already.
+		Only the current and next levels are kept once read. A plain level file is read again each time
+		it is needed instead, as it may have been edited since, see LevelWatcher"""
+		if not self.is_pack:
+			return
+
+		index = min(number, len(self) - 1)
+
+		if index not in self.loading:
+			if self.executor is None:
+				self.executor = ThreadPoolExecutor(1)
+
+			self.loading[index] = self.executor.submit(self.read, index)
+
+		for old_index in list(self.loading):
+			if old_index not in (index, index - 1):
+				del self.loading[old_index]
+
+	def level(self, number):
+		"""Returns level 'number', waiting for it if it is still being read in the background"""
+		index = min(number, len(self) - 1)
+
+		if index in self.loading:
+			data = self.loading[index].result()
+		else:
+			data = self.read(index)
+
+		return Level(data, number, number - index)
+
+def check_level(data):
+	"""Raise a ValueError if a level can't be played, the screen is laid out for mazes of a fixed size"""
+	tiles = data["grid"]
+	if len(tiles) != GRID_NUM_CELLS_HEIGHT or any(len(row) != GRID_NUM_CELLS_WIDTH for row in tiles):
+		raise ValueError("Level %r is not %dx%d" % (data.get("name", ""), GRID_NUM_CELLS_WIDTH, GRID_NUM_CELLS_HEIGHT))
+
+	settings = DEFAULT_SETTINGS | data
+	if settings["fruit"] is not None and settings["fruit"] not in FRUIT_RECTS:
+		raise ValueError("Level %r has unknown fruit %r" % (data.get("name", ""), settings["fruit"]))
+
+	# The game reads both fruit thresholds, and ghosts beyond the last release threshold use the last one
+	fruit_pellets = settings["fruit_pellets"]
+	if not isinstance(fruit_pellets, list) or len(fruit_pellets) != 2 or not all(is_count(n) for n in fruit_pellets):
+		raise ValueError("Level %r needs fruit_pellets to be two pellet counts, not %r" % (data.get("name", ""), fruit_pellets))
+
+	release_pellets = settings["release_pellets"]
+	if not isinstance(release_pellets, list) or len(release_pellets) == 0 or not all(is_count(n) for n in release_pellets):
+		raise ValueError("Level %r needs release_pellets to be at least one pellet count, not %r" % (data.get("name", ""), release_pellets))
+
+def is_count(value):
+	"""Returns True if 'value' is a whole number of pellets"""
+	return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def write_pack(pack_path, levels):
+	"""Write a level pack from a list of level data, each with a "grid" of tiles and any of DEFAULT_SETTINGS"""
+	encoded = []
+	index = []
+	offset = 0
+
+	for data in levels:
+		check_level(data)
+
+		level_bytes = dumps(data).encode() + b"\n"
+		encoded.append(level_bytes)
+		index.append({"name": data.get("name", ""), "offset": offset, "length": len(level_bytes)})
+		offset += len(level_bytes)
+
+	with open(pack_path, "wb") as pack:
+		pack.write(PACK_HEADER)
+		pack.write(dumps(index).encode() + b"\n")
+		for level_bytes in encoded:
+			pack.write(level_bytes)
+
+def build_pack(manifest_path, pack_path):
+	"""Write a level pack from a manifest, which lists each level's grid file and settings"""
+	with open(manifest_path, "r") as manifest:
+		levels = json_load(manifest)
+
+	for data in levels:
+		data["grid"] = read_grid(data["grid"])
+
+	write_pack(pack_path, levels)
+	return len(levels)
+
+if __name__ == "__main__":
+	if len(argv) != 3:
+		print(__doc__)
+	else:
+		print("Wrote %d levels to %s" % (build_pack(argv[1], argv[2]), argv[2]))
@@ -0,0 +1,310 @@
+"""Load tests the game engine with generated mazes and any number of ghosts, to find where it stops scaling.
+
+Usage: python loadtest.py [--scenario NAME | --width W --height H | --level FILE] [--ghosts N] [--blinky N ...] [--ticks N]
+                          [--renderer items|framebuffer|both]
+Each scenario builds a maze, then plays it with the same Simulation as game_tick() (see simulation.py) and draws it
+as draw_frame() does for a fixed number of ticks, reporting the ticks per second, the time spent in each step and the
+peak memory used. Those steps include the timers, the fruit, the event log, the state sent to network players and the
+rewind snapshot, as they all grow with the maze. Losing every life or eating every pellet starts the maze again.
+game_tick() itself can't be driven, as it works on the game's own screen, which is laid out for one maze size:
+levels.check_level() only accepts GRID_NUM_CELLS_WIDTH x GRID_NUM_CELLS_HEIGHT (21x27) mazes, so the larger mazes here
+time how the engine scales, not levels which can be played.
+The sprites are drawn on a real Tk canvas, so this needs a display like the game does.
+With --renderer both each scenario is run with canvas items and then with the framebuffer (see framebuffer.py),
+e.g. --level grid.txt --renderer both for the real level, or --scenario all --renderer both"""
+
+from argparse import ArgumentParser
+from random import Random
+from sys import platform
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tkinter import Tk, Canvas
+
+try:
+	from resource import getrusage, RUSAGE_SELF
+except ImportError:
+	getrusage = None
+
+from autopilot import open_directions, at_centre
+from config import S_WIDTH, S_HEIGHT, FPS, BASE_SPEED, REWIND_BUFFER_SECONDS, EVENT_BUFFER_SIZE, EVENT_BATCH_SIZE
+from entities import Actors
+from events import EventLog
+from framebuffer import FrameCanvas
+from levels import Level
+from render_sync import RenderSync
+from simulation import FRUIT_CELL, Simulation
+from snapshot import SnapshotBuffer, level_pellets, pack_actors, unpack_actors, unpack_pellets
+from sprite import MovingSprite, world_indices_to_fixed as world2fixed
+from world_components import PACMAN_RECTS, GHOST_RECTS, GHOST_TYPES, Ghost, GhostState, Fruit, create_tile, wall_grid, read_grid, rng
+
+# Scenarios run by --scenario all, from the size of the real level up. Each is (width, height, ghosts of each personality)
+SCENARIOS = {
+	"classic": (21, 27, 1),
+	"medium": (101, 101, 10),
+	"large": (251, 251, 50),
+	"huge": (501, 501, 250)
+}
+
+# The steps of a tick which are timed, in the order they run
+PHASES = ("lives", "ghosts", "pacman", "collisions", "network", "snapshot", "render")
+
+def generate_maze(width, height, seed=0, loops=0.1):
+	"""Returns the tiles of a random maze, in the same form as read_grid().
+	Sizes are rounded up to be odd, and 'loops' is the fraction of the remaining inner walls knocked down,
+	as mazes without loops have no junctions for the ghosts to choose at"""
+	width += 1 - width % 2
+	height += 1 - height % 2
+	rand = Random(seed)
+
+	tiles = [["W"] * width for _ in range(height)]
+
+	# Carve corridors between the odd cells with a depth first search
+	tiles[1][1] = "P"
+	stack = [(1, 1)]
+	while stack:
+		x, y = stack[-1]
+		unvisited = [(x + dx, y + dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+			if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and tiles[y + dy][x + dx] == "W"]
+
+		if len(unvisited) == 0:
+			stack.pop()
+			continue
+
+		nx, ny = rand.choice(unvisited)
+		tiles[(y + ny) // 2][(x + nx) // 2] = "P"
+		tiles[ny][nx] = "P"
+		stack.append((nx, ny))
+
+	for y in range(1, height - 1):
+		for x in range(1, width - 1):
+			between_x = x % 2 == 0 and y % 2 == 1
+			between_y = x % 2 == 1 and y % 2 == 0
+			if tiles[y][x] == "W" and (between_x or between_y) and rand.random() < loops:
+				tiles[y][x] = "P"
+
+	for x, y in ((1, 1), (width - 2, 1), (1, height - 2), (width - 2, height - 2)):
+		tiles[y][x] = "U"
+
+	# Leave the fruit's cell open and empty, it joins the cells either side of it
+	x, y = FRUIT_CELL
+	if x < width - 2 and y < height - 1:
+		tiles[y][x] = "X"
+
+	return ["".join(row) for row in tiles]
+
+def peak_memory():
+	"""Returns the peak memory used by the process in MB, or None where it can't be measured (Windows)"""
+	if getrusage is None:
+		return None
+
+	# macOS reports bytes, Linux KB
+	peak = getrusage(RUSAGE_SELF).ru_maxrss
+	return peak / (1024 * 1024) if platform == "darwin" else peak / 1024
+
+class Scenario(Simulation):
+	"""A maze with Pac-Man and 'ghost_counts' ghosts of each personality, drawn on 'canvas', logging events to 'event_dir'.
+	The game is played by the same Simulation as the real game, with Pac-Man steered at random.
+	With the "framebuffer" renderer the sprites are drawn into a FrameCanvas covering the canvas instead of as items"""
+	def __init__(self, canvas, tiles, ghost_counts, event_dir, seed=0, renderer="items"):
+		self.canvas = canvas
+		self.rand = Random(seed)
+
+		# The ghosts share the game's random numbers, so they are seeded too and each run of a scenario is the same
+		rng.seed(seed)
+
+		self.frame_canvas = FrameCanvas(canvas, (0, 0, S_WIDTH, S_HEIGHT)) if renderer == "framebuffer" else None
+		sprite_canvas = canvas if self.frame_canvas is None else self.frame_canvas
+
+		world = [[create_tile(sprite_canvas, tile, x, y) for x, tile in enumerate(row)] for y, row in enumerate(tiles)]
+		open_cells = [(x, y) for y, row in enumerate(tiles) for x, tile in enumerate(row) if tile != "W"]
+		start = next((x, y) for y, row in enumerate(tiles) for x, tile in enumerate(row) if tile != "W")
+
+		# Generated mazes have no pen, so the ghosts start out of it, anywhere in the maze
+		actors = Actors()
+		self.pacman = MovingSprite(sprite_canvas, world2fixed(*start), BASE_SPEED, 5, PACMAN_RECTS, scale=2, actors=actors)
+		for ghost_type in GHOST_TYPES:
+			for _ in range(ghost_counts[ghost_type]):
+				x, y = self.rand.choice(open_cells)
+				ghost = Ghost(sprite_canvas, world2fixed(x, y), BASE_SPEED, 5, GHOST_RECTS[ghost_type], ghost_type, scale=2, actors=actors)
+				ghost.state = GhostState.NORMAL
+
+		# Also resets the timers, so nothing is left over from the last scenario
+		super().__init__(world, wall_grid(world), actors, Level({"grid": tiles}, 0, 0))
+
+		# Pac-Man moves in the tick it is put back at the start, before it can be steered, so it starts off facing an open way
+		self.ghosts = actors.ghosts
+		self.pacman.direction = open_directions(self.walls, start)[0]
+		self.start_actors = pack_actors(actors)
+		self.fruit_sprite = Fruit(sprite_canvas, self.level.fruit, scale=2)
+
+		self.pellets = level_pellets(self.world)
+		self.snapshots = SnapshotBuffer(REWIND_BUFFER_SECONDS * FPS)
+		self.event_log = EventLog(event_dir, EVENT_BUFFER_SIZE, EVENT_BATCH_SIZE)
+
+		self.render_sync = RenderSync(canvas)
+		self.steered_cell = None
+		self.ticks = 0
+		self.phase_times = dict.fromkeys(PHASES, 0.0)
+
+	def steer(self):
+		"""Choose a random way on at junctions and corners, turning at the centre of the cell as the autopilot does"""
+		cell = self.pacman.cell
+		if (cell.x, cell.y) == self.steered_cell or not at_centre(self.pacman):
+			return
+
+		options = open_directions(self.walls, (cell.x, cell.y))
+		if len(options) > 2 or not any(d.is_equal(self.pacman.direction) for d in options):
+			self.pacman.direction = self.rand.choice(options)
+
+		self.steered_cell = (cell.x, cell.y)
+
+	def event(self, event, data=None, cell=None):
+		self.event_log.log(event, 0, self.ticks, self.pacman.cell if cell is None else cell, data)
+
+	def life_lost(self):
+		"""Put everyone back where they started, as the game does"""
+		unpack_actors(self.actors, self.start_actors, BASE_SPEED)
+		self.steered_cell = None
+
+	def game_over(self):
+		"""Start again with the pellets back, so the load test carries on"""
+		self.life_lost()
+		self.level_complete()
+		self.lives = 3
+
+	def level_complete(self):
+		"""Put the pellets back, so Pac-Man can carry on eating"""
+		unpack_pellets(self.pellets, bytes(len(self.pellets)))
+		self.last_pellets_eaten = 0
+
+	def level_fruit(self):
+		return self.fruit_sprite
+
+	def timed(self, phase, step, *args):
+		"""Run a step of the tick, adding the time it took to 'phase'"""
+		start = perf_counter()
+		step(*args)
+		self.phase_times[phase] += perf_counter() - start
+
+	def check_lives(self):
+		self.timed("lives", super().check_lives)
+
+	def update_ghosts(self, ticks, animate=True, rotate=True):
+		self.timed("ghosts", super().update_ghosts, ticks, animate, rotate)
+
+	def move_players(self):
+		self.timed("pacman", super().move_players)
+
+	def check_collisions(self):
+		self.timed("collisions", super().check_collisions)
+
+	def close(self):
+		self.event_log.close()
+
+	def run_tick(self):
+		"""Run one tick as game_tick() and draw_frame() do, timing each step"""
+		self.ticks += 1
+		self.steer()
+		self.tick(self.ticks)
+
+		self.timed("network", self.network_state, self.ticks)
+		self.timed("snapshot", lambda: self.snapshots.append(self.capture_snapshot(self.ticks, BASE_SPEED, self.pellets, [self.fruit_sprite], self.snapshots)))
+
+		start = perf_counter()
+		for actor in self.actors:
+			self.render_sync.sync(actor)
+		self.render_sync.end_frame()
+		if self.frame_canvas is not None:
+			self.frame_canvas.present()
+		self.canvas.update()
+		self.phase_times["render"] += perf_counter() - start
+
+def run_scenario(window, name, tiles, ghost_counts, ticks, seed=0, renderer="items"):
+	"""Build and run a scenario, returning its results as a dictionary"""
+	canvas = Canvas(window, width=S_WIDTH, height=S_HEIGHT, bg="black", highlightthickness=0)
+	canvas.pack()
+
+	with TemporaryDirectory() as event_dir:
+		build_start = perf_counter()
+		scenario = Scenario(canvas, tiles, ghost_counts, event_dir, seed, renderer)
+		if scenario.frame_canvas is not None:
+			scenario.frame_canvas.present()
+		canvas.update()
+		build_time = perf_counter() - build_start
+
+		run_start = perf_counter()
+		for _ in range(ticks):
+			scenario.run_tick()
+		run_time = perf_counter() - run_start
+
+		scenario.close()
+
+	canvas.destroy()
+
+	return {
+		"scenario": name,
+		"renderer": renderer,
+		"size": "%dx%d" % (len(scenario.walls[0]), len(scenario.walls)),
+		"ghosts": len(scenario.ghosts),
+		"build_s": build_time,
+		"ticks_per_s": ticks / run_time,
+		"phase_ms": {phase: t * 1000 / ticks for phase, t in scenario.phase_times.items()},
+		"peak_mb": peak_memory()
+	}
+
+def report(result):
+	"""Returns a human readable summary of the results of run_scenario()"""
+	peak = "n/a" if result["peak_mb"] is None else "%.0f MB" % result["peak_mb"]
+	lines = ["%s (%s): %s maze, %d ghosts, built in %.2f s, %.0f ticks/s (%.1fx real time), peak memory %s" % (
+		result["scenario"], result["renderer"], result["size"], result["ghosts"], result["build_s"], result["ticks_per_s"], result["ticks_per_s"] / FPS, peak)]
+
+	total = sum(result["phase_ms"].values())
+	for phase, t in result["phase_ms"].items():
+		lines.append("  %-12s %8.3f ms/tick %5.1f%%" % (phase, t, 100 * t / total if total > 0 else 0))
+
+	return "\n".join(lines)
+
+def main():
+	parser = ArgumentParser(description="Time the game engine on generated mazes with many ghosts")
+	parser.add_argument("--scenario", choices=list(SCENARIOS) + ["all"], help="a preset size, or all of them in turn")
+	parser.add_argument("--width", type=int, default=21)
+	parser.add_argument("--height", type=int, default=27)
+	parser.add_argument("--level", help="a level file like grid.txt, instead of a generated maze")
+	parser.add_argument("--ghosts", type=int, default=1, help="ghosts of each personality")
+	for ghost_type in GHOST_TYPES:
+		parser.add_argument("--" + ghost_type, type=int, help="overrides --ghosts for this personality")
+	parser.add_argument("--ticks", type=int, default=300)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--renderer", choices=["items", "framebuffer", "both"], default="items")
+	args = parser.parse_args()
+
+	if args.scenario == "all":
+		runs = [(name,) + SCENARIOS[name] for name in SCENARIOS]
+	elif args.scenario is not None:
+		runs = [(args.scenario,) + SCENARIOS[args.scenario]]
+	elif args.level is not None:
+		runs = [(args.level, None, None, args.ghosts)]
+	else:
+		runs = [("custom", args.width, args.height, args.ghosts)]
+
+	renderers = ["items", "framebuffer"] if args.renderer == "both" else [args.renderer]
+
+	window = Tk()
+	window.title("Pacman load test")
+
+	for name, width, height, ghosts in runs:
+		ghost_counts = {ghost_type: ghosts for ghost_type in GHOST_TYPES}
+		if name not in SCENARIOS:
+			for ghost_type in GHOST_TYPES:
+				if getattr(args, ghost_type) is not None:
+					ghost_counts[ghost_type] = getattr(args, ghost_type)
+
+		tiles = read_grid(name) if width is None else generate_maze(width, height, args.seed)
+
+		for renderer in renderers:
+			print(report(run_scenario(window, name, tiles, ghost_counts, args.ticks, args.seed, renderer)), flush=True)
+
+	window.destroy()
+
+if __name__ == "__main__":
+	main()
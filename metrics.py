@@ -0,0 +1,139 @@
+"""Serves live statistics about the game over HTTP in the Prometheus text format, for watching it run, e.g. on kiosk machines.
+
+The game updates the metrics as it runs, and the server only reads them, on its own thread,
+so a scrape never calls Tk or waits for the game. Run this file to scrape a running game:
+python metrics.py [port]"""
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sys import argv, platform
+from threading import Thread
+from urllib.request import urlopen
+
+try:
+	from resource import getrusage, getpagesize, RUSAGE_SELF
+except ImportError:
+	getrusage = None
+
+# Upper bounds in seconds of the histogram buckets used for frame and save times
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.0333, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+class Metrics:
+	"""Counters, gauges and histograms, each declared with a name, type and help text before it is used.
+	A metric can have several series, told apart by a tuple of (label, value) pairs, e.g. (("screen", "game"),)"""
+	def __init__(self, prefix="pacman_"):
+		self.prefix = prefix
+		self.declared = {} # Name: (type, help text, histogram buckets)
+		self.series = {} # (name, labels): value, or for histograms [count in each bucket..., sum, count]
+
+	def declare(self, name, kind, help_text, buckets=None):
+		self.declared[name] = (kind, help_text, buckets)
+
+	def set(self, name, value, labels=()):
+		self.series[(name, labels)] = value
+
+	def add(self, name, amount=1, labels=()):
+		self.series[(name, labels)] = self.series.get((name, labels), 0) + amount
+
+	def observe(self, name, value, labels=()):
+		"""Add 'value' to a histogram"""
+		buckets = self.declared[name][2]
+		key = (name, labels)
+		if key not in self.series:
+			self.series[key] = [0] * (len(buckets) + 3)
+
+		values = self.series[key]
+		values[bisect_left(buckets, value)] += 1
+		values[-2] += value
+		values[-1] += 1
+
+	def render(self):
+		"""Returns every metric in the Prometheus text format"""
+		# Copied first, as the game may add a series while the server is reading them
+		series = sorted(list(self.series.items()), key=lambda item: item[0])
+
+		lines = []
+		for name, (kind, help_text, buckets) in self.declared.items():
+			full_name = self.prefix + name
+			lines.append("# HELP %s %s" % (full_name, help_text))
+			lines.append("# TYPE %s %s" % (full_name, kind))
+
+			for (series_name, labels), value in series:
+				if series_name != name:
+					continue
+
+				if kind == "histogram":
+					total = 0
+					for bound, count in zip(buckets + ("+Inf",), value):
+						total += count
+						lines.append("%s_bucket%s %d" % (full_name, format_labels(labels + (("le", str(bound)),)), total))
+					lines.append("%s_sum%s %r" % (full_name, format_labels(labels), float(value[-2])))
+					lines.append("%s_count%s %d" % (full_name, format_labels(labels), value[-1]))
+				else:
+					lines.append("%s%s %r" % (full_name, format_labels(labels), float(value)))
+
+		return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+	if len(labels) == 0:
+		return ""
+
+	return "{" + ",".join('%s="%s"' % (label, value) for label, value in labels) + "}"
+
+def memory_usage():
+	"""Returns the process's resident and peak memory in bytes, each None where it can't be measured"""
+	resident = None
+	peak = None
+
+	if platform.startswith("linux"):
+		with open("/proc/self/statm") as statm:
+			resident = int(statm.read().split()[1]) * getpagesize()
+
+	if getrusage is not None:
+		# macOS reports bytes, Linux KB
+		peak = getrusage(RUSAGE_SELF).ru_maxrss
+		if platform != "darwin":
+			peak *= 1024
+
+	return resident, peak
+
+class MetricsHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path != "/metrics":
+			self.send_error(404)
+			return
+
+		body = self.server.metrics.render().encode()
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		# Scrapes are too frequent to print
+		pass
+
+class MetricsServer:
+	"""Serves 'metrics' at http://host:port/metrics from a background thread"""
+	def __init__(self, metrics, host, port):
+		self.http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+		self.http_server.daemon_threads = True
+		self.http_server.metrics = metrics
+		self.port = self.http_server.server_address[1]
+
+		Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+	def close(self):
+		self.http_server.shutdown()
+		self.http_server.server_close()
+
+def scrape(port, host="127.0.0.1"):
+	"""Returns the metrics served by a running game"""
+	with urlopen("http://%s:%d/metrics" % (host, port), timeout=5) as response:
+		return response.read().decode()
+
+if __name__ == "__main__":
+	from config import METRICS_PORT
+
+	print(scrape(int(argv[1]) if len(argv) > 1 else METRICS_PORT), end="")
@@ -0,0 +1,361 @@
+"""Lets a game be watched, or joined as a second player, from another machine on the local network.
+
+The server publishes the game state every tick as newline-delimited JSON messages over TCP.
+Each message is a delta against the previous one, containing only actors which moved
+and pellets which changed, so a client which joins part way through is sent a full keyframe first.
+A client becomes the second player when it first sends a direction, and is given its own Pac-Man.
+The actors are sent with the "players" Pac-Men first, then the ghosts"""
+
+from collections import deque
+from json import dumps, loads
+from queue import Queue, Empty, Full
+from socket import create_server, create_connection
+from sys import exit
+from threading import Thread, Lock
+from time import perf_counter, sleep
+
+# Recordings made before a second player could join have no "players", and always had one Pac-Man
+EMPTY_STATE = {"tick": 0, "score": 0, "lives": 0, "level": 0, "players": 1, "fruit": None, "actors": [], "eaten": frozenset()}
+
+def make_delta(old, new):
+	"""Returns a message which turns the state 'old' into 'new' when passed to apply_delta()"""
+
+	delta = {"tick": new["tick"]}
+
+	for key in ("score", "lives", "level", "players", "fruit"):
+		if old[key] != new[key]:
+			delta[key] = new[key]
+
+	# Actors are sent as [index, x, y, direction x, direction y, state], only if they have changed
+	old_actors = old["actors"]
+	moved = [[i] + actor for i, actor in enumerate(new["actors"]) if i >= len(old_actors) or old_actors[i] != actor]
+	if len(moved) > 0:
+		delta["actors"] = moved
+	if len(new["actors"]) != len(old_actors):
+		delta["num_actors"] = len(new["actors"])
+
+	eaten = new["eaten"] - old["eaten"]
+	uneaten = old["eaten"] - new["eaten"]
+	if len(eaten) > 0:
+		delta["eat"] = sorted(eaten)
+	if len(uneaten) > 0:
+		delta["uneat"] = sorted(uneaten)
+
+	return delta
+
+def apply_delta(state, delta):
+	"""Update 'state' in place with a message created by make_delta()"""
+
+	if delta.get("keyframe"):
+		state.update(EMPTY_STATE)
+		state["actors"] = []
+		state["eaten"] = set()
+
+	state["tick"] = delta["tick"]
+
+	for key in ("score", "lives", "level", "players", "fruit"):
+		if key in delta:
+			state[key] = delta[key]
+
+	if "num_actors" in delta:
+		del state["actors"][delta["num_actors"]:]
+		state["actors"].extend([None] * (delta["num_actors"] - len(state["actors"])))
+
+	for actor in delta.get("actors", []):
+		state["actors"][actor[0]] = actor[1:]
+
+	for cell in delta.get("eat", []):
+		state["eaten"].add(tuple(cell))
+	for cell in delta.get("uneat", []):
+		state["eaten"].discard(tuple(cell))
+
+def encode(message):
+	return (dumps(message, separators=(",", ":")) + "\n").encode()
+
+class RemoteClient:
+	"""The server's connection to a single client, with its own queue so a slow client can't hold up the game"""
+	def __init__(self, server, connection, queue_size):
+		self.server = server
+		self.connection = connection
+		self.queue = Queue(queue_size)
+		self.needs_keyframe = True
+		self.is_player = False # Set once it sends a direction
+		self.open = True
+
+		Thread(target=self.send_loop, daemon=True).start()
+		Thread(target=self.receive_loop, daemon=True).start()
+
+	def send(self, data):
+		"""Queue encoded data to be sent. If the client has fallen too far behind, drop its queue and resynchronise it with a keyframe"""
+		try:
+			self.queue.put_nowait(data)
+		except Full:
+			self.needs_keyframe = True
+			while not self.queue.empty():
+				self.queue.get_nowait()
+
+	def send_loop(self):
+		while self.open:
+			try:
+				data = self.queue.get(timeout=1)
+			except Empty:
+				continue
+
+			try:
+				self.connection.sendall(data)
+			except OSError:
+				self.close()
+				return
+
+			self.server.record_sent(len(data))
+
+	def receive_loop(self):
+		try:
+			for line in self.connection.makefile("rb"):
+				message = loads(line)
+
+				if "ping" in message:
+					# Echo pings back so the client can measure the round trip time
+					self.send(encode({"pong": message["ping"]}))
+				elif "input" in message:
+					self.is_player = True
+					self.server.add_input(message["input"])
+		except (OSError, ValueError):
+			pass
+
+		self.close()
+
+	def close(self):
+		if self.open:
+			self.open = False
+			self.connection.close()
+
+class SnapshotServer:
+	"""Publishes the game state to every connected client"""
+	def __init__(self, host, port, queue_size=60):
+		self.listener = create_server((host, port))
+		self.port = self.listener.getsockname()[1]
+		self.queue_size = queue_size
+
+		self.clients = []
+		self.clients_lock = Lock()
+		self.inputs = [] # Directions sent by the remote player, see pop_inputs()
+		self.inputs_lock = Lock()
+		self.last_state = EMPTY_STATE
+
+		self.bytes_sent = 0
+		self.messages_sent = 0
+		self.start_time = perf_counter()
+
+		Thread(target=self.accept_loop, daemon=True).start()
+
+	def accept_loop(self):
+		while True:
+			try:
+				connection, _ = self.listener.accept()
+			except OSError:
+				return
+
+			with self.clients_lock:
+				self.clients.append(RemoteClient(self, connection, self.queue_size))
+
+	def publish(self, state):
+		"""Send the changes since the last published state to every client.
+		The delta is encoded once and shared, only clients which need a keyframe get their own message"""
+		delta = None
+
+		with self.clients_lock:
+			self.clients = [client for client in self.clients if client.open]
+
+			for client in self.clients:
+				if client.needs_keyframe:
+					client.needs_keyframe = False
+					client.send(encode(make_delta(EMPTY_STATE, state) | {"keyframe": True}))
+				else:
+					if delta is None:
+						delta = encode(make_delta(self.last_state, state))
+					client.send(delta)
+
+		self.last_state = state
+
+	def add_input(self, direction):
+		"""Called on a client's thread when it sends a direction"""
+		with self.inputs_lock:
+			self.inputs.append(direction)
+
+	def has_player(self):
+		"""Returns True if a client which has sent a direction is still connected"""
+		with self.clients_lock:
+			return any(client.open and client.is_player for client in self.clients)
+
+	def pop_inputs(self):
+		"""Returns the directions sent by remote players since this was last called"""
+		with self.inputs_lock:
+			inputs, self.inputs = self.inputs, []
+		return inputs
+
+	def record_sent(self, num_bytes):
+		self.bytes_sent += num_bytes
+		self.messages_sent += 1
+
+	def stats(self):
+		duration = perf_counter() - self.start_time
+		return {
+			"clients": len(self.clients),
+			"messages_sent": self.messages_sent,
+			"bytes_sent": self.bytes_sent,
+			"bytes_per_message": self.bytes_sent / self.messages_sent if self.messages_sent > 0 else 0,
+			"bytes_per_second": self.bytes_sent / duration if duration > 0 else 0
+		}
+
+	def close(self):
+		self.listener.close()
+		with self.clients_lock:
+			for client in self.clients:
+				client.close()
+
+class SnapshotClient:
+	"""Receives the game state from a SnapshotServer, rebuilding the full state from the deltas"""
+	def __init__(self, host, port, ping_interval=1, rtt_samples=100):
+		self.connection = create_connection((host, port), timeout=2)
+		self.connection.settimeout(None)
+
+		self.state = dict(EMPTY_STATE)
+		self.state["eaten"] = set()
+		self.pending = [] # Messages received since the last poll()
+		self.lock = Lock()
+		self.open = True
+
+		self.ping_interval = ping_interval
+		self.last_ping = 0
+
+		self.bytes_received = 0
+		self.messages_received = 0
+		self.round_trip_times = deque(maxlen=rtt_samples) # Only the latest, so a long session doesn't keep every ping
+		self.start_time = perf_counter()
+
+		Thread(target=self.receive_loop, daemon=True).start()
+
+	def receive_loop(self):
+		try:
+			for line in self.connection.makefile("rb"):
+				message = loads(line)
+				self.bytes_received += len(line)
+				self.messages_received += 1
+
+				if "pong" in message:
+					self.round_trip_times.append(perf_counter() - message["pong"])
+					continue
+
+				with self.lock:
+					self.pending.append(message)
+		except (OSError, ValueError):
+			pass
+
+		self.open = False
+
+	def poll(self):
+		"""Applies the messages received since the last call to 'state', and returns them.
+		This should be called from the thread which reads 'state'.
+		Also pings the server every 'ping_interval' seconds to measure latency"""
+		now = perf_counter()
+		if now - self.last_ping >= self.ping_interval:
+			self.last_ping = now
+			self.send({"ping": now})
+
+		with self.lock:
+			messages, self.pending = self.pending, []
+
+		for message in messages:
+			apply_delta(self.state, message)
+
+		return messages
+
+	def send_input(self, direction):
+		"""Send a direction ("up", "down", "left" or "right") to the server's game"""
+		self.send({"input": direction})
+
+	def send(self, message):
+		try:
+			self.connection.sendall(encode(message))
+		except OSError:
+			self.open = False
+
+	def stats(self):
+		duration = perf_counter() - self.start_time
+		rtts = sorted(self.round_trip_times)
+		return {
+			"messages_received": self.messages_received,
+			"bytes_received": self.bytes_received,
+			"bytes_per_second": self.bytes_received / duration if duration > 0 else 0,
+			"rtt_ms_median": rtts[len(rtts) // 2] * 1000 if len(rtts) > 0 else None,
+			"rtt_ms_max": rtts[-1] * 1000 if len(rtts) > 0 else None
+		}
+
+	def close(self):
+		self.open = False
+		self.connection.close()
+
+def loopback_check(num_states=200):
+	"""Publish a game of made up states to a client over localhost, and check it rebuilds every one of them
+	and that directions and pings make it back to the server. Returns the client's stats, or raises AssertionError"""
+	server = SnapshotServer("127.0.0.1", 0)
+	client = SnapshotClient("127.0.0.1", server.port, ping_interval=0)
+
+	try:
+		# Wait for the server to accept the client, so it is sent the first state as a keyframe
+		wait_until(lambda: len(server.clients) > 0, "the server to accept the client")
+
+		eaten = set()
+		for tick in range(1, num_states + 1):
+			if tick % 3 == 0:
+				eaten.add((tick % 21, tick % 27))
+			if tick % 50 == 0:
+				eaten.discard(((tick - 3) % 21, (tick - 3) % 27))
+
+			state = {
+				"tick": tick,
+				"score": tick * 10,
+				"lives": 3 - tick // 100,
+				"level": 0,
+				"players": 1 + tick // 100,
+				"fruit": "cherry" if 70 <= tick < 100 else None,
+				"actors": [[tick * 18 + i, 96 + i * 192, 1, 0, i % 4] for i in range(1 + tick % 5)],
+				"eaten": frozenset(eaten)
+			}
+			server.publish(state)
+
+			if tick % 20 == 0:
+				client.send_input("left")
+
+			# Wait until the client has this state, then compare it
+			wait_until(lambda: client.poll() is not None and client.state["tick"] == tick, "tick %d" % tick)
+
+			received = client.state | {"eaten": frozenset(client.state["eaten"])}
+			assert received == state, "Tick %d was received as %r" % (tick, received)
+
+		inputs = []
+		wait_until(lambda: inputs.extend(server.pop_inputs()) or len(inputs) >= num_states // 20, "the directions sent")
+		assert inputs == ["left"] * (num_states // 20), "The server received %r" % inputs
+		assert server.has_player(), "The client wasn't made a player by sending directions"
+
+		wait_until(lambda: client.poll() is not None and len(client.round_trip_times) > 0, "a ping to come back")
+
+		return client.stats()
+	finally:
+		client.close()
+		server.close()
+
+def wait_until(condition, what, timeout=5):
+	deadline = perf_counter() + timeout
+	while not condition():
+		assert perf_counter() < deadline, "Timed out waiting for " + what
+		sleep(0.001)
+
+if __name__ == "__main__":
+	# python network.py checks a server and client can talk over localhost
+	try:
+		print("Loopback check passed:", loopback_check())
+	except AssertionError as e:
+		print("Loopback check failed:", e)
+		exit(1)
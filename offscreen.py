@@ -0,0 +1,172 @@
+"""Draws the game into PIL images without a display, so games can be exported as videos faster than they were played"""
+
+from math import atan2
+from PIL import Image, ImageDraw, ImageFont
+
+from config import GAME_GRID_WIDTH, SUBUNITS_PER_CELL
+from sprite import get_sprite_sheet
+from levels import LevelPack
+from world_components import WALL_RECT, PELLET_RECT, POWER_PELLET_RECT, FRUIT_RECTS, PACMAN_RECTS, GHOST_RECTS, PANIC_RECTS, DEAD_RECTS, GHOST_TYPES, GhostState
+
+# Moving sprites change image every 5 ticks, as in create_actors()
+FRAME_FREQ = 5
+
+class OffscreenRenderer:
+	"""Composites the same sprites as the game canvas into frames, from the states sent to network players.
+	'pack_path' is the level pack the game was played with, and 'scale' resizes the frames, 1 is the size the game is drawn at"""
+
+	def __init__(self, pack_path="grid.txt", scale=1):
+		self.scale = scale
+		self.cell = GAME_GRID_WIDTH * scale
+
+		# The score is drawn in a strip above the level
+		self.header = round(self.cell)
+
+		self.level_pack = LevelPack(pack_path)
+		tiles = self.level_pack.level(0).tiles
+		self.width = round(len(tiles[0]) * self.cell)
+		self.height = round(len(tiles) * self.cell) + self.header
+
+		self.wall = self.crop(WALL_RECT, 2)
+		self.pellet = self.crop(PELLET_RECT, 1)
+		self.power_pellet = self.crop(POWER_PELLET_RECT, 1)
+
+		self.fruits = {fruit_type: self.crop(rect, 2) for fruit_type, rect in FRUIT_RECTS.items()}
+		self.pacman_images = [self.crop(rect, 2) for rect in PACMAN_RECTS]
+		self.rotated_images = {}
+		self.ghost_images = {ghost_type: [self.crop(rect, 2) for rect in rects] for ghost_type, rects in GHOST_RECTS.items()}
+		self.panic_images = [self.crop(rect, 2) for rect in PANIC_RECTS]
+		self.dead_images = [self.crop(rect, 2) for rect in DEAD_RECTS]
+		self.life_image = self.crop(PACMAN_RECTS[0], 1)
+
+		self.font = ImageFont.load_default()
+
+		self.set_level(0)
+		self.palette = None
+
+	def set_level(self, number):
+		"""Draw the walls and pellets of level 'number' in the level pack, and start reading the next level"""
+		tiles = self.level_pack.level(number).tiles
+		self.level_number = number
+		self.level_pack.prepare(number + 1)
+
+		# Walls don't change during a level, so are drawn once and each frame starts from a copy
+		self.background = Image.new("RGB", (self.width, self.height), "black")
+		self.pellets = []
+
+		for y, row in enumerate(tiles):
+			for x, tile in enumerate(row):
+				centre = self.cell_centre(x, y)
+				if tile == "W":
+					self.paste(self.background, self.wall, centre)
+				elif tile == "P":
+					self.pellets.append(((x, y), centre, self.pellet))
+				elif tile == "U":
+					self.pellets.append(((x, y), centre, self.power_pellet))
+
+		# The level as last drawn with its pellets, only cells whose pellets have changed are redrawn
+		self.level = self.background.copy()
+		self.level_eaten = frozenset()
+		for _, centre, image in self.pellets:
+			self.paste(self.level, image, centre)
+
+	def crop(self, box, scale):
+		"""Crop an image from the sprite sheet, scaled as the game's sprites are and then by the renderer's scale"""
+		cropped = get_sprite_sheet().crop((box.left, box.top, box.right, box.bottom))
+		w, _ = cropped.size
+		cropped = cropped.resize((w * scale, w * scale))
+
+		if self.scale != 1:
+			size = max(1, round(w * scale * self.scale))
+			cropped = cropped.resize((size, size))
+
+		return cropped
+
+	def cell_centre(self, x, y):
+		return ((x + 0.5) * self.cell, (y + 0.5) * self.cell + self.header)
+
+	def fixed_to_frame(self, x, y):
+		return (x * self.cell / SUBUNITS_PER_CELL, y * self.cell / SUBUNITS_PER_CELL + self.header)
+
+	def paste(self, frame, image, centre):
+		"""Draw 'image' centred on 'centre', as the canvas draws images"""
+		frame.paste(image, (round(centre[0] - image.width / 2), round(centre[1] - image.height / 2)), image)
+
+	def pacman_image(self, index, dx, dy):
+		key = (index, dx, dy)
+
+		if key not in self.rotated_images:
+			self.rotated_images[key] = self.pacman_images[index].rotate(atan2(-dy, dx) * 180/3.1415)
+
+		return self.rotated_images[key]
+
+	def update_level(self, eaten):
+		"""Redraw the cells of pellets which have been eaten or restored since the level was last drawn"""
+		changed = eaten ^ self.level_eaten
+		if len(changed) == 0:
+			return
+
+		half_cell = self.cell / 2
+		for cell, centre, image in self.pellets:
+			if cell in changed:
+				box = tuple(round(v) for v in (centre[0] - half_cell, centre[1] - half_cell, centre[0] + half_cell, centre[1] + half_cell))
+				self.level.paste(self.background.crop(box), box[:2])
+
+				if cell not in eaten:
+					self.paste(self.level, image, centre)
+
+		self.level_eaten = eaten
+
+	def quantize(self, frame):
+		"""Returns 'frame' reduced to a palette made once from the sprites, which is much faster than finding one for each frame"""
+		if self.palette is None:
+			images = [self.life_image] + self.pacman_images + self.panic_images + self.dead_images + list(self.fruits.values())
+			for ghost_images in self.ghost_images.values():
+				images += ghost_images
+
+			sample = self.level.copy()
+			for i, image in enumerate(images):
+				self.paste(sample, image, self.cell_centre(i, 0))
+			ImageDraw.Draw(sample).text((4, self.header / 2), "Score: 0123456789", fill="yellow", font=self.font, anchor="lm")
+
+			self.palette = sample.quantize(colors=256)
+
+		return frame.quantize(palette=self.palette, dither=Image.Dither.NONE)
+
+	def render(self, state):
+		"""Returns an RGB image of the game in 'state', see network_state()"""
+		if state["level"] != self.level_number:
+			self.set_level(state["level"])
+
+		self.update_level(state["eaten"])
+		frame = self.level.copy()
+
+		# Fruit appears in the cell below the pen, like the Fruit sprites
+		if state["fruit"] is not None:
+			self.paste(frame, self.fruits[state["fruit"]], self.cell_centre(10, 15))
+
+		index = (state["tick"] // FRAME_FREQ) % len(self.pacman_images)
+
+		# The Pac-Men come first, then the ghosts
+		players = state["players"]
+		for i, actor in enumerate(state["actors"]):
+			x, y, dx, dy, actor_state = actor
+
+			if i < players:
+				image = self.pacman_image(index, dx, dy)
+			elif actor_state == GhostState.PANIC.value:
+				image = self.panic_images[index]
+			elif actor_state == GhostState.DEAD.value:
+				image = self.dead_images[index]
+			else:
+				image = self.ghost_images[GHOST_TYPES[(i - players) % len(GHOST_TYPES)]][index]
+
+			self.paste(frame, image, self.fixed_to_frame(x, y))
+
+		draw = ImageDraw.Draw(frame)
+		draw.text((4, self.header / 2), "Score: %d   Level: %d" % (state["score"], state["level"] + 1), fill="yellow", font=self.font, anchor="lm")
+
+		for i in range(state["lives"]):
+			self.paste(frame, self.life_image, (self.width - (i + 0.5) * self.life_image.width - 4, self.header / 2))
+
+		return frame
@@ -4,6 +4,8 @@ from json import dump, load as json_load
 from os import path, makedirs
 
 from world_components import Wall, Pellet, PowerPellet, Fruit
+from sprite import screen_coords_to_fixed
+from vector import Vec2
 
 class Save:
 	"""Stores all necessary information to save all aspects of a game"""
@@ -21,10 +23,21 @@ class Save:
 		self.world = world
 		self.score = score
 
+def position_from_save(pos):
+	"""Returns the fixed-point position of a saved sprite.
+	Saves made before movement was fixed-point stored screen co-ordinates, which are always floats"""
+	if isinstance(pos["x"], float) or isinstance(pos["y"], float):
+		return screen_coords_to_fixed(pos["x"], pos["y"])
+
+	return Vec2(pos["x"], pos["y"])
+
 def save(save_name, level, pacman, lives, ghosts, world, score):
 	"""Save the current gamestate in a local JSON file"""
 
-	if not path.exists("saves"): makedirs("saves")
+	write_save(save_name, make_save(level, pacman, lives, ghosts, world, score))
+
+def make_save(level, pacman, lives, ghosts, world, score):
+	"""Returns a Save of the current gamestate, which write_save() can write without touching the game"""
 
 	json_ghosts = []
 	for g in ghosts:
@@ -36,19 +49,24 @@ def save(save_name, level, pacman, lives, ghosts, world, score):
 		for cell in row:
 			if isinstance(cell, Wall):
 				this_row.append(["W"])
-			elif isinstance(cell, Pellet):
-				this_row.append(["P", cell.eaten])
-			elif isinstance(cell, PowerPellet):
-				this_row.append(["U", cell.eaten])
 			elif isinstance(cell, Fruit):
 				this_row.append(["F", cell.fruit_type, cell.timer])
+			elif isinstance(cell, PowerPellet):
+				this_row.append(["U", cell.eaten])
+			elif isinstance(cell, Pellet):
+				this_row.append(["P", cell.eaten])
 			else:
 				this_row.append(("X"))
 
 		json_world.append(this_row)
 
 
-	new_save = Save(level, pacman.pos, pacman.direction, lives, json_ghosts, json_world, score)
+	return Save(level, pacman.pos, pacman.direction, lives, json_ghosts, json_world, score)
+
+def write_save(save_name, new_save):
+	"""Write a Save from make_save() to a local JSON file"""
+
+	if not path.exists("saves"): makedirs("saves")
 
 	with open("saves/" + save_name + ".json", "w") as save_file:
 		dump(new_save, save_file, default = lambda attr: attr.__dict__, indent=2)
@@ -0,0 +1,72 @@
+"""Keeps the game running at full speed on slow machines, by leaving out work which only changes how it looks"""
+
+class QualityGovernor:
+	"""Measures the time each frame takes to simulate and draw, including Tk's drawing, against the 1/'fps' budget.
+	After 'patience' frames in a row over budget the quality is lowered a level, and after 'patience' * 4 frames in a row
+	using less than 'headroom' of the budget it is raised a level again. Each level leaves out more:
+	1. the HUD text is only updated every 'hud_interval' frames
+	2. sprites only change image every other tick, so animations play at half speed
+	3. Pac-Man isn't rotated to face the way it is moving"""
+
+	MAX_LEVEL = 3
+
+	def __init__(self, fps, patience=10, headroom=0.5, hud_interval=10):
+		self.budget = 1 / fps
+		self.patience = patience
+		self.headroom = headroom
+		self.hud_interval = hud_interval
+
+		self.level = 0
+		self.over = 0 # Frames in a row over budget
+		self.under = 0 # Frames in a row with headroom to spare
+		self.frames = 0
+
+		self.frames_at_level = [0] * (self.MAX_LEVEL + 1)
+		self.changes = 0
+
+	def measure(self, frame_time):
+		"""Record the seconds a frame took, changing the level if it has been over or under budget for long enough"""
+		self.frames += 1
+		self.frames_at_level[self.level] += 1
+
+		if frame_time > self.budget:
+			self.over += 1
+			self.under = 0
+		elif frame_time < self.budget * self.headroom:
+			self.under += 1
+			self.over = 0
+		else:
+			self.over = 0
+			self.under = 0
+
+		if self.over >= self.patience and self.level < self.MAX_LEVEL:
+			self.set_level(self.level + 1)
+		elif self.under >= self.patience * 4 and self.level > 0:
+			self.set_level(self.level - 1)
+
+	def set_level(self, level):
+		self.level = level
+		self.over = 0
+		self.under = 0
+		self.changes += 1
+
+	def update_hud(self):
+		"""Returns True if the HUD text should be updated this frame"""
+		return self.level < 1 or self.frames % self.hud_interval == 0
+
+	def animate(self, ticks):
+		"""Returns True if sprites' images should be updated this tick"""
+		return self.level < 2 or ticks % 2 == 0
+
+	def rotate(self):
+		"""Returns True if Pac-Man should be rotated to face the way it is moving"""
+		return self.level < 3
+
+	def stats(self):
+		"""Returns a dictionary of the share of frames drawn at each level"""
+		frames = max(1, self.frames)
+		return {
+			"level": self.level,
+			"changes": self.changes,
+			"frames_at_level": {str(level): count / frames for level, count in enumerate(self.frames_at_level)}
+		}
@@ -0,0 +1,42 @@
+"""Records games to disk so they can be exported as videos afterwards, see export.py.
+
+A recording uses the same messages as network play: a keyframe followed by one delta per tick, one JSON object per line"""
+
+from json import loads
+from os import makedirs, path
+from time import strftime
+
+from network import EMPTY_STATE, make_delta, apply_delta, encode
+
+class GameRecorder:
+	"""Writes the state of the game each tick to a recording file in 'directory'"""
+	def __init__(self, directory):
+		makedirs(directory, exist_ok=True)
+
+		self.path = path.join(directory, "game_" + strftime("%Y%m%d_%H%M%S") + ".jsonl")
+		self.file = open(self.path, "wb")
+		self.last_state = None
+		self.ticks = 0
+
+	def record(self, state):
+		if self.last_state is None:
+			self.file.write(encode(make_delta(EMPTY_STATE, state) | {"keyframe": True}))
+		else:
+			self.file.write(encode(make_delta(self.last_state, state)))
+
+		self.last_state = state
+		self.ticks += 1
+
+	def close(self):
+		self.file.close()
+
+def read_recording(recording_path):
+	"""Yields the state of the game at each tick of a recording made by GameRecorder"""
+	state = dict(EMPTY_STATE)
+
+	with open(recording_path, "r") as recording:
+		for line in recording:
+			apply_delta(state, loads(line))
+
+			# Copy the parts apply_delta() changes in place, so each state yielded stays as it was
+			yield state | {"actors": list(state["actors"]), "eaten": frozenset(state["eaten"])}
@@ -0,0 +1,61 @@
+"""Keeps the canvas in sync with the sprites, only calling Tk when something has actually changed"""
+
+class RenderSync:
+	"""Pushes sprite positions and images to the canvas each sprite is drawn on, and text to 'canvas'.
+	The last rendered state of each sprite is stored on the sprite itself (see Sprite.create_item),
+	and the number of Tk calls made each frame is counted"""
+	def __init__(self, canvas):
+		self.canvas = canvas
+		self.rendered_text = {}
+
+		self.calls = 0 # Tk calls made so far this frame
+		self.frames = 0
+		self.total_calls = 0
+		self.max_calls = 0
+		self.skipped = 0
+
+	def sync(self, sprite):
+		"""Move the sprite's canvas item and update its image, if either has changed since it was last rendered"""
+		screen_pos = sprite.screen_pos
+		pos = (screen_pos.x, screen_pos.y)
+
+		if pos != sprite.rendered_pos:
+			sprite.canvas.coords(sprite.image_id, *pos)
+			sprite.rendered_pos = pos
+			self.calls += 1
+		else:
+			self.skipped += 1
+
+		if sprite.image is not sprite.rendered_image:
+			sprite.canvas.itemconfigure(sprite.image_id, image=sprite.image)
+			sprite.rendered_image = sprite.image
+			self.calls += 1
+		else:
+			self.skipped += 1
+
+	def set_text(self, item_id, text):
+		"""Change the text of a canvas text item, if it is different from the text already shown"""
+		if self.rendered_text.get(item_id) != text:
+			self.canvas.itemconfigure(item_id, text=text)
+			self.rendered_text[item_id] = text
+			self.calls += 1
+		else:
+			self.skipped += 1
+
+	def end_frame(self):
+		"""Record the number of Tk calls made this frame, and start counting for the next one"""
+		self.frames += 1
+		self.total_calls += self.calls
+		self.max_calls = max(self.max_calls, self.calls)
+		self.last_calls = self.calls
+		self.calls = 0
+
+	def stats(self):
+		"""Returns a dictionary of Tk call counts"""
+		return {
+			"frames": self.frames,
+			"tk_calls": self.total_calls,
+			"tk_calls_skipped": self.skipped,
+			"tk_calls_per_frame": self.total_calls / self.frames if self.frames > 0 else 0,
+			"max_tk_calls_per_frame": self.max_calls
+		}
@@ -0,0 +1,263 @@
+"""The rules of the game, simulated a tick at a time on a world of sprites.
+
+The game and loadtest.py both play them through a Simulation, so the load test times the same steps as the game.
+What the rules leave to whoever is running them, like the HUD, the event log or moving on to the next level,
+is done in the hook methods, which subclasses override"""
+
+from config import FPS
+from snapshot import GameSnapshot, pack_pellets, pack_actors
+from vector import Vec2
+from world_components import Ghost, GhostState, Pellet, PowerPellet, Fruit, num_pellets_eaten, eaten_pellets, timers
+
+# The cell the fruit appears in, below the pen
+FRUIT_CELL = (10, 15)
+
+# The square a ghost heads for when it leaves the pen
+PEN_EXIT = Vec2(10, 10)
+
+class Simulation:
+	"""A game of 'level' played on 'world' and 'walls' (see wall_grid()) by 'actors'.
+	The score, lives and the rest are attributes, which the game maps onto its own globals with properties"""
+	def __init__(self, world, walls, actors, level):
+		self.world = world
+		self.walls = walls
+		self.actors = actors
+		self.level = level
+		self.panic_time = level.panic_time
+
+		self.score = 0
+		self.lives = 3
+		self.ghosts_eaten = 0
+		self.last_pellets_eaten = 0
+		self.gained_extra_life = False
+
+		self.reset_timers()
+
+	def reset_timers(self):
+		"""Start the timer wheel afresh with this simulation's handlers, as it is shared by every sprite"""
+		timers.unpack((0, ()))
+		timers.on("panic_end", self.end_ghost_panic)
+		timers.on("fruit_expiry", self.expire_fruit)
+
+	def tick(self, ticks, animate=True, rotate=True):
+		"""Simulate tick number 'ticks'. With 'animate' False the sprites keep their images,
+		and with 'rotate' False Pac-Man isn't turned to face the way it moves"""
+		self.check_lives()
+		self.update_ghosts(ticks, animate, rotate)
+		self.move_players()
+		self.check_collisions()
+
+	def check_lives(self):
+		"""Start the next life, or end the game, if a player was caught last tick.
+		The players share their lives, so either being caught starts the next life for both"""
+		if not all(player.alive for player in self.actors.pacmen):
+			if self.lives == 0:
+				self.game_over()
+			else:
+				self.life_lost()
+
+	def update_ghosts(self, ticks, animate=True, rotate=True):
+		"""Move the ghosts and animate every actor, then fire the timers due this tick before Pac-Man moves"""
+		actors = self.actors
+		walls = self.walls
+
+		# The players don't move until the ghosts have, so each one's cell and direction is only read once
+		targets = {}
+		blinky = actors.ghosts[0] if len(actors.ghosts) > 0 else None
+		blinky_cell = blinky.cell if blinky is not None else None
+
+		actors.start_tick()
+		for s in actors:
+			if isinstance(s, Ghost):
+				target = actors.nearest_pacman(s)
+				if target not in targets:
+					targets[target] = (target.cell, target.direction)
+
+				if animate:
+					s.update_image(ticks)
+				s.update(walls, *targets[target], blinky_cell)
+
+				# The ghosts after Blinky see where it has just moved to
+				if s is blinky:
+					blinky_cell = blinky.cell
+			elif animate:
+				s.update_image(ticks, rotate=rotate)
+
+		timers.advance()
+
+	def move_players(self):
+		"""Each player moves in turn, eating whatever is in the cell it moves into"""
+		actors = self.actors
+		walls = self.walls
+
+		for player in list(actors.pacmen):
+			if not player.will_collide(walls):
+				player.move(walls)
+				self.eat(player.cell)
+
+				# Finishing the level replaces the actors
+				if player not in actors.pacmen:
+					break
+
+	def check_collisions(self):
+		"""Give the bonus life, then find which players were caught and which ghosts eaten this tick"""
+		# Check if player has gained bonus life
+		if self.score >= 10000 and not self.gained_extra_life:
+			self.lives += 1
+			self.gained_extra_life = True
+			self.lives_changed()
+
+		# Check if pacman has collided with any ghosts
+		for pacman_hit, ghost in self.actors.collisions(self.walls):
+			if ghost.state == GhostState.NORMAL and pacman_hit.alive:
+				self.lives -= 1
+				pacman_hit.alive = False
+				self.lives_changed()
+				self.event("death", {"ghost": ghost.ghost_type, "lives": self.lives})
+			elif ghost.state == GhostState.PANIC:
+				ghost.state = GhostState.DEAD
+				self.score += (2 ** self.ghosts_eaten) * 200 # 200, 400, 800, 1600 for eating ghosts
+				self.event("ghost_eaten", {"ghost": ghost.ghost_type, "points": (2 ** self.ghosts_eaten) * 200})
+				self.ghosts_eaten += 1
+
+	def eat(self, cell):
+		"""Eat the pellet or fruit in the cell a player has moved into, then release a ghost, add fruit or finish the level
+		once enough pellets have been eaten"""
+		world = self.world
+		level = self.level
+		fruit_x, fruit_y = FRUIT_CELL
+
+		# Check if a pellet or fruit has been eaten, and update score
+		this_square = world[cell.y][cell.x]
+		if isinstance(this_square, PowerPellet) and not this_square.eaten:
+			# Start Ghost panic
+
+			self.score += 50
+			this_square.eaten = True
+			this_square.hide()
+			self.event("power_pellet", cell=cell)
+
+			self.start_ghost_panic()
+		elif isinstance(this_square, Fruit) and not this_square.eaten:
+			self.score += this_square.score_bonus
+			self.event("fruit_eaten", {"fruit": this_square.fruit_type, "points": this_square.score_bonus}, cell)
+
+			this_square.hide()
+			world[cell.y][cell.x] = -1
+		elif isinstance(this_square, Pellet) and not this_square.eaten:
+			this_square.eaten = True
+			self.score += 10
+
+			this_square.hide()
+			self.event("pellet", cell=cell)
+
+		# Check if its time to release another ghost, or add fruit to the world
+		pellets_eaten = num_pellets_eaten(world)
+		if pellets_eaten != self.last_pellets_eaten:
+			waiting_ghost = self.ghost_to_release(pellets_eaten)
+
+			# Checked first, as after a death the ghosts are back in the pen and would be released instead
+			if pellets_eaten == level.num_pellets:
+				# All pellets eaten, so start new level
+				self.event("level_complete", {"score": self.score})
+				self.level_complete()
+			elif waiting_ghost is not None:
+				self.release_ghost(waiting_ghost)
+			elif pellets_eaten == level.fruit_pellets[0] or (pellets_eaten == level.fruit_pellets[1] and world[fruit_y][fruit_x] == -1):
+				world[fruit_y][fruit_x] = self.level_fruit()
+				world[fruit_y][fruit_x].show()
+				world[fruit_y][fruit_x].timer = 10 * FPS
+				self.event("fruit_spawned", {"fruit": level.fruit})
+
+			self.last_pellets_eaten = pellets_eaten
+
+	def start_ghost_panic(self):
+		for ghost in self.actors.ghosts:
+			if ghost.state != GhostState.DEAD:
+				ghost.state = GhostState.PANIC
+				ghost.panic_timer = self.panic_time * FPS
+
+		self.ghosts_eaten = 0
+
+	def end_ghost_panic(self, slot):
+		self.actors.sprites[slot].end_panic()
+
+	def expire_fruit(self, _):
+		"""Remove the fruit when its timer runs out, unless it has already been eaten"""
+		x, y = FRUIT_CELL
+		if isinstance(self.world[y][x], Fruit):
+			self.world[y][x].hide()
+			self.world[y][x] = -1
+
+	def ghost_to_release(self, pellets_eaten):
+		"""Returns the first ghost waiting in the pen which enough pellets have been eaten to release, if any.
+		The ghosts after Blinky are released in turn at level.release_pellets, any beyond those with the last"""
+		thresholds = self.level.release_pellets
+
+		for i, ghost in enumerate(self.actors.ghosts[1:]):
+			if ghost.state == GhostState.PEN and pellets_eaten >= thresholds[min(i, len(thresholds) - 1)]:
+				return ghost
+
+		return None
+
+	def release_ghost(self, ghost):
+		"""Let a ghost out of the pen"""
+		ghost.state = GhostState.NORMAL
+		ghost.next_square = PEN_EXIT
+
+	def fruit(self):
+		"""Returns the fruit in the world, or None"""
+		x, y = FRUIT_CELL
+		cell = self.world[y][x] if y < len(self.world) and x < len(self.world[y]) else None
+		return cell if isinstance(cell, Fruit) else None
+
+	def network_state(self, ticks):
+		"""Returns the state of the game which is sent to players watching on the network, and recorded"""
+		actors = self.actors
+		fruit = self.fruit()
+
+		# A ghost's state and whether a Pac-Man is alive are both held in the state array
+		x, y, dir_x, dir_y, state = actors.x, actors.y, actors.dir_x, actors.dir_y, actors.state
+
+		return {
+			"tick": ticks,
+			"score": self.score,
+			"lives": self.lives,
+			"level": self.level.number,
+			"players": len(actors.pacmen),
+			"fruit": fruit.fruit_type if fruit is not None else None,
+			"actors": [[x[s.slot], y[s.slot], dir_x[s.slot], dir_y[s.slot], state[s.slot]] for s in actors.pacmen + actors.ghosts],
+			"eaten": eaten_pellets(self.world)
+		}
+
+	def capture_snapshot(self, ticks, speed, pellets, fruits, snapshots):
+		"""Returns a snapshot of the game to add to 'snapshots', see snapshot.py.
+		'pellets' are the world's pellets in order, see level_pellets(), and 'fruits' every Fruit sprite which can appear"""
+		fruit = self.fruit()
+
+		return GameSnapshot(ticks=ticks, score=self.score, lives=self.lives, level=self.level.number, speed=speed, panic_time=self.panic_time,
+							ghosts_eaten=self.ghosts_eaten, last_pellets_eaten=self.last_pellets_eaten, gained_extra_life=self.gained_extra_life,
+							actors=pack_actors(self.actors), pellets=pack_pellets(pellets),
+							fruit=fruits.index(fruit) if fruit is not None else None, timers=timers.pack(),
+							rng_state=snapshots.rng_state_for_snapshot())
+
+	# Hooks, which do nothing unless overridden
+
+	def event(self, event, data=None, cell=None):
+		"""Called when something happens which the event log records, at 'cell' or Pac-Man's cell"""
+
+	def lives_changed(self):
+		"""Called when a life is lost or gained, before the next life starts"""
+
+	def life_lost(self):
+		"""Called at the start of the tick after a player was caught, with lives left"""
+
+	def game_over(self):
+		"""Called at the start of the tick after a player was caught, with no lives left"""
+
+	def level_complete(self):
+		"""Called when every pellet has been eaten"""
+
+	def level_fruit(self):
+		"""Returns the Fruit sprite which appears on this level"""
+		raise NotImplementedError
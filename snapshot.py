@@ -0,0 +1,98 @@
+"""Captures and restores the full game state in memory, cheaply enough to do every tick.
+
+Unlike the JSON saves in progress.py, snapshots are packed into tuples, arrays and bytes of integers,
+and parts of the state which haven't changed (e.g. the random number generator) are shared between snapshots"""
+
+from collections import deque
+
+from world_components import Pellet, Fruit, rng
+from vector import Vec2
+
+class GameSnapshot:
+	"""The complete state of a game at a single tick"""
+	__slots__ = ("ticks", "score", "lives", "level", "speed", "panic_time", "ghosts_eaten", "last_pellets_eaten",
+				 "gained_extra_life", "actors", "pellets", "fruit", "timers", "rng_state")
+
+	def __init__(self, **state):
+		for name in self.__slots__:
+			setattr(self, name, state[name])
+
+def level_pellets(world):
+	"""Returns the pellets and power pellets in the world, in the order they are packed into snapshots"""
+	return [cell for row in world for cell in row if isinstance(cell, Pellet) and not isinstance(cell, Fruit)]
+
+def pack_pellets(pellets):
+	"""Returns one byte per pellet, 1 if it has been eaten"""
+	return bytes([pellet.eaten for pellet in pellets])
+
+def unpack_pellets(pellets, packed):
+	"""Set which pellets are eaten, only changing the canvas for pellets which differ from the snapshot"""
+	for pellet, eaten in zip(pellets, packed):
+		if pellet.eaten != eaten:
+			pellet.eaten = bool(eaten)
+			if eaten:
+				pellet.hide()
+			else:
+				pellet.show()
+
+# The arrays of Actors which are copied into snapshots, see entities.py
+ACTOR_FIELDS = ("x", "y", "dir_x", "dir_y", "state")
+
+def pack_actors(actors):
+	"""Returns copies of the arrays holding Pac-Man and the ghosts, and the square each ghost is heading for"""
+	return (tuple(getattr(actors, name)[:] for name in ACTOR_FIELDS),
+			tuple((ghost.next_square.x, ghost.next_square.y, ghost.at_centre) for ghost in actors.ghosts))
+
+def unpack_actors(actors, packed, speed):
+	arrays, paths = packed
+
+	for name, values in zip(ACTOR_FIELDS, arrays):
+		getattr(actors, name)[:] = values
+
+	for actor in actors:
+		actor.speed = speed
+
+	for ghost, (x, y, at_centre) in zip(actors.ghosts, paths):
+		ghost.next_square = Vec2(x, y)
+		ghost.at_centre = at_centre
+
+class SnapshotBuffer:
+	"""A ring buffer of the snapshots from the last 'capacity' ticks"""
+	def __init__(self, capacity):
+		self.snapshots = deque(maxlen=capacity)
+
+		self.rng_draws = None
+		self.rng_state = None
+
+	def rng_state_for_snapshot(self):
+		"""Returns the state of the game's random number generator.
+		The same state object is shared between snapshots until a random number is drawn"""
+		if rng.draws != self.rng_draws:
+			self.rng_draws = rng.draws
+			self.rng_state = rng.getstate()
+
+		return self.rng_state
+
+	def restore_rng(self, rng_state):
+		"""Set the random number generator to a state from a snapshot"""
+		rng.setstate(rng_state)
+
+		self.rng_draws = rng.draws
+		self.rng_state = rng_state
+
+	def append(self, snapshot):
+		self.snapshots.append(snapshot)
+
+	def rewind(self, num_ticks):
+		"""Remove up to 'num_ticks' of the latest snapshots, and return the oldest one removed, or None if the buffer is empty"""
+		snapshot = None
+		for _ in range(min(num_ticks, len(self.snapshots))):
+			snapshot = self.snapshots.pop()
+
+		return snapshot
+
+	def clear(self):
+		self.snapshots.clear()
+
+	def __len__(self):
+		return len(self.snapshots)
@@ -3,8 +3,50 @@
 from math import atan2
 from PIL import Image, ImageTk
 
-from config import GAME_GRID_WIDTH, GAME_GRID_START_X, GAME_GRID_START_Y, GRID_NUM_CELLS_WIDTH, GRID_NUM_CELLS_HEIGHT
-from vector import Vec2, UP, DOWN, RIGHT, LEFT
+from config import GAME_GRID_WIDTH, GAME_GRID_START_X, GAME_GRID_START_Y, SUBUNITS_PER_CELL
+from vector import Vec2, UP, DOWN, RIGHT
+from atlas import load_atlas
+from entities import Actors
+
+SPRITE_SHEET_PATH = "img/sprite_sheet.png"
+
+sprite_sheet = None
+image_cache = {}
+
+# How many times larger than their size in game units sprites are drawn, see set_display_scale()
+display_scale = 1
+atlas_settings = None
+atlas_images = None
+
+def get_sprite_sheet():
+	"""Returns the sprite sheet image, loading it from disk the first time it is needed"""
+	global sprite_sheet
+
+	if sprite_sheet is None:
+		sprite_sheet = Image.open(SPRITE_SHEET_PATH)
+		sprite_sheet.load()
+
+	return sprite_sheet
+
+def set_display_scale(scale, atlas_sprites=(), cache_dir=None):
+	"""Draw sprites 'scale' times larger, for a canvas drawn at that scale (see ScaledCanvas).
+	The images in 'atlas_sprites', a list of (rect, scale) pairs, are cached pre-scaled in 'cache_dir',
+	which is read the first time a sprite is created"""
+	global display_scale, atlas_settings, atlas_images
+
+	display_scale = scale
+	atlas_settings = (atlas_sprites, cache_dir) if cache_dir is not None else None
+	atlas_images = None
+	image_cache.clear()
+
+def get_atlas():
+	"""Returns the pre-scaled images of the atlas, loading or building it the first time it is needed"""
+	global atlas_images
+
+	if atlas_images is None:
+		atlas_images = {} if atlas_settings is None else load_atlas(SPRITE_SHEET_PATH, atlas_settings[0], display_scale, atlas_settings[1])
+
+	return atlas_images
 
 class Rect:
 	"""Simple class to represent a rectangle by the top, left and bottom, right co-ordinates"""
@@ -16,6 +58,10 @@ class Rect:
 
 class Sprite:
 	"""Represents any drawn entity which doesn't move, for example the walls or pellets"""
+
+	# Canvas tags given to the sprite's item, so whole groups of sprites can be changed with a single Tk call
+	tags = ()
+
 	def __init__(self, canvas, pos, sprite_rects, scale=1):
 		self.pos = pos
 
@@ -32,124 +78,218 @@ class Sprite:
 		"""Crops the main spritesheet according to the bounding boxes provided.
 		Returns a list of the the resulting images"""
 
-		base_image = Image.open("img/sprite_sheet.png")
-
 		images = []
 		for box in bounding_boxes:
-			cropped = base_image.crop((box.left, box.top, box.right, box.bottom))
-			w, _ = cropped.size
-			cropped = cropped.resize((w * scale, w * scale))
-			images.append(ImageTk.PhotoImage(cropped))
+			key = (box.left, box.top, box.right, box.bottom, scale)
+
+			# Sprites with the same image share it, rather than each cropping their own copy
+			if key not in image_cache:
+				cropped = get_atlas().get(key)
+
+				# Images which aren't in the atlas are resized now
+				if cropped is None:
+					cropped = get_sprite_sheet().crop((box.left, box.top, box.right, box.bottom))
+					w, _ = cropped.size
+					size = max(1, round(w * scale * display_scale))
+					cropped = cropped.resize((size, size))
+
+				image_cache[key] = ImageTk.PhotoImage(cropped)
+
+			images.append(image_cache[key])
 
 		return images
 
 	def draw(self):
 		centre = self.pos.scale(GAME_GRID_WIDTH).add(Vec2(GAME_GRID_WIDTH / 2 + GAME_GRID_START_X, GAME_GRID_WIDTH / 2 + GAME_GRID_START_Y))
 
-		return self.canvas.create_image(centre.x, centre.y, image=self.image)
+		return self.create_item(centre.x, centre.y)
+
+	def create_item(self, x, y):
+		"""Creates the canvas item for the sprite, remembering what was drawn so it is only updated when it changes"""
+		self.rendered_pos = (x, y)
+		self.rendered_image = self.image
+
+		return self.canvas.create_image(x, y, image=self.image, tags=self.tags)
 
 	def hide(self):
+		"""Hide the sprite, keeping its canvas item so it can be shown again cheaply"""
+		self.canvas.itemconfigure(self.image_id, state="hidden")
+
+	def show(self):
+		self.canvas.itemconfigure(self.image_id, state="normal")
+
+	def remove(self):
+		"""Delete the sprite's canvas item, for sprites which won't be shown again"""
 		self.canvas.delete(self.image_id)
 
 class MovingSprite(Sprite):
-	def __init__(self, canvas, pos, speed, frame_freq, sprite_rects, scale=1):
+	"""A sprite which moves around the world.
+	Its position is stored in integer fixed-point sub-units (see SUBUNITS_PER_CELL) rather than screen pixels,
+	so movement is exact and identical on every machine and at every screen scale.
+	The sprite is an actor in 'actors', which holds its position, direction and state (see entities.py),
+	or in an Actors of its own if not given"""
+	tags = ("actor",)
+
+	def __init__(self, canvas, pos, speed, frame_freq, sprite_rects, scale=1, actors=None):
+		self.actors = Actors() if actors is None else actors
+		self.slot = self.actors.new_slot(self)
+
 		super().__init__(canvas, pos, sprite_rects, scale)
 
 		self.direction = RIGHT
-		self.speed = speed
+		self.speed = speed # Sub-units per tick
+
+		# Where the sprite was at the start of the current tick, so collisions can be checked along the whole of its move
+		self.last_pos = pos
 		self.frame_freq = frame_freq
 
 		self.images = self.process_sprite_sheet(scale, *sprite_rects)
 		self.num_images = len(self.images)
-		self.image = self.images[0]
+		self.rotated_images = {}
 
-		self.image_id = self.draw()
-
-		self.w = 10 # Allow sprite image to be outide of square
+		self.w = SUBUNITS_PER_CELL * 5 // 16 # Allow sprite image to be outide of square
 
 		self.alive = True
 
+	@property
+	def pos(self):
+		return Vec2(self.actors.x[self.slot], self.actors.y[self.slot])
+
+	@pos.setter
+	def pos(self, pos):
+		self.actors.x[self.slot] = pos.x
+		self.actors.y[self.slot] = pos.y
+
+	@property
+	def last_pos(self):
+		return Vec2(self.actors.last_x[self.slot], self.actors.last_y[self.slot])
+
+	@last_pos.setter
+	def last_pos(self, pos):
+		self.actors.last_x[self.slot] = pos.x
+		self.actors.last_y[self.slot] = pos.y
+
+	@property
+	def direction(self):
+		return Vec2(self.actors.dir_x[self.slot], self.actors.dir_y[self.slot])
+
+	@direction.setter
+	def direction(self, direction):
+		self.actors.dir_x[self.slot] = direction.x
+		self.actors.dir_y[self.slot] = direction.y
+
+	@property
+	def alive(self):
+		return self.actors.state[self.slot] == 1
+
+	@alive.setter
+	def alive(self, alive):
+		self.actors.state[self.slot] = int(alive)
+
+	@property
+	def cell(self):
+		"""The indices of the world cell the sprite's centre is in"""
+		return Vec2(self.actors.x[self.slot] // SUBUNITS_PER_CELL, self.actors.y[self.slot] // SUBUNITS_PER_CELL)
+
+	@property
+	def screen_pos(self):
+		"""The screen co-ordinates the sprite is drawn at"""
+		return fixed_to_screen_coords(self.pos)
+
+	def draw(self):
+		screen_pos = self.screen_pos
+		return self.create_item(screen_pos.x, screen_pos.y)
+
 	def update_image(self, ticks, rotate=False):
-		"""Update the sprite image depending on the number of game ticks and the frequency of image change"""
+		"""Update the sprite image depending on the number of game ticks and the frequency of image change.
+		The canvas isn't updated here, see RenderSync"""
 		if ticks % self.frame_freq == 0 or rotate:
-			self.image = self.images[int((ticks / self.frame_freq) % self.num_images)]
+			index = int((ticks / self.frame_freq) % self.num_images)
 
 			if rotate:
-				rotated_image = ImageTk.getimage(self.image).rotate(atan2(-self.direction.y, self.direction.x) * 180/3.1415)
-				self.image = ImageTk.PhotoImage(rotated_image)
+				self.image = self.get_rotated_image(index)
+			else:
+				self.image = self.images[index]
 
-			self.canvas.itemconfigure(self.image_id, image=self.image)
+	def get_rotated_image(self, index):
+		"""Returns image 'index' rotated to face the current direction.
+		Rotations are cached, so the same image object is used each time and unchanged frames can be skipped"""
+		dir_x = self.actors.dir_x[self.slot]
+		dir_y = self.actors.dir_y[self.slot]
+		key = (index, dir_x, dir_y)
 
-	def move(self, state=0):
-		"""Move a MovingSprite based on its current speed.
-		If 'state' is supplied, movement speed will be adjusted to reflect this"""
-		adjusted_speed = self.speed
+		if key not in self.rotated_images:
+			rotated_image = ImageTk.getimage(self.images[index]).rotate(atan2(-dir_y, dir_x) * 180/3.1415)
+			self.rotated_images[key] = ImageTk.PhotoImage(rotated_image)
+
+		return self.rotated_images[key]
 
-		# Adjust speed depending on state
+	def step(self, state=0):
+		"""Returns the distance moved in one tick, in sub-units, adjusted for the given state"""
 		if state == 2:
-			adjusted_speed *= 2/3
+			return self.speed * 2 // 3
 		elif state == 3:
-			adjusted_speed *= 4
+			return self.speed * 4
+
+		return self.speed
 
-		move_offset = self.direction.scale(adjusted_speed)
+	def move(self, walls, state=0):
+		"""Move a MovingSprite based on its current speed.
+		If 'state' is supplied, movement speed will be adjusted to reflect this. 'walls' gives the size of the world.
+		This runs for every actor every tick, so the arrays are changed directly rather than through the properties"""
+		actors, slot = self.actors, self.slot
+		step = self.step(state)
 
 		# Check if outside map bounds, and move to other side of map
-		current_indices = screen_coords_to_world_indices(self.pos.add(move_offset).x, self.pos.add(move_offset).y)
-
-		if current_indices.x < 0:
-			current_indices.x = GRID_NUM_CELLS_WIDTH - 1
-			self.pos = world_indices_to_screen_coords(current_indices.x, current_indices.y)
-		elif current_indices.x >= GRID_NUM_CELLS_WIDTH:
-			current_indices.x = 0
-			self.pos = world_indices_to_screen_coords(current_indices.x, current_indices.y)
-
-		if current_indices.y < 0:
-			current_indices.y = GRID_NUM_CELLS_HEIGHT - 1
-			self.pos = world_indices_to_screen_coords(current_indices.x, current_indices.y)
-		elif current_indices.y >= GRID_NUM_CELLS_HEIGHT:
-			current_indices.y = 0
-			self.pos = world_indices_to_screen_coords(current_indices.x, current_indices.y)
-
-		self.pos = self.pos.add(move_offset)
-
-	def will_collide(self, world):
-		"""Return True if the Sprite will collide with a wall in the next frame, False otherwise"""
-
-		# Adjust for Tkinter setting x and y in the centre of the sprite
-		top = self.pos.y - self.w/2
-		bottom = self.pos.y + self.w/2
-		left = self.pos.x - self.w/2
-		right = self.pos.x + self.w/2
-
-		# Adjust for the Sprite's movement next frame
-		if   self.direction == UP:    top -= self.speed
-		elif self.direction == DOWN:  bottom += self.speed
-		elif self.direction == RIGHT: right += self.speed
-		elif self.direction == LEFT:  left -= self.speed
-
-		# Get the co-ordinates of each corner of the Sprite
-		top_left = Vec2(left, top)
-		bottom_left = Vec2(left, bottom)
-		top_right = Vec2(right, top)
-		bottom_right = Vec2(right, bottom)
-
-		# Determine which points to check for collision, depending on movement direction
-		if   self.direction.is_equal(UP):    collision_points = [top_left, top_right]
-		elif self.direction.is_equal(DOWN):  collision_points = [bottom_left, bottom_right]
-		elif self.direction.is_equal(RIGHT): collision_points = [top_right, bottom_right]
-		elif self.direction.is_equal(LEFT):  collision_points = [top_left, bottom_left]
-
-		# Get the indices of the cells which the Sprite will be in next frame
-		cells = [screen_coords_to_world_indices(collision_points[0].x, collision_points[0].y),
-		   		 screen_coords_to_world_indices(collision_points[1].x, collision_points[1].y)]
-
-		# If the cells are outside the grid, don't check for collision
-		# Only check one of the cells as, if one is out, they both will be
-		if cells[0].x < 0 or cells[0].x >= GRID_NUM_CELLS_WIDTH or cells[0].y < 0 or cells[0].x >= GRID_NUM_CELLS_HEIGHT:
-			return False
-
-		# Otherwise, check if those cells are a wall
-		return type(world[cells[0].y][cells[0].x]).__name__ == "Wall" or type(world[cells[1].y][cells[1].x]).__name__ == "Wall"
+		actors.x[slot] = (actors.x[slot] + actors.dir_x[slot] * step) % (len(walls[0]) * SUBUNITS_PER_CELL)
+		actors.y[slot] = (actors.y[slot] + actors.dir_y[slot] * step) % (len(walls) * SUBUNITS_PER_CELL)
+
+	def will_collide(self, walls, direction=None):
+		"""Return True if the Sprite will collide with a wall in the next frame, False otherwise.
+		'walls' is from world_components.wall_grid(), 'direction' defaults to the current direction"""
+
+		actors, slot = self.actors, self.slot
+		if direction is None:
+			dir_x, dir_y = actors.dir_x[slot], actors.dir_y[slot]
+		else:
+			dir_x, dir_y = direction.x, direction.y
+
+		# Positions are the centre of the sprite
+		half_w = self.w // 2
+		x = actors.x[slot]
+		y = actors.y[slot]
+		top = y - half_w
+		bottom = y + half_w
+		left = x - half_w
+		right = x + half_w
+
+		# The leading edge of the Sprite sweeps from 'edge' to 'edge + step' along the axis of movement,
+		# between the two corners 'side_a' and 'side_b' on the other axis
+		if dir_x == UP.x and dir_y == UP.y:
+			edge, step, side_a, side_b = top, -self.speed, left, right
+		elif dir_x == DOWN.x and dir_y == DOWN.y:
+			edge, step, side_a, side_b = bottom, self.speed, left, right
+		elif dir_x == RIGHT.x and dir_y == RIGHT.y:
+			edge, step, side_a, side_b = right, self.speed, top, bottom
+		else:
+			edge, step, side_a, side_b = left, -self.speed, top, bottom
+
+		# Check every cell the edge passes through, not just the one it ends in,
+		# so speeds of more than a cell per tick can't jump over a wall
+		first = edge // SUBUNITS_PER_CELL
+		last = (edge + step) // SUBUNITS_PER_CELL
+		cells_crossed = range(first, last + 1) if last >= first else range(first, last - 1, -1)
+		vertical = dir_x == 0
+
+		for i in cells_crossed:
+			for side in (side_a // SUBUNITS_PER_CELL, side_b // SUBUNITS_PER_CELL):
+				x, y = (side, i) if vertical else (i, side)
+
+				# Cells outside the grid are never walls, so the Sprite can leave through the tunnels
+				if 0 <= x < len(walls[0]) and 0 <= y < len(walls) and walls[y][x]:
+					return True
+
+		return False
 
 def screen_coords_to_world_indices(x, y):
 	"""Returns the indices into the 2D list of sprites which corresponds to the screen co-ordinates (x, y)"""
@@ -164,3 +304,22 @@ def world_indices_to_screen_coords(i, j):
 	x = (i + 0.5) * GAME_GRID_WIDTH + GAME_GRID_START_X
 	y = (j + 0.5) * GAME_GRID_WIDTH + GAME_GRID_START_Y
 	return Vec2(x, y)
+
+def world_indices_to_fixed(i, j):
+	"""Returns the fixed-point position of the centre of cell (i, j)"""
+
+	return Vec2(i * SUBUNITS_PER_CELL + SUBUNITS_PER_CELL // 2, j * SUBUNITS_PER_CELL + SUBUNITS_PER_CELL // 2)
+
+def fixed_to_screen_coords(pos):
+	"""Returns the screen co-ordinates which a fixed-point position is drawn at"""
+
+	x = pos.x * GAME_GRID_WIDTH / SUBUNITS_PER_CELL + GAME_GRID_START_X
+	y = pos.y * GAME_GRID_WIDTH / SUBUNITS_PER_CELL + GAME_GRID_START_Y
+	return Vec2(x, y)
+
+def screen_coords_to_fixed(x, y):
+	"""Returns the fixed-point position closest to the screen co-ordinates (x, y)"""
+
+	i = round((x - GAME_GRID_START_X) * SUBUNITS_PER_CELL / GAME_GRID_WIDTH)
+	j = round((y - GAME_GRID_START_Y) * SUBUNITS_PER_CELL / GAME_GRID_WIDTH)
+	return Vec2(i, j)
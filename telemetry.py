@@ -0,0 +1,334 @@
+"""Records timing statistics about the game so that different machines and builds can be compared objectively"""
+
+from collections import deque
+from contextlib import contextmanager
+from csv import writer
+from json import dump, dumps
+from os import path, makedirs
+from platform import platform, processor, python_version
+from time import perf_counter, process_time, strftime, time
+from tkinter.font import names as font_names
+import tracemalloc
+
+class FramePacingMonitor:
+	"""Records the real interval between consecutive calls of the game loop,
+	and counts late and dropped frames relative to the target frame rate.
+	The counts, mean and histogram cover the whole session, but only the last 'max_samples' intervals are kept,
+	for the percentiles and the exported time series, so a long session doesn't grow without limit"""
+	def __init__(self, fps, late_tolerance=0.25, bin_ms=2, max_samples=18000):
+		self.fps = fps
+		self.budget = 1 / fps
+
+		# A frame is 'late' if it arrives more than this fraction of a budget after it was due
+		self.late_tolerance = late_tolerance
+		self.bin_ms = bin_ms
+		self.max_samples = max_samples
+
+		# Frames slower than four times the budget are grouped into a single overflow bucket
+		self.num_bins = int(4 * self.budget * 1000 / bin_ms)
+
+		self.reset()
+
+	def reset(self):
+		"""Clear all recorded data, ready for a new session"""
+		self.session_start = perf_counter()
+		self.last_tick = None
+
+		self.samples = deque(maxlen=self.max_samples) # (seconds since session start, interval in seconds)
+		self.frames = 0
+		self.total_interval = 0
+		self.min_interval = None
+		self.max_interval = 0
+		self.bin_counts = [0] * (self.num_bins + 1)
+		self.late_frames = 0
+		self.dropped_frames = 0
+
+	def tick(self):
+		"""Record the time of a single game loop call. Returns the interval since the last call, or None after a pause"""
+		now = perf_counter()
+		interval = None
+
+		if self.last_tick is not None:
+			interval = now - self.last_tick
+			self.samples.append((now - self.session_start, interval))
+
+			self.frames += 1
+			self.total_interval += interval
+			self.min_interval = interval if self.min_interval is None else min(self.min_interval, interval)
+			self.max_interval = max(self.max_interval, interval)
+			self.bin_counts[min(int(interval * 1000 / self.bin_ms), self.num_bins)] += 1
+
+			if interval > self.budget * (1 + self.late_tolerance):
+				self.late_frames += 1
+
+			# Every whole frame budget which passes without a call is a frame which was never shown
+			missed = int(interval / self.budget) - 1
+			if missed > 0:
+				self.dropped_frames += missed
+
+		self.last_tick = now
+		return interval
+
+	def pause(self):
+		"""Stop measuring until the next tick, e.g. during the countdown, so the gap isn't counted as dropped frames"""
+		self.last_tick = None
+
+	def histogram(self):
+		"""Returns a dictionary mapping frame time buckets (in ms) to the number of frames which fell into them.
+		Frames slower than four times the budget are grouped into a single overflow bucket"""
+		buckets = {}
+		for i, count in enumerate(self.bin_counts[:-1]):
+			buckets["%d-%d" % (i * self.bin_ms, (i + 1) * self.bin_ms)] = count
+		buckets[">=%d" % (self.num_bins * self.bin_ms)] = self.bin_counts[-1]
+
+		return buckets
+
+	def summary(self):
+		"""Returns a dictionary of statistics describing the whole session, with percentiles of the intervals kept"""
+		intervals = sorted(interval for _, interval in self.samples)
+		duration = perf_counter() - self.session_start
+
+		summary = {
+			"platform": platform(),
+			"processor": processor(),
+			"python": python_version(),
+			"target_fps": self.fps,
+			"frames": self.frames,
+			"series_frames": len(intervals),
+			"duration_s": duration,
+			"late_frames": self.late_frames,
+			"dropped_frames": self.dropped_frames,
+			"dropped_per_minute": self.dropped_frames * 60 / duration if duration > 0 else 0,
+		}
+
+		if self.frames > 0:
+			summary["mean_ms"] = self.total_interval * 1000 / self.frames
+			summary["min_ms"] = self.min_interval * 1000
+			summary["max_ms"] = self.max_interval * 1000
+			for p in (50, 95, 99):
+				summary["p%d_ms" % p] = intervals[min(len(intervals) - 1, len(intervals) * p // 100)] * 1000
+			summary["effective_fps"] = self.frames / self.total_interval
+
+		summary["histogram_ms"] = self.histogram()
+
+		return summary
+
+	def export(self, directory, extra=None):
+		"""Write the session summary and time series to JSON and CSV files in 'directory'.
+		Any statistics in the 'extra' dictionary are added to the summary.
+		Returns the path of the files written, without an extension"""
+
+		if not path.exists(directory): makedirs(directory)
+
+		base_path = path.join(directory, "frame_pacing_" + strftime("%Y%m%d_%H%M%S"))
+
+		with open(base_path + ".json", "w") as json_file:
+			dump({"summary": self.summary() | (extra or {}), "series": list(self.samples)}, json_file, indent=2)
+
+		with open(base_path + ".csv", "w", newline="") as csv_file:
+			csv_writer = writer(csv_file)
+			csv_writer.writerow(["time_s", "interval_ms", "late"])
+			for t, interval in self.samples:
+				csv_writer.writerow([round(t, 6), round(interval * 1000, 3), int(interval > self.budget * (1 + self.late_tolerance))])
+
+		return base_path
+
+class TickRateMeter:
+	"""Measures how many game ticks are simulated each second, over the last 'window' seconds"""
+	def __init__(self, window=1):
+		self.window = window
+		self.samples = deque()
+		self.total = 0
+
+	def tick(self, num_ticks=1):
+		"""Record that 'num_ticks' ticks have been simulated since the last call"""
+		now = perf_counter()
+		self.samples.append((now, num_ticks))
+		self.total += num_ticks
+
+		while now - self.samples[0][0] > self.window:
+			self.total -= self.samples.popleft()[1]
+
+	def rate(self):
+		if len(self.samples) < 2:
+			return 0
+
+		# The first sample's ticks were simulated before the window started
+		elapsed = self.samples[-1][0] - self.samples[0][0]
+		return (self.total - self.samples[0][1]) / elapsed if elapsed > 0 else 0
+
+def main_thread_wakeups():
+	"""Returns how many times the main thread has been woken from sleeping, or None where it can't be counted.
+	Only Linux reports it, as the thread's voluntary context switches"""
+	try:
+		with open("/proc/thread-self/status") as status:
+			for line in status:
+				if line.startswith("voluntary_ctxt_switches"):
+					return int(line.split()[1])
+	except OSError:
+		pass
+
+	return None
+
+class IdleMeter:
+	"""Measures the CPU time used and the number of wake-ups while the game is idle, e.g. paused,
+	to show that an idle game leaves the machine alone"""
+	def __init__(self):
+		self.start_time = None
+		self.periods = [] # (seconds, CPU seconds, wake-ups or None) of each idle period
+
+	def start(self):
+		"""Start measuring, when the game goes idle. Must be called on the main thread"""
+		self.start_time = perf_counter()
+		self.start_cpu = process_time()
+		self.start_wakeups = main_thread_wakeups()
+
+	def stop(self):
+		"""Stop measuring, when the game is no longer idle. Returns a line describing the idle period"""
+		seconds = perf_counter() - self.start_time
+		cpu = process_time() - self.start_cpu
+		wakeups = main_thread_wakeups()
+		if wakeups is not None and self.start_wakeups is not None:
+			wakeups -= self.start_wakeups
+
+		self.start_time = None
+		self.periods.append((seconds, cpu, wakeups))
+
+		line = "Idle for %.1f s: %.3f s CPU (%.2f%%)" % (seconds, cpu, 100 * cpu / seconds if seconds > 0 else 0)
+		if wakeups is not None:
+			line += ", %d wake-ups (%.1f/s)" % (wakeups, wakeups / seconds if seconds > 0 else 0)
+
+		return line
+
+	def summary(self):
+		seconds = sum(period[0] for period in self.periods)
+		cpu = sum(period[1] for period in self.periods)
+
+		summary = {
+			"idle_periods": len(self.periods),
+			"idle_s": seconds,
+			"cpu_s": cpu,
+			"cpu_percent": 100 * cpu / seconds if seconds > 0 else 0
+		}
+
+		if all(period[2] is not None for period in self.periods):
+			wakeups = sum(period[2] for period in self.periods)
+			summary["wakeups"] = wakeups
+			summary["wakeups_per_s"] = wakeups / seconds if seconds > 0 else 0
+
+		return summary
+
+class LeakDetector:
+	"""Counts the objects a long session could leak: canvas items on each screen, Tk images and fonts,
+	and the memory allocated by Python, flagging any count which has grown without ever falling for 'window' samples"""
+	def __init__(self, window=6, num_modules=5):
+		self.window = window
+		self.num_modules = num_modules
+
+		self.history = {} # Name of each count: its last 'window' samples
+		self.flagged = set()
+		self.samples = 0
+
+		# Which modules allocated the memory gained since the last sample, largest first
+		self.module_growth = []
+		self.last_snapshot = None
+
+		tracemalloc.start()
+
+	def counts(self, root, canvases):
+		counts = {
+			"tk_images": len(root.tk.call("image", "names")),
+			"tk_fonts": len(font_names(root)),
+			"python_kb": tracemalloc.get_traced_memory()[0] // 1024
+		}
+
+		for name, canvas in canvases.items():
+			counts["items_" + name] = len(canvas.find_all())
+
+		return counts
+
+	def sample(self, root, canvases):
+		"""Take a sample of the Tk root 'root' and the canvases in 'canvases', a dictionary of name: canvas.
+		Returns the names of counts which have just started to look like leaks"""
+		self.samples += 1
+
+		snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+		if self.last_snapshot is not None:
+			growth = snapshot.compare_to(self.last_snapshot, "filename")
+			self.module_growth = [(path.basename(stat.traceback[0].filename), stat.size_diff) for stat in growth[:self.num_modules] if stat.size_diff > 0]
+		self.last_snapshot = snapshot
+
+		new_leaks = []
+		for name, count in self.counts(root, canvases).items():
+			history = self.history.setdefault(name, deque(maxlen=self.window))
+			history.append(count)
+
+			growing = len(history) == self.window and history[-1] > history[0] and all(a <= b for a, b in zip(history, list(history)[1:]))
+			if growing and name not in self.flagged:
+				self.flagged.add(name)
+				new_leaks.append(name)
+			elif not growing:
+				self.flagged.discard(name)
+
+		return new_leaks
+
+	def describe(self, name):
+		"""Returns a line describing a count flagged by sample()"""
+		history = self.history[name]
+		return "Possible leak: %s grew from %d to %d over the last %d samples" % (name, history[0], history[-1], len(history))
+
+	def summary(self):
+		return {
+			"samples": self.samples,
+			"counts": {name: history[-1] for name, history in self.history.items()},
+			"growing": sorted(self.flagged),
+			"module_growth_bytes": dict(self.module_growth)
+		}
+
+class StartupTimer:
+	"""Measures how long each phase of startup takes, and the total time until the main menu is ready.
+	'start' should be taken as early as possible, so the time spent importing modules is included"""
+	def __init__(self, start):
+		self.start = start
+		self.phases = [("imports", perf_counter() - start)]
+		self.time_to_menu = None
+
+	@contextmanager
+	def phase(self, name):
+		"""Time everything inside the 'with' block as a single named phase"""
+		phase_start = perf_counter()
+		try:
+			yield
+		finally:
+			self.phases.append((name, perf_counter() - phase_start))
+
+	def finish(self):
+		"""Record that the main menu is ready. Phases timed after this are screens built on first use"""
+		self.time_to_menu = perf_counter() - self.start
+		self.num_startup_phases = len(self.phases)
+
+	def report(self):
+		"""Returns a human readable breakdown of the startup time"""
+		startup_phases = self.phases[:self.num_startup_phases]
+		other = self.time_to_menu - sum(t for _, t in startup_phases)
+
+		lines = ["Startup: %.1f ms to main menu" % (self.time_to_menu * 1000)]
+		for name, t in startup_phases + [("other", other)]:
+			lines.append("  %-20s %8.1f ms" % (name, t * 1000))
+
+		return "\n".join(lines)
+
+	def export(self, directory):
+		"""Append this startup's timings to 'startup.jsonl' in 'directory', so they can be tracked over time"""
+
+		if not path.exists(directory): makedirs(directory)
+
+		record = {
+			"time": time(),
+			"platform": platform(),
+			"time_to_menu_ms": self.time_to_menu * 1000,
+			"phases_ms": {name: t * 1000 for name, t in self.phases[:self.num_startup_phases]}
+		}
+
+		with open(path.join(directory, "startup.jsonl"), "a") as startup_file:
+			startup_file.write(dumps(record) + "\n")
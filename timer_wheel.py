@@ -0,0 +1,65 @@
+"""Schedules game events a number of ticks ahead, like the end of the ghosts' panic or a fruit disappearing"""
+
+class TimerWheel:
+	"""A hashed timer wheel with 'size' slots, each holding the timers due on the ticks which map to it.
+	Advancing a tick only looks at one slot, so its cost doesn't grow with the number of timers pending.
+
+	Timers are named by a kind and an integer key or None, e.g. ("panic_end", 2), rather than holding a callback,
+	so they can be copied into snapshots and saves. The handler for each kind is set with on(), and is passed the key.
+	Scheduling a timer replaces any pending timer with the same name"""
+	def __init__(self, size=256):
+		self.now = 0
+		self.slots = [{} for _ in range(size)] # Each is {name: due tick}
+		self.pending = {} # Name: due tick
+		self.handlers = {}
+
+	def on(self, kind, handler):
+		"""Call 'handler' with the key of each timer of 'kind' when it fires"""
+		self.handlers[kind] = handler
+
+	def schedule(self, delay, kind, key=None):
+		"""Fire a timer 'delay' ticks from now, at least one"""
+		self.add((kind, key), self.now + max(1, delay))
+
+	def add(self, name, due):
+		self.cancel(*name)
+		self.pending[name] = due
+		self.slots[due % len(self.slots)][name] = due
+
+	def cancel(self, kind, key=None):
+		due = self.pending.pop((kind, key), None)
+		if due is not None:
+			del self.slots[due % len(self.slots)][(kind, key)]
+
+	def remaining(self, kind, key=None):
+		"""Returns the number of ticks until a timer fires, or -1 if it isn't pending"""
+		due = self.pending.get((kind, key))
+		return -1 if due is None else due - self.now
+
+	def advance(self):
+		"""Move on a tick, firing the timers due on it"""
+		self.now += 1
+		slot = self.slots[self.now % len(self.slots)]
+
+		# Timers due on later turns of the wheel stay in the slot. Those due are fired in order of their names,
+		# so the order is the same however the wheel was built, e.g. after unpack()
+		due = sorted((name for name, tick in slot.items() if tick == self.now), key=lambda name: (name[0], -1 if name[1] is None else name[1]))
+		for name in due:
+			del slot[name]
+			del self.pending[name]
+
+		for kind, key in due:
+			self.handlers[kind](key)
+
+	def pack(self):
+		"""Returns the wheel's state as a tuple, see unpack()"""
+		return (self.now, tuple(self.pending.items()))
+
+	def unpack(self, packed):
+		"""Set the wheel to a state from pack(), replacing every pending timer"""
+		for kind, key in list(self.pending):
+			self.cancel(kind, key)
+
+		self.now, pending = packed
+		for name, due in pending:
+			self.add(name, due)
@@ -1,17 +1,56 @@
 """Abstractions of Tkinter widgets to more finely control their behaviour"""
 
-from tkinter import Button, Entry
+from tkinter import Button, Canvas, Entry
 from tkinter.font import Font
 
+class ScaledCanvas(Canvas):
+	"""A canvas whose items are placed in design units (S_WIDTH x S_HEIGHT), drawn 'display_scale' times larger.
+	The game lays everything out at one size, and only the canvas, fonts and sprite images change with the window"""
+	def __init__(self, master, display_scale, width, height, **options):
+		self.display_scale = display_scale
+		super().__init__(master, width=round(width * display_scale), height=round(height * display_scale), **options)
+
+	def to_screen(self, coords):
+		# Co-ordinates can be given either as separate arguments or as a single sequence
+		if len(coords) == 1 and isinstance(coords[0], (tuple, list)):
+			coords = coords[0]
+
+		return [c * self.display_scale for c in coords]
+
+	def scale_options(self, options):
+		if "width" in options:
+			options["width"] = options["width"] * self.display_scale
+
+		return options
+
+	def create_image(self, *coords, **options):
+		return super().create_image(*self.to_screen(coords), **options)
+
+	def create_text(self, *coords, **options):
+		return super().create_text(*self.to_screen(coords), **self.scale_options(options))
+
+	def create_window(self, *coords, **options):
+		return super().create_window(*self.to_screen(coords), **options)
+
+	def coords(self, item, *coords):
+		if len(coords) == 0:
+			return [c / self.display_scale for c in super().coords(item)]
+
+		return super().coords(item, *self.to_screen(coords))
+
+	def move(self, item, x, y):
+		return super().move(item, x * self.display_scale, y * self.display_scale)
+
 class CanvasButton:
 	"""Represents a single button in a canvas, used to perform a single function"""
 	def __init__(self, window, canvas, x, y, options):
 		self.button = Button(window, **options)
 		self.button_id = canvas.create_window(x, y, window=self.button)
 
-		font_family = options["font"].actual()["family"]
-		self.normal_font = Font(size=24, family=font_family)
-		self.hover_font = Font(size=30, family=font_family)
+		# The hover font is a quarter larger than the button's own font, which is scaled with the display
+		font = options["font"].actual()
+		self.normal_font = Font(size=font["size"], family=font["family"])
+		self.hover_font = Font(size=round(font["size"] * 1.25), family=font["family"])
 
 		self.button.bind('<Enter>', self.enter)
 		self.button.bind('<Leave>', self.leave)
@@ -1,55 +1,101 @@
 """Defines the different parts of the pacman game and world"""
 
-from math import inf, ceil
+from math import inf
 from enum import Enum
-from random import choice
+from random import Random
 
-from sprite import Sprite, MovingSprite, Rect, screen_coords_to_world_indices as screen2indices, world_indices_to_screen_coords as world2screen
-from config import GAME_GRID_START_X, GAME_GRID_START_Y, GAME_GRID_WIDTH, GRID_NUM_CELLS_WIDTH
+from config import SUBUNITS_PER_CELL
+from sprite import Sprite, MovingSprite, Rect, world_indices_to_fixed as world2fixed
 from vector import Vec2, UP, DOWN, LEFT, RIGHT
+from timer_wheel import TimerWheel
+
+class GameRandom(Random):
+	"""The random number generator used by the game.
+	Counts how many times it has been used, so snapshots can tell when its state has changed"""
+	draws = 0
+
+	def getrandbits(self, k):
+		self.draws += 1
+		return super().getrandbits(k)
+
+rng = GameRandom()
+
+# The game's timers, advanced once per game tick. The game sets what happens when they fire, see TimerWheel.on()
+timers = TimerWheel()
+
+# Where each sprite's images are on the sprite sheet, used by the Tk sprites and the offscreen renderer
+WALL_RECT = Rect(60, 0, 76, 16)
+PELLET_RECT = Rect(80, 0, 100, 20)
+POWER_PELLET_RECT = Rect(100, 0, 120, 20)
+FRUIT_RECTS = {
+	"cherry": Rect(60, 60, 80, 80),
+	"banana": Rect(80, 60, 100, 80),
+	"strawberry": Rect(100, 60, 120, 80),
+	"apple": Rect(60, 80, 80, 100),
+	"key": Rect(80, 80, 100, 100)
+}
+FRUIT_BONUSES = {"cherry": 100, "banana": 200, "strawberry": 400, "apple": 750, "key": 1000}
+PACMAN_RECTS = [Rect(0, 0, 20, 20), Rect(20, 0, 40, 20), Rect(40, 0, 60, 20)]
+GHOST_RECTS = {
+	"blinky": [Rect(0, 20, 20, 40), Rect(20, 20, 40, 40), Rect(40, 20, 60, 40)],
+	"inky": [Rect(0, 40, 20, 60), Rect(20, 40, 40, 60), Rect(40, 40, 60, 60)],
+	"pinky": [Rect(0, 60, 20, 80), Rect(20, 60, 40, 80), Rect(40, 60, 60, 80)],
+	"clyde": [Rect(0, 80, 20, 100), Rect(20, 80, 40, 100), Rect(40, 80, 60, 100)]
+}
+PANIC_RECTS = [Rect(60, 40, 80, 60), Rect(80, 40, 100, 60), Rect(100, 40, 120, 60)]
+DEAD_RECTS = [Rect(60, 20, 80, 40), Rect(80, 20, 100, 40), Rect(100, 20, 120, 40)]
+
+# Each image the game draws and the scale it is drawn at, kept pre-scaled for the display in the sprite atlas (see atlas.py)
+ATLAS_SPRITES = [(WALL_RECT, 2), (PELLET_RECT, 1), (POWER_PELLET_RECT, 1), (PACMAN_RECTS[0], 1)] + [
+	(rect, 2) for rect in [*FRUIT_RECTS.values(), *PACMAN_RECTS, *sum(GHOST_RECTS.values(), []), *PANIC_RECTS, *DEAD_RECTS]]
+
+# The ghosts in the order they follow Pac-Man in the list of moving sprites
+GHOST_TYPES = ("blinky", "inky", "pinky", "clyde")
 
 class Wall(Sprite):
 	"""Represents a wall in the game.
 	x and y co-ordinates are relative to the grid used in the game, not the screen"""
+	tags = ("level", "wall")
+
 	def __init__(self, canvas, pos, scale=1):
-		super().__init__(canvas, pos, [Rect(60, 0, 76, 16)], scale)
+		super().__init__(canvas, pos, [WALL_RECT], scale)
 
 class Pellet(Sprite):
 	"""Represents a single pellet in the world which pacman can eat.
 	x and y co-ordinates are relative to the grid used in the game, not the screen"""
-	def __init__(self, canvas, pos, image=Rect(80, 0, 100, 20), scale=1):
+	tags = ("level", "pellet")
+
+	def __init__(self, canvas, pos, image=PELLET_RECT, scale=1):
 		super().__init__(canvas, pos, [image], scale)
 
 		self.eaten = False
 
 class Fruit(Pellet):
 	"""Represents the bonus 'fruits' that spawn into the game for extra points"""
+	tags = ("fruit",)
+
 	def __init__(self, canvas, fruit_type, scale=1):
 		self.fruit_type = fruit_type
+		self.score_bonus = FRUIT_BONUSES[fruit_type]
 
-		if self.fruit_type == "cherry":
-			image = Rect(60, 60, 80, 80)
-			self.score_bonus = 100
-		elif self.fruit_type == "banana":
-			image = Rect(80, 60, 100, 80)
-			self.score_bonus = 200
-		elif self.fruit_type == "strawberry":
-			image = Rect(100, 60, 120, 80)
-			self.score_bonus = 400
-		elif self.fruit_type == "apple":
-			image = Rect(60, 80, 80, 100)
-			self.score_bonus = 750
-		elif self.fruit_type == "key":
-			image = Rect(80, 80, 100, 100)
-			self.score_bonus = 1000
-
-		super().__init__(canvas, Vec2(10, 15), image, scale)
+		super().__init__(canvas, Vec2(10, 15), FRUIT_RECTS[fruit_type], scale)
 		self.hide()
 
+	@property
+	def timer(self):
+		"""Ticks until the fruit disappears, held by the "fruit_expiry" timer"""
+		return timers.remaining("fruit_expiry")
+
+	@timer.setter
+	def timer(self, ticks):
+		timers.schedule(ticks, "fruit_expiry")
+
 class PowerPellet(Pellet):
 	"""Represents the glowing power pellets in the four corners"""
+	tags = ("level", "pellet", "power_pellet")
+
 	def __init__(self, canvas, pos, scale=1):
-		super().__init__(canvas, pos, Rect(100, 0, 120, 20), scale)
+		super().__init__(canvas, pos, POWER_PELLET_RECT, scale)
 
 def num_pellets_eaten(world):
 	eaten = 0
@@ -61,26 +107,82 @@ def num_pellets_eaten(world):
 
 	return eaten
 
-def generate_level(canvas, grid_path):
-	"""Returns a 2D list of sprites to represent the world, based on the input text file, empty tiles are represented with -1"""
+def eaten_pellets(world):
+	"""Returns the indices (x, y) of every pellet and power pellet in the world which has been eaten"""
+	eaten = set()
+	for y, row in enumerate(world):
+		for x, cell in enumerate(row):
+			if isinstance(cell, Pellet) and not isinstance(cell, Fruit) and cell.eaten:
+				eaten.add((x, y))
+
+	return eaten
+
+def show_layer(canvas, tag):
+	"""Show every sprite with the canvas tag 'tag', e.g. "wall" or "pellet", in a single Tk call"""
+	canvas.itemconfigure(tag, state="normal")
+
+def hide_layer(canvas, tag):
+	"""Hide every sprite with the canvas tag 'tag' in a single Tk call"""
+	canvas.itemconfigure(tag, state="hidden")
+
+def restore_pellets(canvas, world):
+	"""Mark every pellet and power pellet in the world as uneaten, and show them all again"""
+	for row in world:
+		for cell in row:
+			if isinstance(cell, Pellet) and not isinstance(cell, Fruit):
+				cell.eaten = False
+
+	show_layer(canvas, "pellet")
+
+def generate_level(canvas, tiles):
+	"""Returns a 2D list of sprites to represent the world, based on the tiles of a level (see read_grid()), empty tiles are represented with -1"""
+
+	return [[create_tile(canvas, tile, j, i) for j, tile in enumerate(row)] for i, row in enumerate(tiles)]
+
+def create_tile(canvas, tile, x, y):
+	"""Returns the sprite for a letter of a level file at indices (x, y), or -1 for an empty tile"""
+	if tile == "W":
+		return Wall(canvas, Vec2(x, y), scale=2)
+	elif tile == "P":
+		return Pellet(canvas, Vec2(x, y))
+	elif tile == "U":
+		return PowerPellet(canvas, Vec2(x, y))
+	else:
+		return -1
+
+def read_grid(grid_path):
+	"""Returns the tiles of a level file as a list of strings, one letter per tile, e.g. "W" for a wall"""
 
-	sprites = []
 	with open(grid_path, "r") as grid:
-		for i, line in enumerate(grid.readlines()):
-			tiles = line.split(" ")
-			this_row = []
-			for j, tile in enumerate(tiles):
-				if tile[0] == "W":
-					this_row.append(Wall(canvas, Vec2(j, i), scale=2))
-				elif tile[0] == "P":
-					this_row.append(Pellet(canvas, Vec2(j, i)))
-				elif tile[0] == "U":
-					this_row.append(PowerPellet(canvas, Vec2(j, i)))
-				else:
-					this_row.append(-1)
-			sprites.append(this_row)
-
-	return sprites
+		return ["".join(tile[0] for tile in line.split(" ")) for line in grid.readlines()]
+
+def diff_grids(old_tiles, new_tiles):
+	"""Returns a list of (x, y, tile) for each tile of 'new_tiles' which differs from 'old_tiles'.
+	Both must be the same size, see read_grid()"""
+	changes = []
+
+	for y, (old_row, new_row) in enumerate(zip(old_tiles, new_tiles)):
+		if old_row != new_row:
+			changes += [(x, y, new) for x, (old, new) in enumerate(zip(old_row, new_row)) if old != new]
+
+	return changes
+
+def apply_grid_changes(canvas, world, walls, changes):
+	"""Replace the sprites of the cells in 'changes', see diff_grids(), and update those cells of the walls grid.
+	The rest of the world, including which pellets have been eaten, is left as it is"""
+	for x, y, tile in changes:
+		# Fruit sprites are reused each level, so are only hidden
+		if isinstance(world[y][x], Fruit):
+			world[y][x].hide()
+		elif isinstance(world[y][x], Sprite):
+			world[y][x].remove()
+
+		world[y][x] = create_tile(canvas, tile, x, y)
+		walls[y][x] = isinstance(world[y][x], Wall)
+
+		# Keep the level below Pac-Man and the ghosts, which were drawn before it
+		if isinstance(world[y][x], Sprite):
+			canvas.tag_lower(world[y][x].image_id)
 
 class GhostState(Enum):
 	PEN = 0
@@ -88,25 +190,24 @@ class GhostState(Enum):
 	PANIC = 2
 	DEAD = 3
 
+# Ghost states in order of value, which is how they are stored in Actors
+GHOST_STATES = tuple(GhostState)
+
 class Ghost(MovingSprite):
 	"""Represents one of the ghosts, with a custom 'pathing_function' to calculate where the ghost will move"""
-	def __init__(self, canvas, pos, speed, frame_freq, sprite_rects, ghost_type, scale=1):
-		super().__init__(canvas, pos, speed, frame_freq, sprite_rects, scale)
-
-		if ghost_type == "blinky":
-			self.pathing_function = self.blinky_path
-		elif ghost_type == "pinky":
-			self.pathing_function = self.pinky_path
-		elif ghost_type == "inky":
-			self.pathing_function = self.inky_path
-		elif ghost_type == "clyde":
-			self.pathing_function = self.clyde_path
-
-		self.next_square = screen2indices(self.pos.x, self.pos.y)
+	def __init__(self, canvas, pos, speed, frame_freq, sprite_rects, ghost_type, scale=1, actors=None):
+		# Set first, as it is how Actors knows the sprite is a ghost
+		self.ghost_type = ghost_type
+
+		super().__init__(canvas, pos, speed, frame_freq, sprite_rects, scale, actors)
+
+		self.pathing_function = PATHING_FUNCTIONS[ghost_type]
+
+		self.next_square = self.cell
 		self.at_centre = True
 
-		self.panic_images = self.process_sprite_sheet(scale, Rect(60, 40, 80, 60), Rect(80, 40, 100, 60), Rect(100, 40, 120, 60))
-		self.dead_images = self.process_sprite_sheet(scale, Rect(60, 20, 80, 40), Rect(80, 20, 100, 40), Rect(100, 20, 120, 40))
+		self.panic_images = self.process_sprite_sheet(scale, *PANIC_RECTS)
+		self.dead_images = self.process_sprite_sheet(scale, *DEAD_RECTS)
 		self.num_panic_images = len(self.panic_images)
 		self.num_dead_images = len(self.dead_images)
 
@@ -115,34 +216,59 @@ class Ghost(MovingSprite):
 		self.state = GhostState.PEN
 		self.direction = RIGHT
 
+	@property
+	def state(self):
+		return GHOST_STATES[self.actors.state[self.slot]]
+
+	@state.setter
+	def state(self, state):
+		self.actors.state[self.slot] = state.value
+
+	@property
+	def panic_timer(self):
+		"""Ticks until the ghost's panic ends, or -1, held by a "panic_end" timer keyed by its slot, see end_panic()"""
+		return timers.remaining("panic_end", self.slot)
+
+	@panic_timer.setter
+	def panic_timer(self, ticks):
+		if ticks > 0:
+			timers.schedule(ticks, "panic_end", self.slot)
+		else:
+			timers.cancel("panic_end", self.slot)
+
 	def to_save(self):
 		return [self.pos, self.direction, self.next_square, self.state.value, self.panic_timer]
 
-	def update(self, world, ghost_coords, pacman_coords, pacman_dir, blinky_pos):
-		"""Re-evaluate next moves based on pacman's position and current state, and move based on this"""
-
-		current_indices = screen2indices(ghost_coords.x, ghost_coords.y)
+	def update(self, walls, pacman_indices, pacman_dir, blinky_indices):
+		"""Re-evaluate next moves based on pacman's position and current state, and move based on this.
+		Pacman and Blinky's positions are given as the indices of the cells they are in, 'walls' is from wall_grid().
+		This runs for every ghost every tick, so the actor's arrays are read and written directly rather than through the properties,
+		which would make a new Vec2 or look up the slot on each read"""
+		actors, slot = self.actors, self.slot
+		next_square = self.next_square
 
 		# Only re-evaulate pathing if the Ghost has moved into a new square
-		if current_indices.is_equal(self.next_square) and self.at_centre:
+		if self.at_centre and actors.x[slot] // SUBUNITS_PER_CELL == next_square.x and actors.y[slot] // SUBUNITS_PER_CELL == next_square.y:
+			current_indices = next_square
+			state = self.state
+
 			# Allow entrance to the starting pen if ghost is dead
-			if self.state == GhostState.DEAD:
-				possibles = get_neighbours(world, ghost_coords, starting_pen=True)
+			if state == GhostState.DEAD:
+				possibles = get_neighbours(walls, current_indices, starting_pen=True)
 			else:
-				possibles = get_neighbours(world, ghost_coords)
-			possibles_no_reverse = self.remove_reverse_moves(current_indices, possibles)
+				possibles = get_neighbours(walls, current_indices)
+			possibles_no_reverse = remove_reverse_moves(current_indices, self.direction, possibles)
 
 
 			# Only make a decision if the Ghost is at a junction, i.e. there are more than two possible squares to move into
 			if len(possibles) > 2:
-				pacman_indices = screen2indices(pacman_coords.x, pacman_coords.y)
-				if self.state == GhostState.NORMAL:
+				if state == GhostState.NORMAL:
 					# Use pathing function if in normal state
-					self.next_square = self.pathing_function(possibles_no_reverse, pacman_indices, pacman_dir, blinky_pos)
-				elif self.state == GhostState.PANIC:
+					self.next_square = self.pathing_function(possibles_no_reverse, pacman_indices, pacman_dir, blinky_indices, current_indices)
+				elif state == GhostState.PANIC:
 					# Take a random path if in panic mode
-					self.next_square = get_next_step(possibles, choice(possibles_no_reverse))
-				elif self.state == GhostState.DEAD:
+					self.next_square = get_next_step(possibles, rng.choice(possibles_no_reverse))
+				elif state == GhostState.DEAD:
 					# Return to normal state if back in the pen
 					if current_indices.is_equal(Vec2(10, 12)):
 						self.state = GhostState.NORMAL
@@ -150,8 +276,8 @@ class Ghost(MovingSprite):
 					else:
 						# Otherwise move back towards the pen
 						self.next_square = get_next_step(possibles_no_reverse, Vec2(10, 12))
-				elif self.state == GhostState.PEN:
-					self.next_square = choice([
+				elif state == GhostState.PEN:
+					self.next_square = rng.choice([
 						Vec2(9, 12),
 						Vec2(10, 12),
 						Vec2(11, 12),
@@ -166,126 +292,137 @@ class Ghost(MovingSprite):
 				self.next_square = possibles_no_reverse[0]
 			else:
 				# If there's only one possibility, the Ghost is about to go off the map, so teleport to the other side
-				self.pos = world2screen(possibles[0].x, possibles[0].y)
+				self.pos = world2fixed(possibles[0].x, possibles[0].y)
 
 				# Set next target so the Ghost doesn't teleport back immediately
-				next_square = self.pos.add(self.direction.scale(GAME_GRID_WIDTH))
-				self.next_square = screen2indices(next_square.x, next_square.y)
-
-		target_centre = Vec2((self.next_square.x * GAME_GRID_WIDTH) + GAME_GRID_START_X + GAME_GRID_WIDTH / 2, (self.next_square.y * GAME_GRID_WIDTH) + GAME_GRID_START_Y + GAME_GRID_WIDTH / 2)
-
-		# Check if the Ghost is close enough to the centre of its target
-		speed_modifier = 1
-		if self.state == GhostState.DEAD:
-			speed_modifier = 4
-		centre_x = abs(target_centre.x - self.pos.x) <= ceil(self.speed * speed_modifier / 2)
-		centre_y = abs(target_centre.y - self.pos.y) <= ceil(self.speed * speed_modifier / 2)
-		self.at_centre = centre_x and centre_y
-
-		# Move toward the centre of the target
-		if not centre_x:
-			if target_centre.x > self.pos.x:
-				self.direction = RIGHT
-			elif target_centre.x < self.pos.x:
-				self.direction = LEFT
-			self.move(self.state.value)
-
-		if not centre_y:
-			if target_centre.y > self.pos.y:
-				self.direction = DOWN
-			elif target_centre.y < self.pos.y:
-				self.direction = UP
-			self.move(self.state.value)
-
-		# If in panic mode, reduce panic timer and check if panic is over
+				self.next_square = possibles[0].add(self.direction)
+
+		# The centre of the target, as world2fixed() gives it
+		next_square = self.next_square
+		target_x = next_square.x * SUBUNITS_PER_CELL + SUBUNITS_PER_CELL // 2
+		target_y = next_square.y * SUBUNITS_PER_CELL + SUBUNITS_PER_CELL // 2
+
+		# Move toward the centre of the target, stopping exactly on it rather than overshooting.
+		# Read after choosing the target, as the ghost may have gone through a tunnel or changed state
+		step = self.step(actors.state[slot])
+		x = actors.x[slot]
+		y = actors.y[slot]
+		dx = target_x - x
+		dy = target_y - y
+		direction = None
+
+		if dx > 0:
+			direction = RIGHT
+			x += min(step, dx)
+		elif dx < 0:
+			direction = LEFT
+			x -= min(step, -dx)
+
+		if dy > 0:
+			direction = DOWN
+			y += min(step, dy)
+		elif dy < 0:
+			direction = UP
+			y -= min(step, -dy)
+
+		actors.x[slot] = x
+		actors.y[slot] = y
+		if direction is not None:
+			actors.dir_x[slot] = direction.x
+			actors.dir_y[slot] = direction.y
+		self.at_centre = x == target_x and y == target_y
+
+	def end_panic(self):
+		"""Called when the ghost's panic timer fires, which is ignored if it has been eaten since"""
 		if self.state == GhostState.PANIC:
-			self.panic_timer -= 1
-
-			if self.panic_timer == 0:
-				if not self.is_in_pen():
-					self.state = GhostState.NORMAL
-				else:
-					self.state = GhostState.PEN
-
-	def remove_reverse_moves(self, pos, possibles):
-		"Return a list of possible next squares to move into which don't require direction to be reversed"
-		updated_moves = []
-
-		past_square = pos.add(self.direction.scale(-1))
-		for p in possibles:
-			if not p.is_equal(past_square): updated_moves.append(p)
-
-		return updated_moves
+			if not self.is_in_pen():
+				self.state = GhostState.NORMAL
+			else:
+				self.state = GhostState.PEN
 
 	def is_in_pen(self):
 		"""Returns True if the Ghost is in the starting pen, False otherwise"""
-		pos_indices = screen2indices(self.pos.x, self.pos.y)
+		pos_indices = self.cell
 		for square in [Vec2(9, 12), Vec2(10, 12), Vec2(11, 12), Vec2(9, 13), Vec2(10, 13), Vec2(11, 13)]:
 			if pos_indices.is_equal(square):
 				return True
 		return False
 
 	def update_image(self, ticks):
-		"""Update the sprite image depending on the number of game ticks and the frequency of image change"""
+		"""Update the sprite image depending on the number of game ticks and the frequency of image change.
+		The canvas isn't updated here, see RenderSync"""
 		if ticks % self.frame_freq == 0:
-			if self.state == GhostState.PANIC:
+			state = self.state
+			if state == GhostState.PANIC:
 				self.image = self.panic_images[int((ticks / self.frame_freq) % self.num_panic_images)]
-			elif self.state == GhostState.DEAD:
+			elif state == GhostState.DEAD:
 				self.image = self.dead_images[int((ticks / self.frame_freq) % self.num_dead_images)]
 			else:
 				self.image = self.images[int((ticks / self.frame_freq) % self.num_images)]
 
-			self.canvas.itemconfigure(self.image_id, image=self.image)
+# Ghost pathing functions
+# Each returns the next square the ghost should move towards based on its respective AI.
+# They only use the cells passed to them, so the autopilot can use them to simulate the ghosts, see autopilot.py
+
+## Blinky (red)
+def blinky_path(possibles, pacman_coords, _2, _3, _4):
+	"""Chase pacman directly"""
+	
+	# Choose the square which is closest to pacman
+	next_square = get_next_step(possibles, pacman_coords)
 
-	# Ghost pathing functions
-	# Each returns the next square the ghost should move towards based on its respective AI
+	return next_square
 
-	## Blinky (red)
-	def blinky_path(self, possibles, pacman_coords, _2, _3):
-		"""Chase pacman directly"""
-		
-		# Choose the square which is closest to pacman
-		next_square = get_next_step(possibles, pacman_coords)
+## Pinky (pink)
+def pinky_path(possibles, pacman_coords, pacman_direction, blinky_indices, _4):
+	"""Chase inky's target square + 2 * the vector from blinky to pacman"""
 
-		return next_square
+	blinky_to_pacman = pacman_coords.add(blinky_indices.scale(-1)) # pacman_coords - blinky_coords
+	inky_target = pacman_coords.add(pacman_direction.scale(4))
+	pinky_target = inky_target.add(blinky_to_pacman.scale(2))
 
-	## Pinky (pink)
-	def pinky_path(self, possibles, pacman_coords, pacman_direction, blinky_coords):
-		"""Chase inky's target square + 2 * the vector from blinky to pacman"""
+	next_square = get_next_step(possibles, pinky_target)
 
-		blinky_indices = screen2indices(blinky_coords.x, blinky_coords.y)
+	return next_square
 
-		blinky_to_pacman = pacman_coords.add(blinky_indices.scale(-1)) # pacman_coords - blinky_coords
-		inky_target = pacman_coords.add(pacman_direction.scale(4))
-		pinky_target = inky_target.add(blinky_to_pacman.scale(2))
+## Inky (cyan)
+def inky_path(possibles, pacman_coords, pacman_direction, _3, _4):
+	"""Chase the square 4 squares infront of pacman"""
 
-		next_square = get_next_step(possibles, pinky_target)
+	inky_target = pacman_coords.add(pacman_direction.scale(4))
 
-		return next_square
+	next_square = get_next_step(possibles, inky_target)
 
-	## Inky (cyan)
-	def inky_path(self, possibles, pacman_coords, pacman_direction, _3):
-		"""Chase the square 4 squares infront of pacman"""
+	return next_square
 
-		inky_target = pacman_coords.add(pacman_direction.scale(4))
+## Clyde (orange)
+def clyde_path(possibles, pacman_coords, _2, _3, clyde_indices):
+	"""Chase blinky's target square, unless too close to pacman, in which case run away"""
 
-		next_square = get_next_step(possibles, inky_target)
+	target = pacman_coords
+	if distance(pacman_coords, clyde_indices) <= 8:
+		target = Vec2(0, 29)
 
-		return next_square
+	next_square = get_next_step(possibles, target)
 
-	## Clyde (orange)
-	def clyde_path(self, possibles, pacman_coords, _2, _3):
-		"""Chase blinky's target square, unless too close to pacman, in which case run away"""
+	return next_square
 
-		clyde_indices = screen2indices(self.pos.x, self.pos.y)
+PATHING_FUNCTIONS = {
+	"blinky": blinky_path,
+	"pinky": pinky_path,
+	"inky": inky_path,
+	"clyde": clyde_path
+}
 
-		target = pacman_coords
-		if distance(pacman_coords, clyde_indices) <= 8:
-			target = Vec2(0, 29)
+def remove_reverse_moves(pos, direction, possibles):
+	"Return a list of possible next squares to move into which don't require 'direction' to be reversed"
+	updated_moves = []
 
-		next_square = get_next_step(possibles, target)
+	past_square = pos.add(direction.scale(-1))
+	for p in possibles:
+		if not p.is_equal(past_square): updated_moves.append(p)
 
-		return next_square
+	return updated_moves
 
 def get_next_step(possibles, target):
 	"""Given a target square, return the next possible square to move into which is closest to the target"""
@@ -300,32 +437,36 @@ def get_next_step(possibles, target):
 
 	return next_square
 
-def get_neighbours(world, current, starting_pen=False):
-	"""Returns a list of cells which can be moved into.
+def wall_grid(world):
+	"""Returns a 2D list which is True for each cell of the world which is a wall.
+	Movement and pathing only need to know where the walls are, and this can be sent to other processes unlike the sprites"""
+	return [[isinstance(cell, Wall) for cell in row] for row in world]
+
+def get_neighbours(walls, current, starting_pen=False):
+	"""Returns a list of cells which can be moved into from the cell with indices 'current'.
 	If 'starting_pen' is True, the wall top centre wall in the pen will be ignored to allow access/exit"""
 
 	possibles = []
-	grid_indices = screen2indices(current.x, current.y)
-
-	x, y = grid_indices.x, grid_indices.y
+	x, y = current.x, current.y
+	width = len(walls[0])
 
 	# Check if its possible to go off the side of the map
 	if x - 1 == -1:
-		possibles.append(Vec2(GRID_NUM_CELLS_WIDTH-1, y))
+		possibles.append(Vec2(width-1, y))
 		return possibles
 
-	if x + 1 == GRID_NUM_CELLS_WIDTH:
+	if x + 1 == width:
 		possibles.append(Vec2(0, y))
 		return possibles
 
 	# Check the adjacent squares are in the bounds of the world, and not a wall
-	if y + 1 < len(world) and (not isinstance(world[y + 1][x], Wall) or (starting_pen and Vec2(x, y+1).is_equal(Vec2(10, 11)))):
+	if y + 1 < len(walls) and (not walls[y + 1][x] or (starting_pen and Vec2(x, y+1).is_equal(Vec2(10, 11)))):
 		possibles.append(Vec2(x, y+1))
-	if x + 1 < len(world[0]) and not isinstance(world[y][x + 1], Wall):
+	if x + 1 < width and not walls[y][x + 1]:
 		possibles.append(Vec2(x+1, y))
-	if y - 1 >= 0 and not isinstance(world[y - 1][x], Wall):
+	if y - 1 >= 0 and not walls[y - 1][x]:
 		possibles.append(Vec2(x, y-1))
-	if x - 1 >= 0 and not isinstance(world[y][x - 1], Wall):
+	if x - 1 >= 0 and not walls[y][x - 1]:
 		possibles.append(Vec2(x-1, y))
 
 	return possibles
@@ -339,13 +480,3 @@ def distance(current, target):
 
 	c = ((a ** 2) + (b ** 2)) ** 0.5
 	return c
-
-def check_ghost_collisions(pacman, ghosts):
-	"""Returns the index of any ghosts which have collided with pacman"""
-
-	ids = []
-	for i, ghost in enumerate(ghosts):
-		if screen2indices(ghost.pos.x, ghost.pos.y).is_equal(screen2indices(pacman.pos.x, pacman.pos.y)):
-			ids.append(i+1)
-
-	return ids